@@ -0,0 +1,95 @@
+"""Build time of the standard and compact IP formulations on DIMACS graphs.
+
+Usage: python experiments/formulation_benchmark.py [dataset ...]
+
+For every dataset, the LP model is built with pulp for the terminals of
+    highest degree, and then written to an MPS file as the solvers read it.
+    Both models are built in bulk from the edge arrays; the compact model
+    has fewer variables and constraints.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from ktcut.ip_formulation import IPFormulation
+from ktcut.read_data import read_dimacs_graph
+
+# in order of size
+DIMACS_DATASETS = [
+    "data/dimacs/adjnoun.graph",
+    "data/dimacs/polbooks.graph",
+    "data/dimacs/football.graph",
+    "data/dimacs/celegans_metabolic.graph",
+    "data/dimacs/jazz.graph",
+    "data/dimacs/netscience.graph",
+    "data/dimacs/email.graph",
+    "data/dimacs/power.graph",
+    "data/dimacs/hep-th.graph",
+    "data/dimacs/polblogs.graph",
+    "data/dimacs/PGPgiantcompo.graph",
+    "data/dimacs/as-22july06.graph",
+]
+
+TERMINAL_COUNT = 5
+
+
+def time_build(graph, terminals, compact):
+    """Times building the LP model and writing it to an MPS file.
+
+    Returns:
+        build_time, write_time and the number of constraints of the model
+    """
+    formulation = IPFormulation(graph, terminals, compact=compact)
+    start = time.perf_counter()
+    formulation.build_lp()
+    build_time = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        formulation.mdl.writeMPS(os.path.join(directory, "model.mps"))
+        write_time = time.perf_counter() - start
+    return build_time, write_time, len(formulation.mdl.constraints)
+
+
+def main(datasets):
+    print(
+        "{:<40} {:>8} {:>8} {:>12} {:>9} {:>9} {:>9} {:>9}".format(
+            "Dataset",
+            "Vertices",
+            "Edges",
+            "Constraints",
+            "Build",
+            "Write",
+            "Compact",
+            "Write",
+        )
+    )
+    for dataset in datasets:
+        graph = read_dimacs_graph(dataset)
+        # as suggested_terminals_degree, which needs scikit-learn to import
+        terminals = [
+            node
+            for _, node in sorted(
+                ((degree, node) for node, degree in graph.degree()), reverse=True
+            )[:TERMINAL_COUNT]
+        ]
+        build_time, write_time, constraint_count = time_build(graph, terminals, False)
+        compact_build_time, compact_write_time, _ = time_build(graph, terminals, True)
+        print(
+            "{:<40} {:>8} {:>8} {:>12} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f}".format(
+                dataset,
+                graph.number_of_nodes(),
+                graph.number_of_edges(),
+                constraint_count,
+                build_time,
+                write_time,
+                compact_build_time,
+                compact_write_time,
+            ),
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or DIMACS_DATASETS)
@@ -0,0 +1,129 @@
+"""Time of the isolating cuts with the CSR max-flow and with networkx on DIMACS graphs.
+
+Usage: python experiments/max_flow_benchmark.py [dataset ...]
+
+For every dataset, the isolating cut of each of the terminals of highest
+    degree is computed twice: with maximum_flow on the CSRGraph, and with
+    networkx's preflow_push from the terminal to a super-sink, as
+    minimum_isolating_cut did before. The conversion to a CSRGraph is timed
+    separately, since the branching tree converts the graph only once, but
+    is included in the speedup. The cut weights of both are checked to agree.
+"""
+
+import sys
+import time
+
+import numpy as np
+from networkx.algorithms.flow import preflow_push
+
+from ktcut.csr_graph import CSRGraph
+from ktcut.max_flow import maximum_flow
+from ktcut.read_data import read_dimacs_graph
+
+# in order of size
+DIMACS_DATASETS = [
+    "data/dimacs/adjnoun.graph",
+    "data/dimacs/polbooks.graph",
+    "data/dimacs/football.graph",
+    "data/dimacs/celegans_metabolic.graph",
+    "data/dimacs/jazz.graph",
+    "data/dimacs/netscience.graph",
+    "data/dimacs/email.graph",
+    "data/dimacs/power.graph",
+    "data/dimacs/hep-th.graph",
+    "data/dimacs/polblogs.graph",
+    "data/dimacs/PGPgiantcompo.graph",
+    "data/dimacs/as-22july06.graph",
+]
+
+TERMINAL_COUNT = 5
+
+
+def networkx_cut_weight(graph, source, sinks):
+    """The weight of the isolating cut, with preflow_push on a super-sink.
+
+    The super-source is the source itself, since a single vertex is isolated.
+        The super-sink is added to the graph and removed again afterwards.
+    """
+    graph.add_edges_from((sink, "t_node") for sink in sinks)
+    residual = preflow_push(graph, source, "t_node")
+    graph.remove_node("t_node")
+    return residual.graph["flow_value"]
+
+
+def time_cuts(graph, terminals):
+    """Times the isolating cuts of the terminals with both engines.
+
+    Returns:
+        conversion_time, csr_time, networkx_time and the total cut weight
+    """
+    start = time.perf_counter()
+    csr_graph = CSRGraph.from_networkx(graph)
+    csr_graph.arc_lists()
+    conversion_time = time.perf_counter() - start
+
+    terminal_indices = csr_graph.indices_of(terminals)
+    csr_weights = []
+    start = time.perf_counter()
+    for index in terminal_indices:
+        source_mask = np.zeros(csr_graph.vertex_count, dtype=bool)
+        source_mask[index] = True
+        sink_mask = np.zeros(csr_graph.vertex_count, dtype=bool)
+        sink_mask[terminal_indices] = True
+        sink_mask[index] = False
+        csr_weights.append(maximum_flow(csr_graph, source_mask, sink_mask)[1])
+    csr_time = time.perf_counter() - start
+
+    networkx_weights = []
+    start = time.perf_counter()
+    for terminal in terminals:
+        sinks = [other for other in terminals if other != terminal]
+        networkx_weights.append(networkx_cut_weight(graph, terminal, sinks))
+    networkx_time = time.perf_counter() - start
+
+    assert np.allclose(csr_weights, networkx_weights), "cut weights differ"
+    return conversion_time, csr_time, networkx_time, sum(csr_weights)
+
+
+def main(datasets):
+    print(
+        "{:<40} {:>8} {:>8} {:>8} {:>9} {:>9} {:>9} {:>8}".format(
+            "Dataset",
+            "Vertices",
+            "Edges",
+            "Weight",
+            "Convert",
+            "CSR",
+            "networkx",
+            "Speedup",
+        )
+    )
+    for dataset in datasets:
+        graph = read_dimacs_graph(dataset)
+        # as suggested_terminals_degree, which needs scikit-learn to import
+        terminals = [
+            node
+            for _, node in sorted(
+                ((degree, node) for node, degree in graph.degree()), reverse=True
+            )[:TERMINAL_COUNT]
+        ]
+        conversion_time, csr_time, networkx_time, weight = time_cuts(
+            graph, terminals
+        )
+        print(
+            "{:<40} {:>8} {:>8} {:>8.0f} {:>9.3f} {:>9.3f} {:>9.3f} {:>8.1f}".format(
+                dataset,
+                graph.number_of_nodes(),
+                graph.number_of_edges(),
+                weight,
+                conversion_time,
+                csr_time,
+                networkx_time,
+                networkx_time / (conversion_time + csr_time),
+            ),
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or DIMACS_DATASETS)
@@ -0,0 +1,35 @@
+"""Saves and loads the checkpoints of long Isolation Branching runs."""
+import os
+import pickle
+import tempfile
+
+
+def save_state(state, path):
+    """Pickles a state to a file, replacing it atomically.
+
+    The state is written to a temporary file next to path, which then
+        replaces path, so that an interrupted save never leaves a truncated
+        checkpoint behind.
+    """
+    path = os.fspath(path)
+    descriptor, temporary_path = tempfile.mkstemp(
+        prefix=os.path.basename(path) + ".", dir=os.path.dirname(path) or "."
+    )
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+def load_state(path):
+    """Unpickles a state saved by save_state.
+
+    Checkpoints are pickles, so only load files from trusted sources.
+    """
+    with open(path, "rb") as file:
+        return pickle.load(file)
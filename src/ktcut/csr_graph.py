@@ -0,0 +1,342 @@
+"""Compact array-backed graph used internally by Isolation Branching."""
+
+import networkx as nx
+import numpy as np
+
+
+class CSRGraph:
+    """Undirected graph stored in compressed sparse row (CSR) form.
+
+    Vertices are relabelled to the integers 0, ..., n - 1. Every undirected
+        edge {u, v} is stored as two arcs, one in the row of u and one in the
+        row of v, so the neighbors of v are
+        neighbors[offsets[v]:offsets[v + 1]]. Rows are sorted by neighbor and
+        contain no self-loops or parallel arcs.
+
+    Attributes:
+        offsets: int64 array of length n + 1 delimiting the rows
+        neighbors: int64 array with the head of every arc
+        capacities: float64 array with the capacity of every arc
+        labels: the original vertex labels, indexed by vertex id
+    """
+
+    def __init__(self, offsets, neighbors, capacities, labels):
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.capacities = capacities
+        self.labels = labels
+        self._index = None
+        self._arc_tails = None
+        self._reverse_arcs = None
+        self._arc_lists = None
+
+    @classmethod
+    def from_networkx(cls, graph, default_capacity=1.0):
+        """Converts a networkx graph without modifying it.
+
+        Args:
+            graph: an undirected networkx graph
+            default_capacity: the capacity of edges without a 'capacity'
+
+        Returns:
+            the CSRGraph with the vertices of graph in iteration order
+        """
+        labels = list(graph.nodes())
+        index = {label: vertex for vertex, label in enumerate(labels)}
+        edge_count = graph.number_of_edges()
+        tails = np.empty(edge_count, dtype=np.int64)
+        heads = np.empty(edge_count, dtype=np.int64)
+        capacities = np.empty(edge_count, dtype=np.float64)
+        for position, (u, v, capacity) in enumerate(
+            graph.edges(data="capacity", default=default_capacity)
+        ):
+            tails[position] = index[u]
+            heads[position] = index[v]
+            capacities[position] = capacity
+        csr_graph = cls.from_edges(len(labels), tails, heads, capacities, labels)
+        csr_graph._index = index
+        return csr_graph
+
+    @classmethod
+    def from_edges(cls, vertex_count, tails, heads, capacities, labels=None):
+        """Builds a graph from a list of undirected edges.
+
+        Parallel edges are merged by adding their capacities and self-loops
+            are dropped.
+
+        Args:
+            vertex_count: the number of vertices n
+            tails: array with one endpoint of every edge
+            heads: array with the other endpoint of every edge
+            capacities: array with the capacity of every edge
+            labels: the vertex labels, defaults to 0, ..., n - 1
+
+        Returns:
+            the CSRGraph
+        """
+        tails = np.asarray(tails, dtype=np.int64)
+        heads = np.asarray(heads, dtype=np.int64)
+        capacities = np.asarray(capacities, dtype=np.float64)
+        return cls._from_arcs(
+            vertex_count,
+            np.concatenate([tails, heads]),
+            np.concatenate([heads, tails]),
+            np.concatenate([capacities, capacities]),
+            labels,
+        )
+
+    @classmethod
+    def _from_arcs(cls, vertex_count, tails, heads, capacities, labels):
+        if labels is None:
+            labels = list(range(vertex_count))
+        keep = tails != heads
+        keys, inverse = np.unique(
+            tails[keep] * vertex_count + heads[keep], return_inverse=True
+        )
+        capacities = np.bincount(
+            inverse.ravel(), weights=capacities[keep], minlength=len(keys)
+        )
+        offsets = np.zeros(vertex_count + 1, dtype=np.int64)
+        if len(keys):
+            np.cumsum(
+                np.bincount(keys // vertex_count, minlength=vertex_count),
+                out=offsets[1:],
+            )
+            neighbors = keys % vertex_count
+        else:
+            neighbors = keys
+        return cls(offsets, neighbors, capacities.astype(np.float64), labels)
+
+    def __getstate__(self):
+        # the cached arrays and lists are rebuilt on demand
+        return {
+            "offsets": self.offsets,
+            "neighbors": self.neighbors,
+            "capacities": self.capacities,
+            "labels": self.labels,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def vertex_count(self):
+        return len(self.offsets) - 1
+
+    @property
+    def edge_count(self):
+        return len(self.neighbors) // 2
+
+    @property
+    def arc_tails(self):
+        """The tail of every arc, aligned with neighbors."""
+        if self._arc_tails is None:
+            self._arc_tails = np.repeat(
+                np.arange(self.vertex_count, dtype=np.int64), np.diff(self.offsets)
+            )
+        return self._arc_tails
+
+    @property
+    def reverse_arcs(self):
+        """For every arc (u, v), the position of the arc (v, u)."""
+        if self._reverse_arcs is None:
+            n = self.vertex_count
+            keys = self.arc_tails * n + self.neighbors
+            self._reverse_arcs = np.searchsorted(
+                keys, self.neighbors * n + self.arc_tails
+            )
+        return self._reverse_arcs
+
+    def arc_lists(self):
+        """The offsets, neighbors and reverse arcs as Python lists.
+
+        Pure Python loops index lists much faster than arrays, so the lists
+            are built once and reused by every search on this graph.
+        """
+        if self._arc_lists is None:
+            self._arc_lists = (
+                self.offsets.tolist(),
+                self.neighbors.tolist(),
+                self.reverse_arcs.tolist(),
+            )
+        return self._arc_lists
+
+    def index_of(self, label):
+        """The vertex id of an original vertex label."""
+        if self._index is None:
+            self._index = {label: vertex for vertex, label in enumerate(self.labels)}
+        return self._index[label]
+
+    def indices_of(self, labels):
+        """The vertex ids of several original vertex labels, as an array."""
+        return np.array([self.index_of(label) for label in labels], dtype=np.int64)
+
+    def edges(self):
+        """Every undirected edge once, as arrays (tails, heads, capacities)."""
+        forward = self.arc_tails < self.neighbors
+        return (
+            self.arc_tails[forward],
+            self.neighbors[forward],
+            self.capacities[forward],
+        )
+
+    def weighted_degrees(self):
+        """The total capacity of the edges adjacent to each vertex."""
+        return np.bincount(
+            self.arc_tails, weights=self.capacities, minlength=self.vertex_count
+        )
+
+    def connected_components(self, mask=None):
+        """Numbers the connected components of the graph.
+
+        Args:
+            mask: boolean array of the vertices to keep, or None for all;
+                the components are those of the induced subgraph
+
+        Returns:
+            component: the component of every kept vertex, or -1
+            component_count: the number of components
+        """
+        offsets, heads, _ = self.arc_lists()
+        keep = [True] * self.vertex_count if mask is None else mask.tolist()
+        component = [-1] * self.vertex_count
+        component_count = 0
+        for start in range(self.vertex_count):
+            if not keep[start] or component[start] >= 0:
+                continue
+            component[start] = component_count
+            queue = [start]
+            for u in queue:
+                for arc in range(offsets[u], offsets[u + 1]):
+                    v = heads[arc]
+                    if keep[v] and component[v] < 0:
+                        component[v] = component_count
+                        queue.append(v)
+            component_count += 1
+        return np.array(component, dtype=np.int64), component_count
+
+    def row_arcs(self, vertices):
+        """The positions of all arcs leaving any of the given vertices."""
+        vertices = np.asarray(vertices, dtype=np.int64)
+        starts = self.offsets[vertices]
+        counts = self.offsets[vertices + 1] - starts
+        total = int(counts.sum())
+        if not total:
+            return np.zeros(0, dtype=np.int64)
+        shifts = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return shifts + np.arange(total, dtype=np.int64)
+
+    def quotient(self, vertex_map, vertex_count, labels=None):
+        """Merges vertices according to a vertex map.
+
+        Vertex v of this graph becomes vertex vertex_map[v] of the result.
+            The capacities of edges which become parallel are added and edges
+            which become self-loops are removed.
+
+        Args:
+            vertex_map: int array mapping vertex ids to new vertex ids
+            vertex_count: the number of vertices in the result
+            labels: the vertex labels of the result
+
+        Returns:
+            the quotient CSRGraph
+        """
+        vertex_map = np.asarray(vertex_map, dtype=np.int64)
+        return self._from_arcs(
+            vertex_count,
+            vertex_map[self.arc_tails],
+            vertex_map[self.neighbors],
+            self.capacities,
+            labels,
+        )
+
+    def quotient_arc_values(self, vertex_map, quotient, values):
+        """Adds up values on arcs, e.g. flows, onto the arcs of a quotient.
+
+        Args:
+            vertex_map: the vertex map which produced the quotient
+            quotient: the CSRGraph returned by quotient(vertex_map, ...)
+            values: one value per arc of this graph
+
+        Returns:
+            one value per arc of the quotient
+        """
+        tails = vertex_map[self.arc_tails]
+        heads = vertex_map[self.neighbors]
+        keep = tails != heads
+        n = quotient.vertex_count
+        positions = np.searchsorted(
+            quotient.arc_tails * n + quotient.neighbors,
+            tails[keep] * n + heads[keep],
+        )
+        return np.bincount(
+            positions, weights=values[keep], minlength=len(quotient.neighbors)
+        )
+
+    def contract_outside(self, vertices):
+        """Keeps the given vertices and contracts all others into one vertex.
+
+        Only the arcs leaving the given vertices are visited, so the cost is
+            proportional to their degrees rather than to the whole graph.
+
+        Args:
+            vertices: the vertex ids to keep
+
+        Returns:
+            the CSRGraph in which vertex i is vertices[i] and the last vertex,
+                len(vertices), is the contraction of every other vertex
+        """
+        vertices = np.asarray(vertices, dtype=np.int64)
+        outside = len(vertices)
+        local = np.full(self.vertex_count, outside, dtype=np.int64)
+        local[vertices] = np.arange(outside, dtype=np.int64)
+        arcs = self.row_arcs(vertices)
+        tails = local[self.arc_tails[arcs]]
+        heads = local[self.neighbors[arcs]]
+        capacities = self.capacities[arcs]
+        leaving = heads == outside
+        return self._from_arcs(
+            outside + 1,
+            np.concatenate([tails, heads[leaving]]),
+            np.concatenate([heads, tails[leaving]]),
+            np.concatenate([capacities, capacities[leaving]]),
+            None,
+        )
+
+    def contract(self, u, v_set):
+        """Contracts the vertices in v_set to u.
+
+        Unlike contract_vertices, the graph is not modified and vertex ids are
+            preserved: the vertices of v_set remain in the result without any
+            adjacent edges.
+
+        Args:
+            u: a vertex id
+            v_set: vertex ids to be contracted into u
+
+        Returns:
+            the contracted CSRGraph
+        """
+        v_array = np.fromiter(v_set, dtype=np.int64, count=len(v_set))
+        assert u not in v_set, "cannot combine a vertex to itself."
+        vertex_map = np.arange(self.vertex_count, dtype=np.int64)
+        vertex_map[v_array] = u
+        contracted = self.quotient(vertex_map, self.vertex_count, self.labels)
+        contracted._index = self._index
+        return contracted
+
+    def to_networkx(self):
+        """Converts back to a networkx graph with a 'capacity' on every edge."""
+        graph = nx.Graph()
+        graph.add_nodes_from(self.labels)
+        tails, heads, capacities = self.edges()
+        graph.add_weighted_edges_from(
+            (
+                (self.labels[u], self.labels[v], capacity)
+                for u, v, capacity in zip(
+                    tails.tolist(), heads.tolist(), capacities.tolist()
+                )
+            ),
+            weight="capacity",
+        )
+        return graph
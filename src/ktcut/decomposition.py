@@ -0,0 +1,142 @@
+"""Splits k-terminal cut instances into independent parts at the terminals."""
+import numpy as np
+
+from ktcut.csr_graph import CSRGraph
+
+# report entries which are added up over the parts and shifted by the
+# capacity between terminals
+_BOUNDS = (
+    "Active Node Lower Bound",
+    "Active Node Upper Bound",
+    "Best Unexplored Lower Bound",
+    "Best Upper Bound",
+)
+
+
+def decompose(graph, terminals):
+    """Splits an instance into the parts which need a multiway cut.
+
+    Removing the terminals splits the non-terminals into components which
+        only interact through the terminals, so every component can be
+        solved on its own together with the terminals adjacent to it.
+        This covers connected components as well as articulation points
+        which are terminals.
+
+    A component adjacent to no terminal is assigned to the first terminal
+        and a component adjacent to a single terminal is assigned to it,
+        both at no cost. Edges between two terminals are always cut.
+
+    Args:
+        graph: the CSRGraph
+        terminals: array of the vertex ids of the terminals
+
+    Returns:
+        parts: a list of (part_graph, part_terminals, vertices) for every
+            component adjacent to at least two terminals, where vertex i of
+            part_graph is vertices[i] of graph and part_terminals are
+            vertex ids of part_graph
+        assignment: the terminal of every vertex outside the parts, or -1
+        terminal_capacity: the total capacity of the edges between terminals
+    """
+    n = graph.vertex_count
+    is_terminal = np.zeros(n, dtype=bool)
+    is_terminal[terminals] = True
+    component, component_count = graph.connected_components(~is_terminal)
+
+    tails, heads, capacities = graph.edges()
+    between_terminals = is_terminal[tails] & is_terminal[heads]
+    terminal_capacity = float(capacities[between_terminals].sum())
+    tails = tails[~between_terminals]
+    heads = heads[~between_terminals]
+    capacities = capacities[~between_terminals]
+    edge_component = np.where(is_terminal[tails], component[heads], component[tails])
+
+    # the distinct terminals adjacent to every component
+    touching = is_terminal[tails] | is_terminal[heads]
+    pairs = np.unique(
+        edge_component[touching] * n
+        + np.where(is_terminal[tails], tails, heads)[touching]
+    )
+    terminal_counts = np.bincount(pairs // n, minlength=component_count)
+    component_terminal = np.full(component_count, terminals[0], dtype=np.int64)
+    single = terminal_counts[pairs // n] == 1
+    component_terminal[pairs[single] // n] = pairs[single] % n
+
+    assignment = np.full(n, -1, dtype=np.int64)
+    assignment[terminals] = terminals
+    # terminals have no component, which is -1
+    trivial = ~is_terminal
+    trivial[trivial] = terminal_counts[component[trivial]] < 2
+    assignment[trivial] = component_terminal[component[trivial]]
+
+    parts = []
+    in_part = terminal_counts[edge_component] >= 2
+    order = np.argsort(edge_component[in_part], kind="stable")
+    tails, heads = tails[in_part][order], heads[in_part][order]
+    capacities = capacities[in_part][order]
+    edge_component = edge_component[in_part][order]
+    boundaries = np.flatnonzero(np.diff(edge_component)) + 1
+    for part_tails, part_heads, part_capacities in zip(
+        np.split(tails, boundaries),
+        np.split(heads, boundaries),
+        np.split(capacities, boundaries),
+    ):
+        if not len(part_tails):
+            continue
+        vertices = np.unique(np.concatenate([part_tails, part_heads]))
+        part_graph = CSRGraph.from_edges(
+            len(vertices),
+            np.searchsorted(vertices, part_tails),
+            np.searchsorted(vertices, part_heads),
+            part_capacities,
+            [graph.labels[vertex] for vertex in vertices],
+        )
+        part_terminals = np.searchsorted(
+            vertices, terminals[np.isin(terminals, vertices)]
+        )
+        parts.append((part_graph, part_terminals, vertices))
+    return parts, assignment, terminal_capacity
+
+
+def combine_reports(reports, source_sets, terminal_capacity, time_elapsed):
+    """Combines the final reports of the trees which solved the parts.
+
+    Counts and bounds are added up, depths are maximized and the source set
+        sizes are those of the whole instance.
+
+    Args:
+        reports: the report of every part
+        source_sets: the combined source sets by terminal
+        terminal_capacity: the capacity of the edges between terminals
+        time_elapsed: the time spent on the whole instance
+
+    Returns:
+        a report with the same entries as IsolationBranchingTree.report
+    """
+    combined = {
+        "Active Node Depth": 0,
+        "Active Node Total Unassigned Vertices": 0,
+        "Nodes Unexplored": 0,
+        "Nodes Total": 0,
+        "Kernel Vertices": 0,
+        "Kernel Edges": 0,
+        "Kernel Reductions": {},
+    }
+    for report in reports:
+        for key, value in report.items():
+            if isinstance(value, dict):
+                entry = combined.setdefault(key, {})
+                for name, count in value.items():
+                    entry[name] = entry.get(name, 0) + count
+            elif key == "Active Node Depth":
+                combined[key] = max(combined[key], value)
+            else:
+                combined[key] = combined.get(key, 0) + value
+    for key in _BOUNDS:
+        combined[key] = combined.get(key, 0.0) + terminal_capacity
+    combined["Source Set Sizes"] = {
+        terminal: len(source_set) - 1 for terminal, source_set in source_sets.items()
+    }
+    combined["Time Elapsed"] = time_elapsed
+    combined["Parts"] = len(reports)
+    return combined
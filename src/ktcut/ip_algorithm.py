@@ -1,9 +1,12 @@
 """Solves the IP Formulation of the k-Terminal Cut Problem."""
 
-from ktcut.ip_formulation import IPFormulation
+from ktcut.ip_formulation import make_formulation
+from ktcut.ip_formulation import solver_key
 
 
-def ip_algorithm(graph, terminals, solver=None):
+def ip_algorithm(
+    graph, terminals, solver=None, cache=None, compact=False, initial_partition=None
+):
     """Solves the IP formulation of the Multiterminal Cut Problem.
 
     minimize (1/2) sum_{i,j,k}{z_{ij}^k}
@@ -15,16 +18,34 @@ def ip_algorithm(graph, terminals, solver=None):
     Args:
         graph: The networkx graph for which the k-Terminal Cut problem is to be solved.
         terminals: The vertices which are terminals in the k-Terminal Cut problem.
-        solver: which solver to use to solve the IP.
+        solver: which solver to use to solve the IP, a pulp solver or
+            "highs" to solve a sparse formulation in-process with SciPy.
+        cache: a ResultCache from which the result is taken if the same IP
+            was solved before, with the same solver options, and to which
+            it is added otherwise if it is proven optimal. On a hit,
+            initial_partition is ignored, since the cached cut is optimal.
+        compact: if the smaller pulp model of IPFormulation is used, with
+            one edge variable per undirected edge and terminal.
+        initial_partition: a known multiway cut, e.g. the source_sets of a
+            time-limited isolation_branching, which the solver starts from
+            and uses as an objective cutoff, see IPFormulation.solve_ip.
 
     Returns:
         source_sets: dictionary of nodes to terminal.
         cut_value: value of the IP or LP cut.
     """
-    ip_formulation = IPFormulation(graph, terminals, solver)
-    ip_formulation.solve_ip()
+    if cache is not None:
+        key = cache.key("ip", graph, terminals, solver_key(solver), compact)
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+    ip_formulation = make_formulation(graph, terminals, solver, compact)
+    ip_formulation.solve_ip(initial_partition)
 
     source_sets = ip_formulation.get_source_sets()
     cut_value = ip_formulation.get_cut_value()
 
+    if cache is not None and ip_formulation.is_optimal():
+        cache.put(key, (source_sets, cut_value))
     return source_sets, cut_value
@@ -1,14 +1,104 @@
 """LP and IP Formulations of the k-Terminal Cut Problem."""
 
+import copy
+
 import pulp
+from pulp import LpAffineExpression
+from pulp import LpConstraint
+from pulp import LpConstraintEQ
+from pulp import LpConstraintLE
 from pulp import LpProblem
 from pulp import LpMinimize
 from pulp import LpVariable
 from pulp import LpInteger
 from pulp import LpContinuous
-from pulp import lpSum
 from pulp import value
 
+from ktcut import isolation_branching_heuristics as heuristics
+from ktcut.csr_graph import CSRGraph
+
+# solvers which are not pulp solvers, by name
+SPARSE_SOLVERS = ("highs",)
+
+# relative slack of the objective cutoff, so that the initial partition
+# itself is never cut off
+CUTOFF_TOLERANCE = 1e-6
+
+
+def objective_cutoff(cut_value):
+    """The objective cutoff for an initial partition of this cut value."""
+    return cut_value + CUTOFF_TOLERANCE * max(1.0, abs(cut_value))
+
+
+def initial_assignment(csr_graph, terminals, partition):
+    """The complete assignment of an initial partition, and its cut value.
+
+    Args:
+        csr_graph: the CSRGraph of the graph of the formulation
+        terminals: the terminal labels
+        partition: dictionary of sets of nodes by terminal, see
+            isolation_branching_heuristics.partition_assignment
+
+    Returns:
+        the terminal label of every node label, and the cut value
+    """
+    terminal_ids = csr_graph.indices_of(terminals)
+    assignment = heuristics.partition_assignment(csr_graph, terminal_ids, partition)
+    labels = csr_graph.labels
+    terminal_by_node = {
+        labels[vertex]: labels[terminal]
+        for vertex, terminal in enumerate(assignment.tolist())
+    }
+    return terminal_by_node, heuristics.cut_value(csr_graph, assignment)
+
+
+def make_formulation(graph, terminals, solver=None, compact=False):
+    """Creates the formulation which the given solver solves.
+
+    Args:
+        graph: the networkx graph
+        terminals: the terminals of the networkx graph
+        solver: a pulp solver, None for the default pulp solver, or
+            "highs" for SparseIPFormulation, which requires SciPy
+        compact: if the pulp model is the compact one, see IPFormulation.
+            SparseIPFormulation is always compact.
+
+    Returns:
+        an IPFormulation or a SparseIPFormulation
+    """
+    if solver == "highs":
+        # imported here, so that SciPy is only needed for this solver
+        from ktcut.sparse_formulation import SparseIPFormulation
+
+        return SparseIPFormulation(graph, terminals)
+    if isinstance(solver, str):
+        raise ValueError(
+            "solver must be a pulp solver or one of {}, not {!r}".format(
+                SPARSE_SOLVERS, solver
+            )
+        )
+    return IPFormulation(graph, terminals, solver, compact=compact)
+
+
+def solver_key(solver):
+    """The solver and its options, as part of the key of a cached result.
+
+    Args:
+        solver: a pulp solver, None or the name of a sparse solver
+
+    Returns:
+        the name of the solver with its time limit and options, or solver
+            itself if it is None or a name
+    """
+    if solver is None or isinstance(solver, str):
+        return solver
+    return (
+        solver.name,
+        solver.timeLimit,
+        list(solver.options),
+        sorted(solver.optionsDict.items()),
+    )
+
 
 class IPFormulation:
     """Formulates the k-Terminal Cut Problem as an Integer Program.
@@ -21,127 +111,250 @@ class IPFormulation:
             sum_k{x_{i}^k} = 1
             z_{ij}^k >= x_{i}^k-x_{j}^k for all k
             z_{ij}^k >= x_{j}^k-x_{i}^k for all k
+
+    The compact model has one z variable per undirected edge and terminal
+        instead of one per orientation, and no self-loop variables. The x
+        values of terminals are constants rather than variables fixed by
+        constraints, and x_{i}^k of the last terminal is substituted by
+        1 - sum_{k'}{x_{i}^k'} over the others, so the sum constraint
+        becomes sum_{k'}{x_{i}^k'} <= 1. With aggregate, an edge-cut
+        variable y_{ij} = (1/2) sum_k{z_{ij}^k} carries the objective.
     """
 
-    def __init__(self, graph, terminals, solver=None):
+    def __init__(self, graph, terminals, solver=None, compact=False, aggregate=False):
         self.graph = graph
         self.terminals = terminals
+        self.compact = compact
+        self.aggregate = aggregate
         self.mdl = None
         self.x_variables = {}
         self.z_variables = {}
+        self.y_variables = {}
         self.possible_terminals_by_node_weak = None
         self.possible_terminals_by_node_strong = None
         self.source_sets = None
         self.cut_value = None
+        self.initial_cut_value = None
         self.solver = solver
 
     def _initialize_model(self):
         self.mdl = LpProblem("MultiTerminalCuts", LpMinimize)
+        self.initial_cut_value = None
 
-    def _initialize_node_variables_ip(self):
-        """
-        Initialize variables x_i^k for IP.
-        """
-        for i in self.graph.nodes():
-            self.x_variables[i] = {}
-            for k in self.terminals:
-                self.x_variables[i][k] = LpVariable(
-                    "n %s, t %s" % (i, k), 0, 1, LpInteger
-                )
+    def _build_standard(self, category):
+        """Builds the standard model in bulk from the edge arrays of the graph.
 
-    def _initialize_node_variables_lp(self):
-        """
-        Initialize variables x_i^k for LP.
+        Variables and constraints get index-based names, as in the compact
+            model: x3_1 for the vertex with id 3 and the terminal at
+            position 1, z5_1 for the edge with id 5, and every constraint is
+            created from a coefficient dictionary, without pulp arithmetic.
         """
-        for i in self.graph.nodes():
-            self.x_variables[i] = {}
-            for k in self.terminals:
-                self.x_variables[i][k] = LpVariable(
-                    "n %s, t %s" % (i, k), 0, 1, LpContinuous
-                )
+        self._initialize_model()
+        csr_graph = CSRGraph.from_networkx(self.graph)
+        labels = csr_graph.labels
+        terminal_count = len(self.terminals)
+        variables = []
+        constraints = {}
 
-    def _initialize_edge_variables_ip(self):
-        """
-        Initialize variables z_ij^k for IP.
-        """
-        for i in self.graph.nodes():
-            self.z_variables[i] = {}
-            for j in self.graph[i]:
-                self.z_variables[i][j] = {}
-                for k in self.terminals:
-                    self.z_variables[i][j][k] = LpVariable(
-                        "n %s, n %s, t %s" % (i, j, k), 0, 1, LpInteger
-                    )
+        # x variables by vertex id and terminal position
+        x_by_vertex = []
+        for vertex, label in enumerate(labels):
+            x_variables = [
+                LpVariable("x%d_%d" % (vertex, position), 0, 1, category)
+                for position in range(terminal_count)
+            ]
+            variables.extend(x_variables)
+            x_by_vertex.append(x_variables)
+            self.x_variables[label] = dict(zip(self.terminals, x_variables))
+            constraints["s%d" % vertex] = LpConstraint(
+                LpAffineExpression(dict.fromkeys(x_variables, 1.0)),
+                LpConstraintEQ,
+                rhs=1.0,
+            )
+        for position, terminal in enumerate(
+            csr_graph.indices_of(self.terminals).tolist()
+        ):
+            constraints["t%d" % position] = LpConstraint(
+                LpAffineExpression({x_by_vertex[terminal][position]: 1.0}),
+                LpConstraintEQ,
+                rhs=1.0,
+            )
 
-    def _initialize_edge_variables_lp(self):
-        """
-        Initialize variables z_ij^k for LP.
-        """
-        for i in self.graph.nodes():
-            self.z_variables[i] = {}
-            for j in self.graph[i]:
-                self.z_variables[i][j] = {}
-                for k in self.terminals:
-                    self.z_variables[i][j][k] = LpVariable(
-                        "n %s, n %s, t %s" % (i, j, k), 0, 1, LpContinuous
+        objective = {}
+        tails, heads, capacities = csr_graph.edges()
+        for edge, (i, j, capacity) in enumerate(
+            zip(tails.tolist(), heads.tolist(), capacities.tolist())
+        ):
+            z_variables = [
+                LpVariable("z%d_%d" % (edge, position), 0, 1, category)
+                for position in range(terminal_count)
+            ]
+            variables.extend(z_variables)
+            self.z_variables.setdefault(labels[i], {})[labels[j]] = dict(
+                zip(self.terminals, z_variables)
+            )
+            objective.update(dict.fromkeys(z_variables, 0.5 * capacity))
+            for position, z in enumerate(z_variables):
+                for direction, (u, v) in enumerate(((i, j), (j, i))):
+                    # x_u - x_v - z <= 0
+                    constraints["f%d_%d_%d" % (edge, position, direction)] = (
+                        LpConstraint(
+                            LpAffineExpression(
+                                {
+                                    x_by_vertex[u][position]: 1.0,
+                                    x_by_vertex[v][position]: -1.0,
+                                    z: -1.0,
+                                }
+                            ),
+                            LpConstraintLE,
+                        )
                     )
 
-    def _initialize_objective(self):
-        """
-        Initialize objective
-        """
-        self.mdl += lpSum(
-            0.5 * self.graph[i][j]["capacity"] * self.z_variables[i][j][k]
-            for (i, j) in self.graph.edges
-            for k in self.terminals
-        )
+        self.mdl.setObjective(LpAffineExpression(objective))
+        self.mdl.extend(constraints)
+        self.mdl.addVariables(variables)
 
-    def _initialize_contraint_nodes(self):
-        """
-        Initialize constraint sum_k{x_{i}^k} = 1
+    def _build_compact(self, category):
+        """Builds the compact model in bulk from the edge arrays of the graph.
+
+        Variables and constraints get index-based names, e.g. x3_1 for the
+            vertex with id 3 and the terminal at position 1, and every
+            expression is created from a prebuilt coefficient dictionary,
+            without pulp arithmetic. An x value is held as a pair of
+            coefficients and constant, shared by the constraints of all
+            edges of its vertex.
         """
-        for i in self.graph.nodes():
-            self.mdl += (
-                (sum(self.x_variables[i][k] for k in self.terminals) == 1.0),
-                "sumNode %s" % str(i),
+        self._initialize_model()
+        csr_graph = CSRGraph.from_networkx(self.graph)
+        labels = csr_graph.labels
+        terminal_count = len(self.terminals)
+        positions = {
+            vertex: position
+            for position, vertex in enumerate(
+                csr_graph.indices_of(self.terminals).tolist()
             )
+        }
+        variables = []
+        constraints = {}
 
-    def _initialize_constraint_edges(self):
-        """
-        Initialize constrants
-            z_{ij}^k >= x_{i}^k-x_{j}^k for all k
-            z_{ij}^k >= x_{j}^k-x_{i}^k for all k
-        """
-        for (i, j) in self.graph.edges():
-            for k in self.terminals:
-                self.mdl += (
-                    (
-                        self.z_variables[i][j][k]
-                        >= self.x_variables[i][k] - self.x_variables[j][k]
-                    ),
-                    "flow %s %s %s" % (i, j, k),
+        # x values as (coefficients, constant), by vertex id and position
+        forms = []
+        for vertex, label in enumerate(labels):
+            if vertex in positions:
+                forms.append(
+                    [
+                        ({}, float(position == positions[vertex]))
+                        for position in range(terminal_count)
+                    ]
+                )
+                self.x_variables[label] = dict(
+                    zip(self.terminals, (constant for _, constant in forms[-1]))
                 )
-                self.mdl += (
-                    (
-                        self.z_variables[i][j][k]
-                        >= self.x_variables[j][k] - self.x_variables[i][k]
-                    ),
-                    "flow %s %s %s" % (j, i, k),
+                continue
+            free = [
+                LpVariable("x%d_%d" % (vertex, position), 0, 1, category)
+                for position in range(terminal_count - 1)
+            ]
+            variables.extend(free)
+            last = dict.fromkeys(free, -1.0)
+            forms.append([({x: 1.0}, 0.0) for x in free] + [(last, 1.0)])
+            self.x_variables[label] = dict(zip(self.terminals, free))
+            self.x_variables[label][self.terminals[-1]] = LpAffineExpression(
+                last, 1.0
+            )
+            if free:
+                constraints["s%d" % vertex] = LpConstraint(
+                    LpAffineExpression(dict.fromkeys(free, 1.0)),
+                    LpConstraintLE,
+                    rhs=1.0,
+                )
+
+        objective = {}
+        tails, heads, capacities = csr_graph.edges()
+        for edge, (i, j, capacity) in enumerate(
+            zip(tails.tolist(), heads.tolist(), capacities.tolist())
+        ):
+            z_variables = [
+                LpVariable("z%d_%d" % (edge, position), 0, 1, category)
+                for position in range(terminal_count)
+            ]
+            variables.extend(z_variables)
+            self.z_variables.setdefault(labels[i], {})[labels[j]] = dict(
+                zip(self.terminals, z_variables)
+            )
+            for position, z in enumerate(z_variables):
+                for direction, (u, v) in enumerate(((i, j), (j, i))):
+                    # x_u - x_v - z <= 0
+                    coefficients, constant = forms[u][position]
+                    coefficients = dict(coefficients)
+                    other_coefficients, other_constant = forms[v][position]
+                    for x, coefficient in other_coefficients.items():
+                        coefficients[x] = coefficients.get(x, 0.0) - coefficient
+                    coefficients[z] = -1.0
+                    constraints["f%d_%d_%d" % (edge, position, direction)] = (
+                        LpConstraint(
+                            LpAffineExpression(coefficients, constant - other_constant),
+                            LpConstraintLE,
+                        )
+                    )
+            if self.aggregate:
+                y = LpVariable("y%d" % edge, 0, 1, category)
+                variables.append(y)
+                self.y_variables.setdefault(labels[i], {})[labels[j]] = y
+                objective[y] = capacity
+                coefficients = dict.fromkeys(z_variables, -1.0)
+                coefficients[y] = 2.0
+                constraints["c%d" % edge] = LpConstraint(
+                    LpAffineExpression(coefficients), LpConstraintEQ
                 )
+            else:
+                objective.update(dict.fromkeys(z_variables, 0.5 * capacity))
+
+        self.mdl.setObjective(LpAffineExpression(objective))
+        self.mdl.extend(constraints)
+        self.mdl.addVariables(variables)
 
-    def _initialize_constraint_terminals(self):
+    def _set_initial_partition(self, partition):
         """
-        Initialize constraint
-            x_k^k = 1
+        Set the initial value of every variable to an initial partition
         """
-        for k in self.terminals:
-            self.mdl += (self.x_variables[k][k] == 1.0), "init %s" % k
+        terminal_by_node, self.initial_cut_value = initial_assignment(
+            CSRGraph.from_networkx(self.graph), self.terminals, partition
+        )
+        for i, x_variables in self.x_variables.items():
+            for k, x in x_variables.items():
+                if isinstance(x, LpVariable):
+                    x.setInitialValue(float(terminal_by_node[i] == k))
+        for i in self.z_variables:
+            for j, z_variables in self.z_variables[i].items():
+                for k, z in z_variables.items():
+                    z.setInitialValue(
+                        float((terminal_by_node[i] == k) != (terminal_by_node[j] == k))
+                    )
+        for i in self.y_variables:
+            for j, y in self.y_variables[i].items():
+                y.setInitialValue(float(terminal_by_node[i] != terminal_by_node[j]))
 
     def _run_solver(self):
-        if self.solver is None:
-            self.mdl.solve()
+        if self.initial_cut_value is None:
+            if self.solver is None:
+                self.mdl.solve()
+            else:
+                self.mdl.solve(self.solver)
+            return
+        # the initial values are a MIP start, and their value a cutoff,
+        # which CBC takes as an option and other solvers as a constraint
+        # set on a copy, since the solver, e.g. pulp.LpSolverDefault, may be
+        # used concurrently by other solves
+        solver = pulp.LpSolverDefault if self.solver is None else self.solver
+        solver = copy.copy(solver)
+        solver.optionsDict = dict(solver.optionsDict, warmStart=True)
+        cutoff = objective_cutoff(self.initial_cut_value)
+        if isinstance(solver, pulp.COIN_CMD):
+            solver.options = list(solver.options) + ["cutoff %r" % cutoff]
         else:
-            self.mdl.solve(self.solver)
+            self.mdl += (self.mdl.objective <= cutoff), "cutoff"
+        self.mdl.solve(solver)
 
     def _calculate_possible_terminals_by_node_weak(self):
         """
@@ -153,7 +366,7 @@ class IPFormulation:
         for i in self.graph.nodes():
             flag = True
             for k in self.terminals:
-                if round(self.x_variables[i][k].varValue, 5) == 1.0:
+                if round(value(self.x_variables[i][k]), 5) == 1.0:
                     self.possible_terminals_by_node_weak[i].add(k)
                     flag = False
             if flag:
@@ -168,7 +381,13 @@ class IPFormulation:
         }
         for i in self.graph.nodes():
             for k in self.terminals:
-                if self.x_variables[i][k].varValue > 0.0:
+                x = self.x_variables[i][k]
+                if isinstance(x, LpVariable):
+                    positive = x.varValue > 0.0
+                else:
+                    # a compact expression carries the rounding errors of its terms
+                    positive = round(value(x), 9) > 0.0
+                if positive:
                     self.possible_terminals_by_node_strong[i].add(k)
 
     def _calculate_source_sets(self):
@@ -178,7 +397,7 @@ class IPFormulation:
         self.source_sets = {terminal: set() for terminal in self.terminals}
         for i in self.graph.nodes():
             for k in self.terminals:
-                if round(self.x_variables[i][k].varValue, 5) == 1.0:
+                if round(value(self.x_variables[i][k]), 5) == 1.0:
                     self.source_sets[k].add(i)
 
     def _calculate_cut_value(self):
@@ -189,6 +408,10 @@ class IPFormulation:
         """get: self.cut_value"""
         return self.cut_value
 
+    def is_optimal(self):
+        """If the solver proved the last solution optimal, e.g. no limit hit."""
+        return self.mdl is not None and self.mdl.sol_status == pulp.LpSolutionOptimal
+
     def get_possible_terminals_by_node_weak(self):
         """get: self.possible_terminals_by_node_weak"""
         return self.possible_terminals_by_node_weak
@@ -201,28 +424,40 @@ class IPFormulation:
         """get: self.source_sets"""
         return self.source_sets
 
-    def solve_ip(self):
-        """Solves the Integer Program."""
-        self._initialize_model()
-        self._initialize_node_variables_ip()
-        self._initialize_edge_variables_ip()
-        self._initialize_objective()
-        self._initialize_contraint_nodes()
-        self._initialize_constraint_edges()
-        self._initialize_constraint_terminals()
+    def build_ip(self):
+        """Builds the model of the Integer Program without solving it."""
+        if self.compact:
+            self._build_compact(LpInteger)
+        else:
+            self._build_standard(LpInteger)
+
+    def build_lp(self):
+        """Builds the model of the Linear Program without solving it."""
+        if self.compact:
+            self._build_compact(LpContinuous)
+        else:
+            self._build_standard(LpContinuous)
+
+    def solve_ip(self, initial_partition=None):
+        """Solves the Integer Program.
+
+        Args:
+            initial_partition: a known multiway cut, as a dictionary of sets
+                of nodes by terminal like get_source_sets, which the solver
+                starts from. Its value is an objective cutoff, so that only
+                better solutions are searched for. Missing nodes are
+                assigned greedily.
+        """
+        self.build_ip()
+        if initial_partition is not None:
+            self._set_initial_partition(initial_partition)
         self._run_solver()
         self._calculate_cut_value()
         self._calculate_source_sets()
 
     def solve_lp(self):
         """Solves the Linear Program."""
-        self._initialize_model()
-        self._initialize_node_variables_lp()
-        self._initialize_edge_variables_lp()
-        self._initialize_objective()
-        self._initialize_contraint_nodes()
-        self._initialize_constraint_edges()
-        self._initialize_constraint_terminals()
+        self.build_lp()
         self._run_solver()
         self._calculate_cut_value()
         self._calculate_source_sets()
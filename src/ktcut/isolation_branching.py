@@ -1,9 +1,41 @@
 """ Solves the k-Terminal Cut Problem with Isolation Branching. """
-from ktcut.lp_algorithm import lp_algorithm
+import time
+
+import numpy as np
+
+from ktcut.checkpoint import load_state
+from ktcut.checkpoint import save_state
+from ktcut.csr_graph import CSRGraph
+from ktcut.decomposition import combine_reports
+from ktcut.decomposition import decompose as decompose_instance
+from ktcut.isolation_branching_tree import IsolationBranchingEvent
 from ktcut.isolation_branching_tree import IsolationBranchingTree
 
 
-def isolation_branching(graph, terminals, persistence=None, reporting=True, time_limit=600):
+def isolation_branching(
+    graph,
+    terminals,
+    persistence=None,
+    reporting=True,
+    time_limit=600,
+    workers=None,
+    root_cuts="sequential",
+    decompose=True,
+    kernelize=True,
+    warm_start=None,
+    lazy=False,
+    isolating_cut_bound=False,
+    heuristic_period=100,
+    initial_partition=None,
+    branching="degree",
+    node_selection="best",
+    max_frontier_nodes=None,
+    max_frontier_bytes=None,
+    metrics=None,
+    cache=None,
+    checkpoint=None,
+    checkpoint_period=None,
+):
     """Solves k-Terminal Cut for given graph and terminals.
 
     The k-terminal cut partitions the graph into k sets
@@ -11,7 +43,7 @@ def isolation_branching(graph, terminals, persistence=None, reporting=True, time
         and the total weight of edges between sets is minimized.
 
     Assumes that the graph has 'capacity' along each edge. Otherwise,
-        assumes the capacity should be 1.0.
+        assumes the capacity should be 1.0. The graph is not modified.
 
     Args:
         graph: the networkx graph in which to find the multi-terminal cut
@@ -20,31 +52,420 @@ def isolation_branching(graph, terminals, persistence=None, reporting=True, time
         reporting: if the branching solver should print results as it goes
         time_limit: the time after which to terminate,
             even if the optimal solution has not yet been reached.
+        workers: if greater than 1, the number of processes used to expand
+            nodes of the branching tree in parallel.
+        root_cuts: "bipartition" computes the initial isolating cuts with
+            O(log k) max-flows instead of k, which pays off for many terminals.
+        decompose: if the graph is split at the terminals into independent
+            parts, see decomposition.decompose. Only the parts adjacent to
+            two or more terminals are branched on.
+        kernelize: if the kernel of every part is shrunk by safe reductions
+            before branching.
+        warm_start: if the max-flows of children start from the flows of
+            their parents, which costs a flow array per unexplored node. If
+            None, only on kernels with at most WARM_START_MAX_EDGES edges.
+        lazy: if the children of a node are only evaluated when they are
+            taken from the frontier, which saves the max-flows of children
+            that get pruned first.
+        isolating_cut_bound: if every node is bounded by half the sum of
+            the minimum isolating cuts of all terminals, recomputed and
+            merged at the node.
+        heuristic_period: the primal heuristics improving the best known cut
+            run at the root and on every heuristic_period-th expanded node,
+            or only at the root if None.
+        initial_partition: a known multiway cut, as a dictionary of sets of
+            nodes by terminal like the returned source_sets, to start from.
+            Missing nodes are assigned greedily.
+        branching: how the vertex to branch on is chosen, one of "degree",
+            "terminal_capacity", "pseudocost" and "strong", or a
+            BranchingStrategy, see isolation_branching_strategies.
+        node_selection: the order in which nodes are expanded, "best",
+            "depth" or "hybrid", see IsolationBranchingTree.solve_iter.
+        max_frontier_nodes: the number of unexplored nodes, per part, above
+            which nodes are expanded depth-first to bound the memory.
+        max_frontier_bytes: the same budget in estimated bytes, above which
+            new nodes also drop their warm-start flows.
+        metrics: an IsolationBranchingMetrics collecting counters, timers and
+            peak memory over all parts, whose callbacks, e.g. a JsonLinesSink,
+            are called at its interval.
+        cache: a ResultCache holding the persistence LP of the kernels, the
+            initial isolating cuts of every part and the solved partition,
+            which are reused when the same graph and terminals come again.
+        checkpoint: if given, the path to which the run is saved when the
+            time limit stops it before it is solved. It can be continued
+            with resume_isolation_branching, e.g. in a later time slice.
+        checkpoint_period: if given, the run is also saved every
+            checkpoint_period seconds
 
     Returns:
         source_sets: the partition of the nodes of the graph which defines the minimum cut
         cut_value: the weight of the optimal multi-terminal cut
         report: the final values in the Isolation Branching tree
     """
-    for u, v in graph.edges:
-        if "capacity" in graph[u][v]:
-            continue
-        else:
-            graph[u][v]["capacity"] = 1.0
+    if cache is not None:
+        # converted once, for the fingerprint and the run
+        graph = CSRGraph.from_networkx(graph)
+        key = cache.key("partition", graph, terminals, persistence)
+        result = cache.get(key)
+        if result is not None:
+            return result
+    event, report = _exhaust(
+        isolation_branching_iter(
+            graph,
+            terminals,
+            persistence=persistence,
+            reporting=reporting,
+            time_limit=time_limit,
+            workers=workers,
+            root_cuts=root_cuts,
+            decompose=decompose,
+            kernelize=kernelize,
+            warm_start=warm_start,
+            lazy=lazy,
+            isolating_cut_bound=isolating_cut_bound,
+            heuristic_period=heuristic_period,
+            initial_partition=initial_partition,
+            branching=branching,
+            node_selection=node_selection,
+            max_frontier_nodes=max_frontier_nodes,
+            max_frontier_bytes=max_frontier_bytes,
+            metrics=metrics,
+            cache=cache,
+            checkpoint=checkpoint,
+            checkpoint_period=checkpoint_period,
+        )
+    )
+    result = event.source_sets, event.cut_value, report
+    if cache is not None and event.kind == "solved":
+        cache.put(key, result)
+    return result
 
-    if persistence in {"strong", "weak"}:
-        terminals_by_vertex = lp_algorithm(graph, terminals, persistence=persistence)
-    else:
-        terminals_by_vertex = {node: terminals for node in graph.nodes()}
 
-    branch_and_bound_tree = IsolationBranchingTree(
-        graph, terminals=terminals, terminals_by_vertex=terminals_by_vertex
+def isolation_branching_iter(
+    graph,
+    terminals,
+    persistence=None,
+    reporting=True,
+    time_limit=600,
+    workers=None,
+    root_cuts="sequential",
+    decompose=True,
+    kernelize=True,
+    warm_start=None,
+    lazy=False,
+    isolating_cut_bound=False,
+    heuristic_period=100,
+    initial_partition=None,
+    branching="degree",
+    node_selection="best",
+    max_frontier_nodes=None,
+    max_frontier_bytes=None,
+    metrics=None,
+    cache=None,
+    checkpoint=None,
+    checkpoint_period=None,
+):
+    """Solves k-Terminal Cut, yielding events as the bounds improve.
+
+    Takes the same arguments as isolation_branching. The first event comes
+        once the root of every part is solved, with the cut of the primal
+        heuristics, so a usable cut is available long before optimality is
+        proven. The caller may stop iterating at any time and keep the
+        latest cut; the parts are then left unsolved.
+
+    Yields:
+        an IsolationBranchingEvent for the roots, for every improvement of
+            either bound of the whole instance, and a final one which is
+            "solved" once every part is solved, or "stopped"
+
+    Returns:
+        the report of isolation_branching, as the value of the StopIteration
+            raised once the events are exhausted
+    """
+    run = _prepare_run(
+        graph,
+        terminals,
+        decompose,
+        _tree_options(
+            root_cuts=root_cuts,
+            kernelize=kernelize,
+            warm_start=warm_start,
+            persistence=persistence,
+            lazy=lazy,
+            isolating_cut_bound=isolating_cut_bound,
+            heuristic_period=heuristic_period,
+            initial_partition=initial_partition,
+            branching=branching,
+            node_selection=node_selection,
+            max_frontier_nodes=max_frontier_nodes,
+            max_frontier_bytes=max_frontier_bytes,
+        ),
     )
+    for event in _iterate_trees(
+        run,
+        reporting,
+        time_limit,
+        workers,
+        checkpoint,
+        checkpoint_period,
+        metrics,
+        cache,
+    ):
+        yield event
+    return _run_report(run, event)
+
+
+def resume_isolation_branching(
+    checkpoint,
+    reporting=True,
+    time_limit=600,
+    workers=None,
+    checkpoint_period=None,
+    metrics=None,
+):
+    """Continues a run of isolation_branching saved to a checkpoint.
+
+    The run may be resumed in another process, any number of times, each
+        time for at most time_limit seconds. The checkpoint is saved again
+        if the time limit stops the run before it is solved.
+
+    Args:
+        checkpoint: the path of the checkpoint
+        reporting: if the branching solver should print results as it goes
+        time_limit: the time after which to terminate this call
+        workers: the number of processes, as in isolation_branching
+        checkpoint_period: if given, the checkpoint is also saved every
+            checkpoint_period seconds
+        metrics: the IsolationBranchingMetrics to continue with, if any
+
+    Returns:
+        source_sets, cut_value and report, as returned by isolation_branching
+    """
+    run = load_state(checkpoint)
+    for event in _iterate_trees(
+        run, reporting, time_limit, workers, checkpoint, checkpoint_period, metrics
+    ):
+        pass
+    return event.source_sets, event.cut_value, _run_report(run, event)
+
+
+def _tree_options(
+    root_cuts="sequential",
+    kernelize=True,
+    warm_start=None,
+    persistence=None,
+    lazy=False,
+    isolating_cut_bound=False,
+    heuristic_period=100,
+    initial_partition=None,
+    branching="degree",
+    node_selection="best",
+    max_frontier_nodes=None,
+    max_frontier_bytes=None,
+):
+    """The options of IsolationBranchingTree.solve_iter for every part.
+
+    Returns:
+        a dictionary of the arguments by name
+    """
+    return {
+        "root_cuts": root_cuts,
+        "kernelize": kernelize,
+        "warm_start": warm_start,
+        "persistence": persistence,
+        "lazy": lazy,
+        "isolating_cut_bound": isolating_cut_bound,
+        "heuristic_period": heuristic_period,
+        "initial_partition": initial_partition,
+        "branching": branching,
+        "node_selection": node_selection,
+        "max_frontier_nodes": max_frontier_nodes,
+        "max_frontier_bytes": max_frontier_bytes,
+    }
+
+
+def _exhaust(events):
+    """Runs a generator to its end.
+
+    Returns:
+        the last value it yielded and the value it returned
+    """
+    event = None
+    while True:
+        try:
+            event = next(events)
+        except StopIteration as stop:
+            return event, stop.value
+
+
+def _prepare_run(graph, terminals, decompose, options):
+    """Splits an instance into parts and creates the tree of every part.
+
+    Args:
+        graph: the networkx graph, or a CSRGraph already converted from it,
+            which is shared by the queries of isolation_branching_batch
+
+    Returns:
+        the run, a dictionary holding the trees and what is needed to
+            combine their results, which is saved to checkpoints
+    """
+    if isinstance(graph, CSRGraph):
+        csr_graph = graph
+    else:
+        csr_graph = CSRGraph.from_networkx(graph)
+    terminal_ids = csr_graph.indices_of(terminals)
+
+    if decompose:
+        parts, assignment, terminal_capacity = decompose_instance(
+            csr_graph, terminal_ids
+        )
+    else:
+        parts = [(csr_graph, terminal_ids, np.arange(csr_graph.vertex_count))]
+        assignment = np.full(csr_graph.vertex_count, -1, dtype=np.int64)
+        terminal_capacity = 0.0
+
+    source_sets = {
+        csr_graph.labels[terminal]: {
+            csr_graph.labels[vertex]
+            for vertex in np.flatnonzero(assignment == terminal)
+        }
+        for terminal in terminal_ids
+    }
+    trees = []
+    for part_graph, part_terminals, _ in parts:
+        trees.append(IsolationBranchingTree(part_graph, terminals=part_terminals))
+    return {
+        "source_sets": source_sets,
+        "terminal_capacity": terminal_capacity,
+        "decompose": decompose,
+        "trees": trees,
+        "time_elapsed": 0.0,
+        "options": options,
+    }
+
+
+def _iterate_trees(
+    run,
+    reporting,
+    time_limit,
+    workers,
+    checkpoint,
+    checkpoint_period,
+    metrics,
+    cache=None,
+):
+    """Solves, or continues solving, the trees of the parts of a run.
+
+    The roots of all the trees are solved first, so that every event holds
+        a cut of the whole instance. The trees are then branched one after
+        the other, all until the same time limit.
+
+    Yields:
+        IsolationBranchingEvent, see isolation_branching_iter
+    """
+    start_time = time.time()
+    time_elapsed = run["time_elapsed"]
+
+    def save():
+        run["time_elapsed"] = time_elapsed + time.time() - start_time
+        save_state(run, checkpoint)
+
+    generators = []
+    for branch_and_bound_tree in run["trees"]:
+        if branch_and_bound_tree.started:
+            generators.append(
+                branch_and_bound_tree.resume_iter(
+                    reporting=reporting,
+                    time_limit=time_limit,
+                    workers=workers,
+                    checkpoint=None if checkpoint is None else save,
+                    checkpoint_period=checkpoint_period,
+                    metrics=metrics,
+                )
+            )
+        else:
+            generators.append(
+                branch_and_bound_tree.solve_iter(
+                    reporting=reporting,
+                    time_limit=time_limit,
+                    workers=workers,
+                    checkpoint=None if checkpoint is None else save,
+                    checkpoint_period=checkpoint_period,
+                    metrics=metrics,
+                    cache=cache,
+                    **run["options"],
+                )
+            )
+    events = [next(generator) for generator in generators]
+    source_sets = None
+
+    def run_state():
+        trees = run["trees"]
+        return {
+            "Time Elapsed": time_elapsed + time.time() - start_time,
+            "Best Upper Bound": run["terminal_capacity"]
+            + sum(tree.best_upper_bound for tree in trees),
+            "Lower Bound": run["terminal_capacity"]
+            + sum(tree.lower_bound for tree in trees),
+            "Nodes Unexplored": sum(tree.unexplored_nodes_count for tree in trees),
+            "Nodes Total": sum(tree.total_nodes_count for tree in trees),
+        }
+
+    # the trees share the metrics, whose snapshots cover the whole run
+    if metrics is not None:
+        metrics.state_function = run_state
+
+    def combined_event(kind):
+        nonlocal source_sets
+        if source_sets is None or kind == "incumbent":
+            source_sets = {
+                terminal: set(source_set)
+                for terminal, source_set in run["source_sets"].items()
+            }
+            for event in events:
+                for terminal, source_set in event.source_sets.items():
+                    source_sets[terminal] |= source_set
+        cut_value = round(
+            run["terminal_capacity"] + sum(event.cut_value for event in events), 8
+        )
+        lower_bound = run["terminal_capacity"] + sum(
+            event.lower_bound for event in events
+        )
+        return IsolationBranchingEvent(
+            kind,
+            source_sets,
+            cut_value,
+            lower_bound,
+            (cut_value - lower_bound) / cut_value if cut_value > 0 else 0.0,
+            time_elapsed + time.time() - start_time,
+        )
 
-    source_sets, cut_value = branch_and_bound_tree.solve(reporting=reporting, time_limit=time_limit)
+    try:
+        yield combined_event("incumbent")
+        for position, generator in enumerate(generators):
+            for event in generator:
+                events[position] = event
+                if event.kind in {"incumbent", "lower_bound"}:
+                    yield combined_event(event.kind)
+        yield combined_event(
+            "solved" if all(event.kind == "solved" for event in events) else "stopped"
+        )
+    finally:
+        # stops the pool of a tree left in the middle by the caller
+        for generator in generators:
+            generator.close()
+        if metrics is not None:
+            metrics.state_function = None
 
-    return source_sets, cut_value, branch_and_bound_tree.report
 
+def _run_report(run, event):
+    """The report of a run, combined over its parts if it was decomposed."""
+    reports = [branch_and_bound_tree.report for branch_and_bound_tree in run["trees"]]
+    if run["decompose"]:
+        return combine_reports(
+            reports, event.source_sets, run["terminal_capacity"], event.time_elapsed
+        )
+    return reports[0]
 
 
 def isolation_branching_extended_results (graph, terminals, persistence=None, reporting=True, time_limit=600, return_removed_edges = False, return_partitions = False):
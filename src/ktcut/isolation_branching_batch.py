@@ -0,0 +1,118 @@
+"""Solves k-Terminal Cut for many terminal sets on the same graph."""
+import copy
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from ktcut.csr_graph import CSRGraph
+from ktcut.isolation_branching import _iterate_trees
+from ktcut.isolation_branching import _prepare_run
+from ktcut.isolation_branching import _run_report
+from ktcut.isolation_branching import _tree_options
+
+# set in each worker process of a pool by _attach_graph
+_worker_graph = None
+
+
+def isolation_branching_batch(
+    graph,
+    terminal_sets,
+    persistence=None,
+    time_limit=600,
+    workers=None,
+    root_cuts="sequential",
+    decompose=True,
+    kernelize=True,
+    warm_start=None,
+    lazy=False,
+    isolating_cut_bound=False,
+    heuristic_period=100,
+    branching="degree",
+    node_selection="best",
+    max_frontier_nodes=None,
+    max_frontier_bytes=None,
+):
+    """Solves k-Terminal Cut for every terminal set on one graph.
+
+    The graph is converted to a CSRGraph once for all the queries instead
+        of once per call of isolation_branching. Each worker process
+        receives it once, when it starts, and keeps the indexes the solver
+        builds on it, such as the arc tails and reverse arcs, for all the
+        queries it solves. Only this conversion is shared: the root cuts,
+        the kernel and the tree depend on the terminals, so every distinct
+        terminal set is solved from its root. A terminal set which appears
+        more than once, in any order, is solved once, in its first order.
+
+    Args:
+        graph: the networkx graph, with an optional 'capacity' on each edge
+        terminal_sets: an iterable of the terminals of every query
+        persistence: if persistence is assumed [strong, weak, None]
+        time_limit: the time limit of every query, in seconds
+        workers: if greater than 1, the number of processes which solve
+            queries concurrently, each query in a single process
+        root_cuts, decompose, kernelize, warm_start, lazy,
+            isolating_cut_bound, heuristic_period, branching, node_selection,
+            max_frontier_nodes and max_frontier_bytes: as in
+            isolation_branching, for every query
+
+    Returns:
+        a list of (source_sets, cut_value, report) for every terminal set,
+            in order, as returned by isolation_branching, where repeated
+            terminal sets get copies of the same result
+    """
+    csr_graph = CSRGraph.from_networkx(graph)
+    solve = partial(
+        _solve_query,
+        time_limit=time_limit,
+        decompose=decompose,
+        options=_tree_options(
+            root_cuts=root_cuts,
+            kernelize=kernelize,
+            warm_start=warm_start,
+            persistence=persistence,
+            lazy=lazy,
+            isolating_cut_bound=isolating_cut_bound,
+            heuristic_period=heuristic_period,
+            branching=branching,
+            node_selection=node_selection,
+            max_frontier_nodes=max_frontier_nodes,
+            max_frontier_bytes=max_frontier_bytes,
+        ),
+    )
+    # a terminal set asked for more than once is solved once
+    terminal_sets = [list(terminals) for terminals in terminal_sets]
+    keys = [frozenset(terminals) for terminals in terminal_sets]
+    # the first order of every set, since decompose assigns the components
+    # adjacent to no terminal to the first terminal
+    queries = {}
+    for key, terminals in zip(keys, terminal_sets):
+        queries.setdefault(key, terminals)
+    if workers is None or workers <= 1 or len(queries) <= 1:
+        results = [
+            solve(terminals, graph=csr_graph) for terminals in queries.values()
+        ]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(queries)),
+            initializer=_attach_graph,
+            initargs=(csr_graph,),
+        ) as executor:
+            results = list(executor.map(solve, queries.values()))
+    results_by_key = dict(zip(queries, results))
+    # repeated terminal sets get copies, which the caller may modify
+    return [copy.deepcopy(results_by_key[key]) for key in keys]
+
+
+def _attach_graph(csr_graph):
+    """Sets the graph shared by the queries solved in this worker process."""
+    global _worker_graph
+    _worker_graph = csr_graph
+
+
+def _solve_query(terminals, time_limit, decompose, options, graph=None):
+    """Solves one query, on the graph of the worker process if none is given."""
+    run = _prepare_run(
+        _worker_graph if graph is None else graph, terminals, decompose, options
+    )
+    for event in _iterate_trees(run, False, time_limit, None, None, None, None):
+        pass
+    return event.source_sets, event.cut_value, _run_report(run, event)
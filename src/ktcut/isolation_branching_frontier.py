@@ -0,0 +1,93 @@
+"""Defines the Frontier of unexplored nodes for Isolation Branching."""
+import heapq
+import itertools
+
+
+class IsolationBranchingFrontier:
+    """Priority queue of the unexplored nodes in the branch and bound tree.
+
+    Nodes are kept in two binary heaps, one ordered by lower bound and one
+        ordered by depth, so that either kind of node can be popped in
+        O(log n). A node popped from one heap is marked as removed and is
+        discarded lazily when it reaches the top of the other heap. Among
+        nodes with equal keys, the most recently pushed node comes first.
+
+    Attributes:
+        _by_lower_bound: heap of (lower_bound, -count, entry)
+        _by_depth: heap of (-depth, lower_bound, -count, entry)
+        _size: the number of nodes in the frontier
+        nbytes: the total memory of the nodes in the frontier, as estimated
+            when they were pushed
+    """
+
+    def __init__(self):
+        self._by_lower_bound = []
+        self._by_depth = []
+        self._counter = itertools.count()
+        self._size = 0
+        self.nbytes = 0
+
+    def __len__(self):
+        return self._size
+
+    def push(self, node, nbytes=0):
+        """Adds a node to the frontier, with an estimate of its memory."""
+        count = next(self._counter)
+        # the entry is shared by both heaps; it is emptied once popped
+        entry = [node, nbytes]
+        heapq.heappush(self._by_lower_bound, (node.lower_bound, -count, entry))
+        heapq.heappush(
+            self._by_depth, (-node.depth, node.lower_bound, -count, entry)
+        )
+        self._size += 1
+        self.nbytes += nbytes
+
+    def nodes(self):
+        """The nodes in the frontier, in the order they were pushed.
+
+        Pushing them in this order into an empty frontier restores it.
+        """
+        return [
+            entry[0]
+            for _, _, entry in sorted(
+                (item for item in self._by_lower_bound if item[-1][0] is not None),
+                key=lambda item: -item[1],
+            )
+        ]
+
+    @property
+    def best_lower_bound(self):
+        """The lowest lower bound in the frontier, in O(1) amortized."""
+        self._discard_removed(self._by_lower_bound)
+        return self._by_lower_bound[0][0]
+
+    def peek_maximum_depth(self):
+        """The deepest node, without removing it."""
+        self._discard_removed(self._by_depth)
+        return self._by_depth[0][-1][0]
+
+    def pop_best_lower_bound(self):
+        """Removes and returns the node with the lowest lower bound."""
+        return self._pop(self._by_lower_bound, self._by_depth)
+
+    def pop_maximum_depth(self):
+        """Removes and returns the deepest node, breaking ties by lower bound."""
+        return self._pop(self._by_depth, self._by_lower_bound)
+
+    def _pop(self, heap, other_heap):
+        self._discard_removed(heap)
+        entry = heapq.heappop(heap)[-1]
+        node = entry[0]
+        entry[0] = None
+        self._size -= 1
+        self.nbytes -= entry[1]
+        # rebuild the other heap once it is mostly made of removed entries
+        if len(other_heap) > 2 * self._size + 64:
+            other_heap[:] = [item for item in other_heap if item[-1][0] is not None]
+            heapq.heapify(other_heap)
+        return node
+
+    @staticmethod
+    def _discard_removed(heap):
+        while heap and heap[0][-1][0] is None:
+            heapq.heappop(heap)
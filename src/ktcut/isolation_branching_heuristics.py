@@ -0,0 +1,169 @@
+"""Primal heuristics building multiway cuts for Isolation Branching.
+
+Every heuristic takes a CSRGraph and an assignment, holding the terminal of
+    every vertex or -1, and returns a complete assignment. Vertices assigned
+    in the input keep their terminal, except in local_search.
+"""
+import numpy as np
+
+# gains below this value are not worth a move
+_EPSILON = 1e-9
+
+
+def cut_value(graph, assignment):
+    """The total capacity of the edges between different terminals."""
+    tails, heads, capacities = graph.edges()
+    return float(capacities[assignment[tails] != assignment[heads]].sum())
+
+
+def isolation_heuristic(graph, assignment, terminals):
+    """Keeps every source set except the heaviest, which takes the rest.
+
+    When the source sets are minimum isolating cuts, this is the classic
+        (2 - 2/k)-approximation of Dahlhaus et al.
+    """
+    leaving = (assignment[graph.arc_tails] >= 0) & (
+        assignment[graph.arc_tails] != assignment[graph.neighbors]
+    )
+    weights = np.bincount(
+        assignment[graph.arc_tails[leaving]],
+        weights=graph.capacities[leaving],
+        minlength=graph.vertex_count,
+    )[terminals]
+    return _assign_unassigned(assignment, terminals[np.argmax(weights)])
+
+
+def most_connected_terminal(graph, assignment, terminals):
+    """Assigns every unassigned vertex to one terminal, the most connected.
+
+    The resulting cut is at most the upper bound of the node the assignment
+        belongs to.
+    """
+    unassigned = assignment < 0
+    towards = unassigned[graph.neighbors] & (assignment[graph.arc_tails] >= 0)
+    connection = np.bincount(
+        assignment[graph.arc_tails[towards]],
+        weights=graph.capacities[towards],
+        minlength=graph.vertex_count,
+    )[terminals]
+    return _assign_unassigned(assignment, terminals[np.argmax(connection)])
+
+
+def greedy_assignment(graph, assignment, terminals):
+    """Assigns unassigned vertices to their most connected terminal.
+
+    In every round, each unassigned vertex next to an assigned vertex joins
+        the terminal it is most connected to. Vertices which never get an
+        assigned neighbor join the first terminal.
+    """
+    assignment = assignment.copy()
+    n = graph.vertex_count
+    while True:
+        unassigned = assignment < 0
+        if not unassigned.any():
+            break
+        arcs = unassigned[graph.arc_tails] & ~unassigned[graph.neighbors]
+        if not arcs.any():
+            assignment[unassigned] = terminals[0]
+            break
+        vertices, best_terminals, _ = _strongest_connections(
+            n,
+            graph.arc_tails[arcs],
+            assignment[graph.neighbors[arcs]],
+            graph.capacities[arcs],
+        )
+        assignment[vertices] = best_terminals
+    return assignment
+
+
+def partition_assignment(graph, terminals, partition):
+    """The complete assignment of a multiway cut given by vertex labels.
+
+    Args:
+        graph: the CSRGraph
+        terminals: the vertex ids of the terminals
+        partition: dictionary of sets of vertex labels by terminal label,
+            like the source_sets of isolation_branching. Vertices which are
+            missing, or given to a terminal which is not in terminals, are
+            assigned by greedy_assignment.
+
+    Returns:
+        the terminal vertex id of every vertex id
+    """
+    index = {label: vertex for vertex, label in enumerate(graph.labels)}
+    assignment = np.full(graph.vertex_count, -1, dtype=np.int64)
+    terminal_labels = {graph.labels[terminal] for terminal in terminals}
+    for terminal_label, vertex_labels in partition.items():
+        if terminal_label not in terminal_labels:
+            continue
+        vertices = [index[label] for label in vertex_labels if label in index]
+        assignment[vertices] = index[terminal_label]
+    assignment[terminals] = terminals
+    return greedy_assignment(graph, assignment, terminals)
+
+
+def local_search(graph, assignment, terminals, max_rounds=100):
+    """Moves vertices to the terminal they are most connected to.
+
+    In every round, all vertices whose move decreases the cut are found at
+        once. A vertex moves unless an adjacent candidate has a larger gain,
+        so that the moves of a round are independent and their gains add up.
+
+    Args:
+        graph: the CSRGraph
+        assignment: a complete assignment
+        terminals: the terminals, which never move
+        max_rounds: the maximum number of rounds of moves
+
+    Returns:
+        the improved assignment
+    """
+    assignment = assignment.copy()
+    n = graph.vertex_count
+    tails, heads, capacities = graph.arc_tails, graph.neighbors, graph.capacities
+    movable = np.ones(n, dtype=bool)
+    movable[terminals] = False
+    for _ in range(max_rounds):
+        own = assignment[heads] == assignment[tails]
+        own_connection = np.bincount(tails[own], weights=capacities[own], minlength=n)
+        vertices, best_terminals, best_connection = _strongest_connections(
+            n, tails[~own], assignment[heads[~own]], capacities[~own]
+        )
+        gain = np.zeros(n)
+        gain[vertices] = best_connection - own_connection[vertices]
+        best = np.full(n, -1, dtype=np.int64)
+        best[vertices] = best_terminals
+        candidates = movable & (gain > _EPSILON)
+        if not candidates.any():
+            break
+        beaten = (gain[heads] > gain[tails]) | (
+            (gain[heads] == gain[tails]) & (heads < tails)
+        )
+        blocked = np.zeros(n, dtype=bool)
+        blocked[tails[candidates[tails] & candidates[heads] & beaten]] = True
+        move = candidates & ~blocked
+        assignment[move] = best[move]
+    return assignment
+
+
+def _strongest_connections(n, tails, labels, capacities):
+    """The label every tail is most connected to, over the given arcs.
+
+    Returns:
+        vertices: the distinct tails
+        best_labels: the most connected label of each of them
+        best_connection: the capacity towards that label
+    """
+    keys, inverse = np.unique(tails * n + labels, return_inverse=True)
+    connection = np.bincount(inverse.ravel(), weights=capacities)
+    key_tails = keys // n
+    order = np.lexsort((-connection, key_tails))
+    vertices, first = np.unique(key_tails[order], return_index=True)
+    strongest = order[first]
+    return vertices, keys[strongest] % n, connection[strongest]
+
+
+def _assign_unassigned(assignment, terminal):
+    assignment = assignment.copy()
+    assignment[assignment < 0] = terminal
+    return assignment
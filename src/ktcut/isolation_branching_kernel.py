@@ -0,0 +1,125 @@
+"""Safe reduction rules shrinking the kernel before Isolation Branching.
+
+Every rule merges vertices which some optimal multiway cut keeps together,
+    so the optimal cut value of the kernel is unchanged. A rule returns a
+    vertex map for CSRGraph.quotient in which every terminal keeps a
+    separate vertex.
+"""
+import numpy as np
+
+# relative tolerance when comparing capacities
+_TOLERANCE = 1e-9
+
+
+def heavy_edge_map(graph, terminals):
+    """Merges each non-terminal into the neighbor of its heaviest edge.
+
+    If an edge {v, u} carries at least half of the weighted degree of a
+        non-terminal v, moving v to the side of u never increases the cut,
+        so v can be contracted into u. This subsumes vertices of degree one
+        and chains of vertices of degree two. A vertex without edges is
+        merged into the first terminal.
+
+    Every non-terminal points to at most one neighbor, so the merged groups
+        are the connected components of a graph in which every component
+        holds at most one terminal. Contracting a component one vertex at a
+        time, starting next to its terminal or on its cycle, only applies
+        the rule to single vertices, so the whole component may be merged.
+
+    Args:
+        graph: the kernel CSRGraph
+        terminals: the vertex ids of the terminals
+
+    Returns:
+        vertex_map: the new vertex id of every vertex
+        vertex_count: the number of vertices after merging
+    """
+    n = graph.vertex_count
+    pointer = np.arange(n, dtype=np.int64)
+    degrees = graph.weighted_degrees()
+    rows = np.flatnonzero(np.diff(graph.offsets))
+    if len(rows):
+        heaviest = np.maximum.reduceat(graph.capacities, graph.offsets[rows])
+        maximum = np.zeros(n)
+        maximum[rows] = heaviest
+        is_heaviest = graph.capacities >= maximum[graph.arc_tails]
+        tails, first = np.unique(graph.arc_tails[is_heaviest], return_index=True)
+        pointer[tails] = graph.neighbors[np.flatnonzero(is_heaviest)[first]]
+        heavy = 2.0 * maximum >= degrees * (1.0 - _TOLERANCE)
+        pointer[~heavy] = np.flatnonzero(~heavy)
+    pointer[degrees == 0] = terminals[0]
+    pointer[terminals] = terminals
+    return _components(pointer)
+
+
+def twin_map(graph, terminals):
+    """Merges non-terminals with identical weighted neighborhoods.
+
+    Twins are never adjacent and always prefer the same terminal, so moving
+        one of them to the side of the other never increases the cut.
+
+    Args:
+        graph: the kernel CSRGraph
+        terminals: the vertex ids of the terminals
+
+    Returns:
+        vertex_map: the new vertex id of every vertex
+        vertex_count: the number of vertices after merging
+    """
+    n = graph.vertex_count
+    pointer = np.arange(n, dtype=np.int64)
+    counts = np.diff(graph.offsets)
+    candidates = counts > 0
+    candidates[terminals] = False
+    rows = np.flatnonzero(candidates)
+    if len(rows) < 2:
+        return _components(pointer)
+
+    # rows with equal fingerprints are compared exactly below
+    random = np.random.default_rng(0).random((2, n))
+    fingerprints = [
+        np.bincount(
+            graph.arc_tails,
+            weights=weights[graph.neighbors] * graph.capacities,
+            minlength=n,
+        )[rows]
+        for weights in random
+    ]
+    order = np.lexsort((fingerprints[1], fingerprints[0], counts[rows]))
+    rows = rows[order]
+    keys = np.stack([counts[rows], fingerprints[0][order], fingerprints[1][order]])
+    same = np.flatnonzero(np.all(keys[:, 1:] == keys[:, :-1], axis=0))
+    for position in same.tolist():
+        u, v = rows[position], rows[position + 1]
+        u_arcs = slice(graph.offsets[u], graph.offsets[u + 1])
+        v_arcs = slice(graph.offsets[v], graph.offsets[v + 1])
+        if np.array_equal(
+            graph.neighbors[u_arcs], graph.neighbors[v_arcs]
+        ) and np.array_equal(graph.capacities[u_arcs], graph.capacities[v_arcs]):
+            pointer[v] = u
+    return _components(pointer)
+
+
+def terminal_edges(graph, terminals):
+    """The arcs between two terminals, which every multiway cut contains.
+
+    Returns:
+        boolean array over the arcs of graph
+    """
+    is_terminal = np.zeros(graph.vertex_count, dtype=bool)
+    is_terminal[terminals] = True
+    return is_terminal[graph.arc_tails] & is_terminal[graph.neighbors]
+
+
+def _components(pointer):
+    """Numbers the connected components of the edges {v, pointer[v]}."""
+    label = np.arange(len(pointer), dtype=np.int64)
+    while True:
+        new_label = np.minimum(label, label[pointer])
+        np.minimum.at(new_label, pointer, label)
+        new_label = new_label[new_label]
+        if np.array_equal(new_label, label):
+            break
+        label = new_label
+    roots, vertex_map = np.unique(label, return_inverse=True)
+    return vertex_map.ravel(), len(roots)
@@ -0,0 +1,143 @@
+"""Counters, timers and callbacks monitoring an Isolation Branching solve.
+
+The tree updates an IsolationBranchingMetrics as it goes, which only costs
+    a clock read per phase and a dictionary update per counter. Callbacks
+    receive a snapshot of the metrics at most once per interval, so that
+    monitoring never becomes a hot path.
+"""
+import contextlib
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# phases timed by the tree
+PHASES = (
+    "root",
+    "node selection",
+    "assignment",
+    "vertex selection",
+    "evaluation",
+    "heuristics",
+    "checkpoint",
+)
+
+
+class IsolationBranchingMetrics:
+    """Counters and timers of a solve, reported to callbacks periodically.
+
+    Attributes:
+        counters: dictionary of counts by name, e.g. "nodes expanded"
+        timers: dictionary of the seconds spent in every phase of PHASES
+        peak_frontier_nodes: the most nodes the frontier held at once
+        peak_frontier_bytes: the most memory the frontier held at once, as
+            estimated by IsolationBranchingNode.nbytes
+        callbacks: functions called with a snapshot every interval seconds
+        interval: the minimum time between two calls of the callbacks
+        state_function: if set, a function returning the state to include in
+            snapshots instead of that of the notifying tree, e.g. the state
+            of a whole run whose parts are solved by several trees
+    """
+
+    def __init__(self, callbacks=(), interval=1.0):
+        self.counters = {}
+        self.timers = {phase: 0.0 for phase in PHASES}
+        self.peak_frontier_nodes = 0
+        self.peak_frontier_bytes = 0
+        self.callbacks = list(callbacks)
+        self.interval = interval
+        self.state_function = None
+        self._last_call = None
+
+    def __getstate__(self):
+        # callbacks are not saved to checkpoints
+        state = dict(self.__dict__)
+        state["callbacks"] = []
+        state["state_function"] = None
+        state["_last_call"] = None
+        return state
+
+    def count(self, name, increment=1):
+        self.counters[name] = self.counters.get(name, 0) + increment
+
+    @contextlib.contextmanager
+    def timer(self, phase):
+        """Adds the time spent in the with block to a phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[phase] = (
+                self.timers.get(phase, 0.0) + time.perf_counter() - start
+            )
+
+    def observe_frontier(self, frontier):
+        """Updates the peak size of the frontier."""
+        self.peak_frontier_nodes = max(self.peak_frontier_nodes, len(frontier))
+        self.peak_frontier_bytes = max(self.peak_frontier_bytes, frontier.nbytes)
+
+    def due(self):
+        """If the interval since the last call of the callbacks has passed."""
+        return (
+            self._last_call is None
+            or time.perf_counter() - self._last_call >= self.interval
+        )
+
+    def notify(self, state):
+        """Calls the callbacks with a snapshot, including the given state."""
+        self._last_call = time.perf_counter()
+        if self.callbacks:
+            if self.state_function is not None:
+                state = self.state_function()
+            snapshot = self.snapshot(state)
+            for callback in self.callbacks:
+                callback(snapshot)
+
+    def snapshot(self, state=None):
+        """The metrics as a dictionary of plain numbers.
+
+        Args:
+            state: a dictionary of values of the tree to include, if any
+        """
+        snapshot = dict(state or {})
+        snapshot.update(
+            {
+                "Counters": dict(self.counters),
+                "Timers": dict(self.timers),
+                "Peak Frontier Nodes": self.peak_frontier_nodes,
+                "Peak Frontier Bytes": self.peak_frontier_bytes,
+                "Peak Memory Bytes": peak_memory(),
+            }
+        )
+        return snapshot
+
+
+class JsonLinesSink:
+    """Callback appending every snapshot to a file as one line of JSON."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, snapshot):
+        with open(self.path, "a") as file:
+            file.write(json.dumps(snapshot, default=_to_json) + "\n")
+
+
+def peak_memory():
+    """The peak resident memory of this process in bytes, or None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _to_json(value):
+    # numpy scalars and other numbers
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
@@ -1,71 +1,314 @@
 """Defines a Node in the Branch and Bound Tree for Isolation Branching."""
-from copy import deepcopy
-from ktcut.contract_vertices import contract_vertex
-from ktcut.contract_vertices import contract_vertices
-from ktcut.minimum_isolating_cut import minimum_isolating_cut
+import numpy as np
+from ktcut.minimum_isolating_cut import minimum_isolating_cut_csr
+
+# the memory of a node object with its slots and flows dictionary, in bytes
+_NODE_OVERHEAD = 512
+
+
+def evaluate_child(graph, assignment, new_vertex, new_vertex_terminal, flow=None):
+    """Evaluates the child obtained by adding a vertex to a source set.
+
+    The vertex is added to the source set of its terminal, after which the
+        minimum isolating cut of that terminal is merged into it as well.
+        The assignment is restored before returning.
+
+    Args:
+        graph: the shared kernel CSRGraph
+        assignment: the terminal of every vertex in the parent, or -1
+        new_vertex: the lonely vertex to add to a terminal
+        new_vertex_terminal: the terminal to add the lonely vertex
+        flow: a flow of the parent isolating new_vertex_terminal, if any;
+            it stays feasible in the child and warm-starts the max-flow
+
+    Returns:
+        delta: the vertices newly assigned to new_vertex_terminal
+        terminal_terminal_change: the change in terminal-terminal capacity
+        terminal_vertex_change: the change in terminal-vertex capacity
+        flow: the maximum flow isolating new_vertex_terminal in the child
+    """
+    assignment[new_vertex] = new_vertex_terminal
+    source_mask = assignment == new_vertex_terminal
+    sink_mask = (assignment >= 0) & ~source_mask
+    assignment[new_vertex] = -1
+    source_set, weight, flow = minimum_isolating_cut_csr(
+        graph, source_mask=source_mask, sink_mask=sink_mask, flow=flow
+    )
+    delta = np.flatnonzero(source_set & (assignment < 0))
+    terminal_terminal_change, terminal_vertex_change = _capacity_changes(
+        graph, assignment, delta, new_vertex_terminal
+    )
+    return delta, terminal_terminal_change, terminal_vertex_change, flow
+
+
+def _capacity_changes(graph, assignment, delta, terminal):
+    """The changes in capacities when unassigned vertices join a terminal.
+
+    Returns:
+        terminal_terminal_change: the change in terminal-terminal capacity
+        terminal_vertex_change: the change in terminal-vertex capacity
+    """
+    # classify the edges leaving the delta by the current assignment
+    arcs = graph.row_arcs(delta)
+    capacities = graph.capacities[arcs]
+    assignment[delta] = -2
+    head_assignment = assignment[graph.neighbors[arcs]]
+    assignment[delta] = -1
+    to_unassigned = head_assignment == -1
+    to_same_terminal = head_assignment == terminal
+    to_other_terminal = (head_assignment >= 0) & ~to_same_terminal
+
+    terminal_terminal_change = float(capacities[to_other_terminal].sum())
+    terminal_vertex_change = float(
+        capacities[to_unassigned].sum()
+        - capacities[to_same_terminal].sum()
+        - terminal_terminal_change
+    )
+    return terminal_terminal_change, terminal_vertex_change
 
 
 class IsolationBranchingNode:
     """Node in the isolation branching tree for k-terminal cut.
 
+    A node does not own a graph. It is an overlay on the kernel graph shared by
+        the whole tree, storing only the vertices it assigned in addition to
+        its parent. The full assignment is materialized on demand.
+
+    A child may be created lazily, as a stub which only holds a lower bound
+        derived from its parent. Its isolating cut is computed by evaluate,
+        once the stub is taken from the frontier.
+
     Attributes:
-        input_graph: a graph in which all previous isolating cuts
+        graph: the kernel CSRGraph in which the root isolating cuts
             have been merged to terminals
-        input_terminals: terminals in the graph
+        terminals: vertex ids of the terminals in the graph
+        parent: the parent node, or None at the top of the tree
         new_vertex: the lonely vertex to add to a terminal
             from the parent node
         new_vertex_terminal: the terminal to add the lonely vertex
             from the parent node
+        delta: the vertices assigned to new_vertex_terminal by this node,
+            or None while the node is a stub
+        extra_delta: the vertices and their terminals assigned by
+            isolate_all_terminals, or None
+        flows: the latest maximum flow isolating each terminal, shared with
+            the parent except for new_vertex_terminal, or None if isolating
+            cuts are not warm-started
     """
 
+    __slots__ = (
+        "graph",
+        "terminals",
+        "parent",
+        "new_vertex",
+        "new_vertex_terminal",
+        "depth",
+        "delta",
+        "extra_delta",
+        "flows",
+        "unassigned_count",
+        "lower_bound",
+        "upper_bound",
+        "_terminal_terminal_capacity",
+        "_terminal_vertex_capacity",
+        "_assignment",
+    )
+
     def __init__(
         self,
-        input_graph,
-        input_terminals,
-        new_vertex,
-        new_vertex_terminal,
+        graph,
+        terminals,
+        parent=None,
+        new_vertex=None,
+        new_vertex_terminal=None,
         depth=0,
+        evaluation=None,
+        flows=None,
+        removed_capacity=0.0,
+        stub_lower_bound=None,
     ):
-
-        # deep copy at this level is important
-        self.graph = deepcopy(input_graph)
-        self.terminals = input_terminals
+        self.graph = graph
+        self.terminals = terminals
+        self.parent = parent
         self.new_vertex = new_vertex
         self.new_vertex_terminal = new_vertex_terminal
         self.depth = depth
-
-        self.children = []
+        self.extra_delta = None
+        self._assignment = None
 
         # run expansions
-        if self.new_vertex is not None and self.new_vertex_terminal is not None:
-            self._source_set_add_vertex()
-            self._source_set_isolating_cut()
+        if self.parent is not None:
+            self.flows = None
+            if evaluation is None and stub_lower_bound is not None:
+                self.delta = None
+                self.unassigned_count = parent.unassigned_count - 1
+                self.lower_bound = stub_lower_bound
+                self.upper_bound = np.inf
+            else:
+                self.evaluate(evaluation)
+        else:
+            self.delta = np.zeros(0, dtype=np.int64)
+            self.flows = flows
+            self._assignment = np.full(graph.vertex_count, -1, dtype=np.int64)
+            self._assignment[terminals] = terminals
+            self.unassigned_count = graph.vertex_count - len(terminals)
+            (
+                self._terminal_terminal_capacity,
+                self._terminal_vertex_capacity,
+            ) = self._sum_of_terminal_adjacent_edges()
+            # edges between terminals removed from the graph are always cut
+            self._terminal_terminal_capacity += removed_capacity
+            self._update_bounds()
 
-        terminal_terminal_capacity, terminal_vertex_capacity = self._sum_of_terminal_adjacent_edges()
+    @property
+    def is_stub(self):
+        """If the isolating cut of this node has not been computed yet."""
+        return self.delta is None
 
-        self.lower_bound = terminal_terminal_capacity + terminal_vertex_capacity / 2.0
-        self.upper_bound = terminal_terminal_capacity + terminal_vertex_capacity
+    def evaluate(self, evaluation=None):
+        """Computes the isolating cut and the bounds of a child node.
 
-    def _source_set_add_vertex(self):
-        # copy required because we try adding the same vertex
-        # to several source sets
-        self.graph = contract_vertex(
-            self.graph, self.new_vertex_terminal, self.new_vertex
+        Args:
+            evaluation: the result of evaluate_child, if already computed
+        """
+        parent = self.parent
+        if evaluation is None:
+            evaluation = evaluate_child(
+                self.graph,
+                parent.assignment,
+                self.new_vertex,
+                self.new_vertex_terminal,
+                parent.flow_isolating(self.new_vertex_terminal),
+            )
+        delta, terminal_terminal_change, terminal_vertex_change, flow = evaluation
+        self.delta = delta
+        if parent.flows is not None:
+            self.flows = dict(parent.flows)
+            self.flows[self.new_vertex_terminal] = flow
+        self.unassigned_count = parent.unassigned_count - len(delta)
+        self._terminal_terminal_capacity = (
+            parent._terminal_terminal_capacity + terminal_terminal_change
+        )
+        self._terminal_vertex_capacity = (
+            parent._terminal_vertex_capacity + terminal_vertex_change
         )
+        self._update_bounds()
 
-    def _source_set_isolating_cut(self):
-        source_set, weight = minimum_isolating_cut(
-            self.graph,
-            source_vertices={self.new_vertex_terminal},
-            sink_vertices=set(self.terminals) - {self.new_vertex_terminal},
+    def isolate_all_terminals(self):
+        """Merges the minimum isolating cut of every terminal into its source set.
+
+        Half the sum of the weights of the k minimum isolating cuts is a lower
+            bound on any multiway cut which extends this node. The cuts are
+            merged one terminal at a time, so that after this call every
+            source set is its own minimum isolating cut and the lower bound of
+            the node is exactly that sum, plus the capacity removed from the
+            kernel. The newly assigned vertices are kept in extra_delta.
+
+        Returns:
+            the weight of the minimum isolating cut of every terminal
+        """
+        assignment = self.assignment
+        vertices = []
+        vertex_terminals = []
+        weights = []
+        for terminal in self.terminals:
+            source_mask = assignment == terminal
+            sink_mask = (assignment >= 0) & ~source_mask
+            source_set, weight, flow = minimum_isolating_cut_csr(
+                self.graph,
+                source_mask=source_mask,
+                sink_mask=sink_mask,
+                flow=self.flow_isolating(terminal),
+            )
+            weights.append(weight)
+            if self.flows is not None:
+                self.flows[terminal] = flow
+            delta = np.flatnonzero(source_set & (assignment < 0))
+            if len(delta):
+                terminal_terminal_change, terminal_vertex_change = _capacity_changes(
+                    self.graph, assignment, delta, terminal
+                )
+                self._terminal_terminal_capacity += terminal_terminal_change
+                self._terminal_vertex_capacity += terminal_vertex_change
+                assignment[delta] = terminal
+                vertices.append(delta)
+                vertex_terminals.append(np.full(len(delta), terminal, dtype=np.int64))
+        if vertices:
+            self.extra_delta = (
+                np.concatenate(vertices),
+                np.concatenate(vertex_terminals),
+            )
+            self.unassigned_count -= len(self.extra_delta[0])
+            self._update_bounds()
+        return np.array(weights)
+
+    def _update_bounds(self):
+        self.lower_bound = (
+            self._terminal_terminal_capacity + self._terminal_vertex_capacity / 2.0
         )
-        self.graph = contract_vertices(
-            self.graph,
-            self.new_vertex_terminal,
-            source_set - {self.new_vertex_terminal},
+        self.upper_bound = (
+            self._terminal_terminal_capacity + self._terminal_vertex_capacity
         )
 
-    def _construct_child_node(self, new_vertex, new_vertex_terminal):
+    @property
+    def assignment(self):
+        """The terminal every vertex is assigned to in this node, or -1.
+
+        Materialized by replaying the deltas from the closest ancestor which
+            holds a full assignment.
+        """
+        if self._assignment is None:
+            path = []
+            node = self
+            while node._assignment is None:
+                path.append(node)
+                node = node.parent
+            assignment = node._assignment.copy()
+            for node in reversed(path):
+                assignment[node.delta] = node.new_vertex_terminal
+                if node.extra_delta is not None:
+                    vertices, vertex_terminals = node.extra_delta
+                    assignment[vertices] = vertex_terminals
+            self._assignment = assignment
+        return self._assignment
+
+    def flow_isolating(self, terminal):
+        """The latest maximum flow isolating a terminal, or None."""
+        if self.flows is None:
+            return None
+        return self.flows.get(terminal)
+
+    @property
+    def nbytes(self):
+        """An estimate of the memory held by this node alone, in bytes.
+
+        Counts the vertices it assigned, the flow it computed and its
+            materialized assignment, if any, on top of a fixed overhead.
+            Flows and vertices shared with its ancestors are not counted.
+        """
+        nbytes = _NODE_OVERHEAD
+        if self.delta is not None:
+            nbytes += self.delta.nbytes
+        if self.extra_delta is not None:
+            nbytes += sum(array.nbytes for array in self.extra_delta)
+        if self.flows is not None:
+            if self.parent is None or self.extra_delta is not None:
+                owned = list(self.flows.values())
+            else:
+                owned = [self.flows.get(self.new_vertex_terminal)]
+            nbytes += sum(flow.nbytes for flow in owned if flow is not None)
+        if self._assignment is not None:
+            nbytes += self._assignment.nbytes
+        return nbytes
+
+    def release_assignment(self):
+        """Frees the materialized assignment, unless nothing precedes it."""
+        if self.parent is not None:
+            self._assignment = None
+
+    def _construct_child_node(
+        self, new_vertex, new_vertex_terminal, evaluation=None, stub_lower_bound=None
+    ):
         """Creates a new child of this tree node.
 
         Creates a new child of this tree node by adding new_node to
@@ -74,16 +317,49 @@ class IsolationBranchingNode:
         Params:
             new_node: the node to be added (previously lonely)
             new_source_set: the set this new node will be added to
+            evaluation: the result of evaluate_child, if already computed
+            stub_lower_bound: if given, the child is created as a stub
+                with this lower bound instead of being evaluated
+
+        Returns:
+            the child node
         """
         child = IsolationBranchingNode(
             self.graph,
             self.terminals,
+            self,
             new_vertex,
             new_vertex_terminal,
             depth=self.depth + 1,
+            evaluation=evaluation,
+            stub_lower_bound=stub_lower_bound,
         )
-        assert child.lower_bound >= self.lower_bound, "created bad child."
-        self.children.append(child)
+        assert child.lower_bound >= self.lower_bound - 1e-9, "created bad child."
+        return child
+
+    def _stub_lower_bounds(self, vertex, terminals):
+        """Lower bounds of the children adding a vertex to each terminal.
+
+        Let c_t, c_o and c_u be the capacities from the vertex to the source
+            set of terminal t, to the other source sets and to unassigned
+            vertices. Removing the vertex from the new isolating cut of t
+            leaves a set containing the source set of t, whose boundary is
+            at least that of the current minimum isolating cut. So the cut
+            of t grows by at least c_o - c_t - c_u.
+
+        Returns:
+            the lower bound of every child, aligned with terminals
+        """
+        arcs = self.graph.row_arcs([vertex])
+        head_assignment = self.assignment[self.graph.neighbors[arcs]]
+        capacities = self.graph.capacities[arcs]
+        to_terminal = np.array(
+            [capacities[head_assignment == terminal].sum() for terminal in terminals]
+        )
+        to_any_terminal = capacities[head_assignment >= 0].sum()
+        to_unassigned = capacities[head_assignment < 0].sum()
+        growth = to_any_terminal - 2.0 * to_terminal - to_unassigned
+        return self.lower_bound + np.maximum(growth, 0.0) / 2.0
 
     def _sum_of_terminal_adjacent_edges(self):
         """Sum of capacities of edges adjacent to terminals.
@@ -94,25 +370,163 @@ class IsolationBranchingNode:
             terminal_vertex_capacity_sum: total weight of edges between a
                 terminal and a non-terminal vertex.
         """
-        terminal_terminal_capacity_sum = 0.0
-        terminal_vertex_capacity_sum = 0.0
-        for terminal in self.terminals:
-            neighbors = self.graph[terminal]
-            for neighbor in neighbors:
-                if neighbor in self.terminals:
-                    terminal_terminal_capacity_sum += self.graph[terminal][neighbor]["capacity"]
-                else:
-                    terminal_vertex_capacity_sum += self.graph[terminal][neighbor]["capacity"]
+        arcs = self.graph.row_arcs(self.terminals)
+        capacities = self.graph.capacities[arcs]
+        to_terminal = self.assignment[self.graph.neighbors[arcs]] >= 0
+        terminal_terminal_capacity_sum = float(capacities[to_terminal].sum())
+        terminal_vertex_capacity_sum = float(capacities[~to_terminal].sum())
         return terminal_terminal_capacity_sum / 2.0, terminal_vertex_capacity_sum
 
-    def construct_children_nodes(self, unassigned_vertex, allowed_terminals):
-        """Runs _add_child for each possible source set."""
-        assert not self.children, "children already created"
-        for terminal in allowed_terminals:
-            self._construct_child_node(new_vertex=unassigned_vertex, new_vertex_terminal=terminal)
+    def construct_children_nodes(
+        self, unassigned_vertex, allowed_terminals, evaluations=None, lazy=False
+    ):
+        """Runs _construct_child_node for each possible source set.
+
+        The children are returned rather than stored, so that the tree
+            decides which of them to keep.
+
+        Params:
+            unassigned_vertex: the vertex to branch on
+            allowed_terminals: the terminals the vertex may be added to
+            evaluations: the results of evaluate_child for each allowed
+                terminal, if they were computed elsewhere (e.g. in a pool)
+            lazy: if the children are created as stubs
+        """
+        if lazy:
+            stub_lower_bounds = self._stub_lower_bounds(
+                unassigned_vertex, allowed_terminals
+            ).tolist()
+        else:
+            stub_lower_bounds = [None] * len(allowed_terminals)
+        if evaluations is None:
+            evaluations = [None] * len(allowed_terminals)
+        return [
+            self._construct_child_node(
+                new_vertex=unassigned_vertex,
+                new_vertex_terminal=terminal,
+                evaluation=evaluation,
+                stub_lower_bound=stub_lower_bound,
+            )
+            for terminal, evaluation, stub_lower_bound in zip(
+                allowed_terminals, evaluations, stub_lower_bounds
+            )
+        ]
 
     @property
-    def unassigned_vertices(self) -> set:
-        """Finds the vertices in the graph which are unassigned."""
-        unassigned_vertices = set(self.graph.nodes()) - set(self.terminals)
-        return unassigned_vertices
+    def unassigned_vertices(self):
+        """Finds the vertex ids in the graph which are unassigned."""
+        return np.flatnonzero(self.assignment < 0)
+
+
+def pack_nodes(nodes):
+    """Packs nodes and all their ancestors into a compact, picklable table.
+
+    Every node is stored once, with the index of its parent instead of a
+        reference, so that long chains of ancestors do not recurse when they
+        are pickled. Only the assignment of the top node is kept; the others
+        are materialized again from the deltas. The flows for warm starts
+        are left out, as they would make up nearly all of the table, so
+        the children of unpacked nodes start their max-flows from zero.
+
+    Args:
+        nodes: the nodes to pack, e.g. the frontier of a tree
+
+    Returns:
+        packed: a dictionary of arrays and lists to pass to unpack_nodes
+        indices: the index of every given node in the table
+    """
+    index = {}
+    table = []
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if id(node) in index:
+            continue
+        index[id(node)] = None
+        table.append(node)
+        if node.parent is not None:
+            stack.append(node.parent)
+    # parents are one level above their children, so they come first
+    table.sort(key=lambda node: node.depth)
+    for position, node in enumerate(table):
+        index[id(node)] = position
+
+    stubs = [node.is_stub for node in table]
+    deltas = [node.delta for node in table if not node.is_stub]
+    packed = {
+        "parents": np.array(
+            [-1 if node.parent is None else index[id(node.parent)] for node in table],
+            dtype=np.int64,
+        ),
+        "new_vertices": np.array(
+            [-1 if node.parent is None else node.new_vertex for node in table],
+            dtype=np.int64,
+        ),
+        "new_vertex_terminals": np.array(
+            [-1 if node.parent is None else node.new_vertex_terminal for node in table],
+            dtype=np.int64,
+        ),
+        "stubs": np.array(stubs, dtype=bool),
+        "delta_lengths": np.array([len(delta) for delta in deltas], dtype=np.int64),
+        "deltas": np.concatenate(deltas) if deltas else np.zeros(0, dtype=np.int64),
+        "extra_deltas": {
+            position: node.extra_delta
+            for position, node in enumerate(table)
+            if node.extra_delta is not None
+        },
+        "unassigned_counts": np.array(
+            [node.unassigned_count for node in table], dtype=np.int64
+        ),
+        "bounds": np.array(
+            [
+                (
+                    node.lower_bound,
+                    node.upper_bound,
+                    np.nan if node.is_stub else node._terminal_terminal_capacity,
+                    np.nan if node.is_stub else node._terminal_vertex_capacity,
+                )
+                for node in table
+            ]
+        ).reshape(-1, 4),
+        "top_assignments": {
+            position: node._assignment
+            for position, node in enumerate(table)
+            if node.parent is None
+        },
+    }
+    return packed, [index[id(node)] for node in nodes]
+
+
+def unpack_nodes(graph, terminals, packed):
+    """Rebuilds the nodes packed by pack_nodes on the kernel graph.
+
+    Returns:
+        every node of the table, in the order of its indices
+    """
+    nodes = []
+    deltas = iter(np.split(packed["deltas"], np.cumsum(packed["delta_lengths"])[:-1]))
+    for position, parent in enumerate(packed["parents"].tolist()):
+        node = IsolationBranchingNode.__new__(IsolationBranchingNode)
+        node.graph = graph
+        node.terminals = terminals
+        node.parent = None if parent < 0 else nodes[parent]
+        node.new_vertex = None if parent < 0 else int(packed["new_vertices"][position])
+        node.new_vertex_terminal = (
+            None if parent < 0 else int(packed["new_vertex_terminals"][position])
+        )
+        node.depth = 0 if parent < 0 else node.parent.depth + 1
+        node.delta = None if packed["stubs"][position] else next(deltas)
+        node.extra_delta = packed["extra_deltas"].get(position)
+        node.flows = None
+        node.unassigned_count = int(packed["unassigned_counts"][position])
+        lower_bound, upper_bound, terminal_terminal, terminal_vertex = packed[
+            "bounds"
+        ][position].tolist()
+        node.lower_bound = lower_bound
+        node.upper_bound = upper_bound
+        if not node.is_stub:
+            node._terminal_terminal_capacity = terminal_terminal
+            node._terminal_vertex_capacity = terminal_vertex
+        node._assignment = packed["top_assignments"].get(position)
+        nodes.append(node)
+    return nodes
@@ -0,0 +1,102 @@
+"""Evaluates children of Isolation Branching nodes in a process pool."""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ktcut.csr_graph import CSRGraph
+from ktcut.isolation_branching_node import evaluate_child
+
+_SHARED_ARRAYS = ("offsets", "neighbors", "capacities")
+
+# set in each worker process by _attach_graph
+_worker_graph = None
+_worker_memory = None
+
+
+def _attach_graph(specifications):
+    """Initializes a worker with a view of the graph in shared memory."""
+    global _worker_graph, _worker_memory
+    _worker_memory = []
+    arrays = []
+    for name, shape, dtype in specifications:
+        memory = shared_memory.SharedMemory(name=name)
+        _worker_memory.append(memory)
+        arrays.append(np.ndarray(shape, dtype=dtype, buffer=memory.buf))
+    _worker_graph = CSRGraph(*arrays, labels=None)
+
+
+def _evaluate_child_task(assignment, new_vertex, new_vertex_terminal, flow):
+    return evaluate_child(
+        _worker_graph, assignment, new_vertex, new_vertex_terminal, flow
+    )
+
+
+class IsolationBranchingPool:
+    """Process pool sharing the kernel graph with its workers.
+
+    The CSR arrays of the kernel graph are copied once into shared memory,
+        and every worker maps them without copying. Only the assignment of
+        the parent node, and its flow if warm-starting, is sent with each
+        task.
+
+    Attributes:
+        graph: the kernel CSRGraph shared by all nodes of the tree
+        workers: the number of worker processes
+    """
+
+    def __init__(self, graph, workers):
+        self._memory = []
+        specifications = []
+        try:
+            for name in _SHARED_ARRAYS:
+                array = getattr(graph, name)
+                memory = shared_memory.SharedMemory(
+                    create=True, size=max(array.nbytes, 1)
+                )
+                self._memory.append(memory)
+                shared = np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)
+                shared[:] = array
+                specifications.append((memory.name, array.shape, array.dtype))
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_attach_graph,
+                initargs=(specifications,),
+            )
+        except BaseException:
+            self._release_memory()
+            raise
+        self.workers = workers
+
+    def evaluate_children(self, requests):
+        """Evaluates children in parallel.
+
+        Args:
+            requests: a list of
+                (assignment, new_vertex, new_vertex_terminal, flow)
+
+        Returns:
+            the result of evaluate_child for every request, in order
+        """
+        futures = [
+            self._executor.submit(_evaluate_child_task, *request)
+            for request in requests
+        ]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Stops the workers and frees the shared memory."""
+        self._executor.shutdown()
+        self._release_memory()
+
+    def _release_memory(self):
+        for memory in self._memory:
+            memory.close()
+            memory.unlink()
+        self._memory = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,31 +1,319 @@
 """Defines a Root in the Branch and Bound Tree for Isolation Branching."""
-from copy import deepcopy
-from ktcut.contract_vertices import contract_vertices
-from ktcut.minimum_isolating_cut import minimum_isolating_cut
+import numpy as np
+from ktcut.csr_graph import CSRGraph
+from ktcut.isolation_branching_kernel import heavy_edge_map
+from ktcut.isolation_branching_kernel import terminal_edges
+from ktcut.isolation_branching_kernel import twin_map
+from ktcut.max_flow import maximum_flow
+from ktcut.minimum_isolating_cut import minimum_isolating_cut_csr
+
+ROOT_CUT_METHODS = ("sequential", "bipartition")
 
 
 class IsolationBranchingRoot:
-    """Pre-processing for isolation branching for k-terminal cut."""
+    """Pre-processing for isolation branching for k-terminal cut.
+
+    The root computes the initial isolating cuts on the input graph and then
+        contracts every source set into its terminal once, producing an
+        immutable kernel graph that all nodes of the tree share. The kernel
+        may be shrunk further with reduce_kernel.
+
+    Attributes:
+        graph: the CSRGraph in which to find the multi-terminal cut
+        terminals: the vertex ids of the terminals
+    """
 
     def __init__(self, graph, terminals):
-        self._graph = deepcopy(graph)
+        self._graph = graph
         self._terminals = terminals
+        self._assignment = np.full(graph.vertex_count, -1, dtype=np.int64)
+        self._assignment[terminals] = terminals
+        self._flows = {}
+        self._kernel = None
+        self._kernel_flows = None
+        self._vertex_map = None
+        self._representatives = None
+        self._removed_capacity = 0.0
+        self._reductions = {}
 
-    def initial_isolating_cuts(self):
+    def __getstate__(self):
+        # the flows only warm-start the tree, whose checkpoints leave out
+        # the flows of its nodes as well
+        state = dict(self.__dict__)
+        state["_flows"] = {}
+        if state["_kernel_flows"] is not None:
+            state["_kernel_flows"] = {}
+        return state
+
+    def initial_isolating_cuts(self, method="sequential"):
         """Performs the initial isolating cuts.
 
         The initial isolating cuts are the k minimum (s,t)-cuts
             that separate one terminal from the rest.
+
+        With the "sequential" method, the cuts are computed one terminal at
+            a time on the whole graph, and vertices already assigned to a
+            terminal act as part of that terminal.
+
+        With the "bipartition" method, O(log k) max-flows between two halves
+            of the terminals confine each minimum isolating cut to a region
+            around its terminal, and the cut is found by one local max-flow
+            inside that region. Regions only overlap on vertices tied between
+            two terminals, which go to the earlier terminal. No flows are
+            kept for warm-starting the tree in this case.
+
+        Args:
+            method: "sequential" or "bipartition"
+        """
+        if method == "sequential":
+            self._sequential_isolating_cuts()
+        elif method == "bipartition":
+            self._bipartition_isolating_cuts()
+        else:
+            raise ValueError(
+                "method must be one of {}, not {!r}".format(ROOT_CUT_METHODS, method)
+            )
+        self._kernel = None
+
+    def get_isolating_cuts(self):
+        """The result of initial_isolating_cuts, to restore it later.
+
+        Returns:
+            the terminal of every vertex id of the input graph, or -1, and
+                the dictionary of flows by terminal used to warm-start
         """
+        return self._assignment.copy(), dict(self._flows)
+
+    def set_isolating_cuts(self, assignment, flows):
+        """Restores initial isolating cuts saved with get_isolating_cuts."""
+        self._assignment = assignment.copy()
+        self._flows = dict(flows)
+        self._kernel = None
+
+    def _sequential_isolating_cuts(self):
         for terminal in self._terminals:
-            source_set, weight = minimum_isolating_cut(
-                self._graph,
-                source_vertices={terminal},
-                sink_vertices=set(self._terminals) - {terminal},
+            source_mask = self._assignment == terminal
+            sink_mask = (self._assignment >= 0) & ~source_mask
+            source_set, weight, flow = minimum_isolating_cut_csr(
+                self._graph, source_mask=source_mask, sink_mask=sink_mask
+            )
+            self._assignment[source_set & (self._assignment < 0)] = terminal
+            self._flows[terminal] = flow
+
+    def _bipartition_isolating_cuts(self):
+        graph = self._graph
+        terminals = np.asarray(self._terminals, dtype=np.int64)
+        indices = np.arange(len(terminals), dtype=np.int64)
+
+        # bit b of codes[v] is the side of v in the b-th bipartition, unless
+        # bit b of tied[v] is set and v may lie on either side
+        codes = np.zeros(graph.vertex_count, dtype=np.int64)
+        tied = np.zeros(graph.vertex_count, dtype=np.int64)
+        for bit in range((len(terminals) - 1).bit_length()):
+            on_side = (indices >> bit) & 1 == 1
+            zero_mask = np.zeros(graph.vertex_count, dtype=bool)
+            zero_mask[terminals[~on_side]] = True
+            one_mask = np.zeros(graph.vertex_count, dtype=bool)
+            one_mask[terminals[on_side]] = True
+            flow, _, zero_side = maximum_flow(graph, zero_mask, one_mask)
+            # the reversed flow is already maximum, so this only searches
+            # the residual graph for the maximal side of the other terminals
+            _, _, one_side = maximum_flow(graph, one_mask, zero_mask, flow=-flow)
+            codes[one_side & ~zero_side] |= 1 << bit
+            tied[one_side & zero_side] |= 1 << bit
+
+        for index, terminal in enumerate(terminals):
+            region = np.flatnonzero(((codes ^ index) & ~tied) == 0)
+            local_graph = graph.contract_outside(region)
+            source_mask = np.zeros(local_graph.vertex_count, dtype=bool)
+            source_mask[np.searchsorted(region, terminal)] = True
+            sink_mask = np.zeros(local_graph.vertex_count, dtype=bool)
+            sink_mask[-1] = True
+            source_set, weight, _ = minimum_isolating_cut_csr(
+                local_graph, source_mask=source_mask, sink_mask=sink_mask
+            )
+            source_set = region[source_set[:-1]]
+            self._assignment[source_set[self._assignment[source_set] < 0]] = terminal
+
+    def _contract_source_sets(self):
+        """Builds the kernel, in which each source set is a single vertex."""
+        survivors = self._assignment < 0
+        survivors[self._terminals] = True
+        kernel_ids = np.cumsum(survivors) - 1
+        representatives = np.where(
+            self._assignment < 0,
+            np.arange(self._graph.vertex_count, dtype=np.int64),
+            self._assignment,
+        )
+        self._vertex_map = kernel_ids[representatives]
+        self._representatives = np.flatnonzero(survivors)
+        self._kernel = self._graph.quotient(
+            self._vertex_map,
+            len(self._representatives),
+            [self._graph.labels[vertex] for vertex in self._representatives],
+        )
+        self._kernel_flows = {
+            self._vertex_map[terminal]: self._graph.quotient_arc_values(
+                self._vertex_map, self._kernel, flow
+            )
+            for terminal, flow in self._flows.items()
+        }
+        self._reductions = {
+            "Isolating Cuts": self._graph.vertex_count - self._kernel.vertex_count
+        }
+
+    def reduce_kernel(self):
+        """Shrinks the kernel with safe reductions until none applies.
+
+        Non-terminals are merged by the rules of isolation_branching_kernel.
+            A vertex merged into a terminal may leave its source set short of
+            a minimum isolating cut, which the lower bounds of the tree rely
+            on, so the isolating cuts are then recomputed on the kernel.
+            Finally, the edges between terminals are removed and their
+            capacity is kept as a constant of every cut.
+
+        Returns:
+            the number of vertices removed by each reduction, and the number
+                of edges removed between terminals
+        """
+        kernel = self.get_graph()
+        while True:
+            before = kernel.vertex_count
+            terminals = self.get_terminals()
+            vertex_map, vertex_count = heavy_edge_map(kernel, terminals)
+            group_sizes = np.bincount(vertex_map, minlength=vertex_count)
+            merged_into_terminal = (
+                group_sizes[vertex_map[terminals]].sum() > len(terminals)
             )
-            self._graph = contract_vertices(
-                self._graph, terminal, source_set - {terminal}
+            self._merge(vertex_map, vertex_count, "Heavy Edges")
+            self._merge(*twin_map(self._kernel, self.get_terminals()), "Twins")
+            if merged_into_terminal:
+                self._kernel_isolating_cuts()
+            kernel = self._kernel
+            if kernel.vertex_count == before:
+                break
+
+        removed = terminal_edges(kernel, self.get_terminals())
+        if removed.any():
+            self._removed_capacity += float(kernel.capacities[removed].sum()) / 2.0
+            tails, heads, capacities = kernel.edges()
+            forward = kernel.arc_tails < kernel.neighbors
+            keep = ~removed[forward]
+            self._kernel = CSRGraph.from_edges(
+                kernel.vertex_count,
+                tails[keep],
+                heads[keep],
+                capacities[keep],
+                kernel.labels,
+            )
+            self._kernel_flows = {
+                terminal: flow[~removed]
+                for terminal, flow in self._kernel_flows.items()
+            }
+        self._reductions["Terminal Edges"] = int(removed.sum()) // 2
+        return dict(self._reductions)
+
+    def _kernel_isolating_cuts(self):
+        """Merges the sequential isolating cuts of the kernel terminals."""
+        kernel = self._kernel
+        terminals = self.get_terminals()
+        assignment = np.full(kernel.vertex_count, -1, dtype=np.int64)
+        assignment[terminals] = terminals
+        for terminal in terminals:
+            source_mask = assignment == terminal
+            sink_mask = (assignment >= 0) & ~source_mask
+            source_set, weight, flow = minimum_isolating_cut_csr(
+                kernel,
+                source_mask=source_mask,
+                sink_mask=sink_mask,
+                flow=self._kernel_flows.get(terminal),
             )
+            assignment[source_set & (assignment < 0)] = terminal
+            self._kernel_flows[terminal] = flow
+        groups = np.where(
+            assignment < 0, np.arange(kernel.vertex_count, dtype=np.int64), assignment
+        )
+        vertex_ids, vertex_map = np.unique(groups, return_inverse=True)
+        self._merge(vertex_map.ravel(), len(vertex_ids), "Isolating Cuts")
+
+    def _merge(self, vertex_map, vertex_count, reduction):
+        """Replaces the kernel by its quotient under a kernel vertex map.
+
+        Args:
+            vertex_map: the new vertex id of every kernel vertex, which keeps
+                the terminals apart
+            vertex_count: the number of vertices of the new kernel
+            reduction: the name under which the removed vertices are counted
+        """
+        kernel = self._kernel
+        removed = kernel.vertex_count - vertex_count
+        self._reductions[reduction] = self._reductions.get(reduction, 0) + removed
+        if not removed:
+            return
+        # a merged group containing a terminal is represented by it
+        representatives = np.zeros(vertex_count, dtype=np.int64)
+        representatives[vertex_map] = self._representatives
+        terminals = self.get_terminals()
+        representatives[vertex_map[terminals]] = self._representatives[terminals]
+        self._kernel = kernel.quotient(
+            vertex_map,
+            vertex_count,
+            [self._graph.labels[vertex] for vertex in representatives],
+        )
+        self._kernel_flows = {
+            vertex_map[terminal]: kernel.quotient_arc_values(
+                vertex_map, self._kernel, flow
+            )
+            for terminal, flow in self._kernel_flows.items()
+        }
+        self._vertex_map = vertex_map[self._vertex_map]
+        self._representatives = representatives
 
     def get_graph(self):
-        return self._graph
+        """The shared, immutable kernel graph."""
+        if self._kernel is None:
+            self._contract_source_sets()
+        return self._kernel
+
+    def get_terminals(self):
+        """The vertex ids of the terminals in the kernel graph."""
+        return self.get_vertex_map()[self._terminals]
+
+    def get_flows(self):
+        """The maximum flow of each initial isolating cut, on the kernel.
+
+        Each flow remains feasible for its terminal in the kernel, so it can
+            warm-start the isolating cuts of the nodes in the tree.
+
+        Returns:
+            dictionary of kernel flows by kernel terminal id
+        """
+        if self._kernel is None:
+            self._contract_source_sets()
+        return dict(self._kernel_flows)
+
+    def get_removed_capacity(self):
+        """The capacity of the edges removed from the kernel.
+
+        Every multiway cut contains these edges, so their capacity is a
+            constant added to the bounds of every node.
+        """
+        return self._removed_capacity
+
+    def get_reductions(self):
+        """The number of vertices removed from the input graph by each step."""
+        if self._kernel is None:
+            self._contract_source_sets()
+        return dict(self._reductions)
+
+    def get_vertex_map(self):
+        """The kernel vertex id of every vertex id of the input graph."""
+        if self._kernel is None:
+            self._contract_source_sets()
+        return self._vertex_map
+
+    def get_representatives(self):
+        """The input vertex id represented by every kernel vertex id."""
+        if self._kernel is None:
+            self._contract_source_sets()
+        return self._representatives
@@ -0,0 +1,233 @@
+"""Strategies choosing the vertex on which Isolation Branching branches.
+
+A strategy is started once per tree, on the kernel graph, and is then asked
+    for the branching vertex of every expanded node. It is shown the children
+    of every branching, so that it can learn from the resulting bounds.
+
+Kernel vertices are identified across runs by the label of the input vertex
+    representing them, so pseudocosts learned on one graph carry over to
+    later runs on graphs sharing these labels.
+"""
+import copy
+
+import numpy as np
+
+from ktcut.isolation_branching_node import evaluate_child
+
+# scores below this value count as no progress at all
+_EPSILON = 1e-6
+
+
+class BranchingStrategy:
+    """Branches on the unassigned vertex of highest weighted degree.
+
+    Attributes:
+        graph: the kernel CSRGraph, once started
+        labels: the label of every kernel vertex, once started
+    """
+
+    def __init__(self):
+        self.graph = None
+        self.labels = None
+
+    def start(self, graph, labels):
+        """Prepares the strategy for a tree.
+
+        Args:
+            graph: the kernel CSRGraph
+            labels: the label of every kernel vertex
+        """
+        self.graph = graph
+        self.labels = labels
+        self._degrees = graph.weighted_degrees()
+
+    def choose(self, node, allowed_terminals):
+        """Chooses the vertex to branch on.
+
+        Args:
+            node: the node being expanded, whose assignment is materialized
+            allowed_terminals: function giving the allowed terminals of a
+                vertex
+
+        Returns:
+            vertex: the unassigned vertex to branch on
+            evaluations: the results of evaluate_child for every allowed
+                terminal of the vertex, if the strategy computed them, or None
+        """
+        unassigned_vertices = node.unassigned_vertices
+        return unassigned_vertices[np.argmax(self._degrees[unassigned_vertices])], None
+
+    def observe(self, node, vertex, children):
+        """Learns from the children of a node, before they are pruned."""
+
+
+class TerminalCapacityStrategy(BranchingStrategy):
+    """Branches on the unassigned vertex most connected to a single terminal.
+
+    A vertex strongly tied to a source set raises the bound of every child
+        which does not add it to that source set. Ties are broken by the
+        weighted degree.
+    """
+
+    def choose(self, node, allowed_terminals):
+        assignment = node.assignment
+        graph = self.graph
+        unassigned_vertices = np.flatnonzero(assignment < 0)
+        arcs = (assignment[graph.arc_tails] < 0) & (assignment[graph.neighbors] >= 0)
+        keys, inverse = np.unique(
+            graph.arc_tails[arcs] * graph.vertex_count
+            + assignment[graph.neighbors[arcs]],
+            return_inverse=True,
+        )
+        connection = np.bincount(inverse.ravel(), weights=graph.capacities[arcs])
+        strongest = np.zeros(graph.vertex_count)
+        np.maximum.at(strongest, keys // graph.vertex_count, connection)
+        best = np.lexsort(
+            (self._degrees[unassigned_vertices], strongest[unassigned_vertices])
+        )[-1]
+        return unassigned_vertices[best], None
+
+
+class PseudocostStrategy(BranchingStrategy):
+    """Branches on the vertex whose past branchings raised the bound most.
+
+    The pseudocost of a vertex is the average increase of the lower bound
+        over the evaluated children of its branchings. Vertices without a
+        pseudocost are scored with the average pseudocost, and ties are broken
+        by the weighted degree. Stubs carry no evaluated bound and teach
+        nothing.
+
+    Attributes:
+        pseudocosts: dictionary of (sum of increases, number of children) by
+            vertex label, which may be passed on to another strategy
+    """
+
+    def __init__(self, pseudocosts=None):
+        super().__init__()
+        self.pseudocosts = {} if pseudocosts is None else dict(pseudocosts)
+
+    def start(self, graph, labels):
+        super().start(graph, labels)
+        self._sums = np.zeros(graph.vertex_count)
+        self._counts = np.zeros(graph.vertex_count)
+        for vertex, label in enumerate(labels):
+            if label in self.pseudocosts:
+                self._sums[vertex], self._counts[vertex] = self.pseudocosts[label]
+
+    def scores(self, vertices):
+        """The pseudocosts of vertices, or the average one if unknown."""
+        known = self._counts > 0
+        if known.any():
+            average = self._sums[known].sum() / self._counts[known].sum()
+        else:
+            average = 0.0
+        counts = self._counts[vertices]
+        return np.where(
+            counts > 0, self._sums[vertices] / np.maximum(counts, 1), average
+        )
+
+    def choose(self, node, allowed_terminals):
+        unassigned_vertices = node.unassigned_vertices
+        best = np.lexsort(
+            (self._degrees[unassigned_vertices], self.scores(unassigned_vertices))
+        )[-1]
+        return unassigned_vertices[best], None
+
+    def observe(self, node, vertex, children):
+        gains = [
+            child.lower_bound - node.lower_bound
+            for child in children
+            if not child.is_stub
+        ]
+        self._record(vertex, gains)
+
+    def _record(self, vertex, gains):
+        if not gains:
+            return
+        self._sums[vertex] += sum(gains)
+        self._counts[vertex] += len(gains)
+        self.pseudocosts[self.labels[vertex]] = (
+            float(self._sums[vertex]),
+            float(self._counts[vertex]),
+        )
+
+
+class StrongBranchingStrategy(PseudocostStrategy):
+    """Evaluates the children of a few candidates and keeps the best vertex.
+
+    The candidates are the unassigned vertices of highest weighted degree.
+        A candidate is scored by the product of the bound increases of its
+        children, so that a vertex raising the bound of every child is
+        preferred. The evaluations of the chosen vertex are reused for its
+        children, so that only the other candidates cost extra max-flows.
+        Their results also update the pseudocosts, which are used instead
+        below max_depth.
+
+    Attributes:
+        candidates: the number of vertices evaluated per node
+        max_depth: the depth below which pseudocosts are used instead, or
+            None to evaluate candidates at every node
+    """
+
+    def __init__(self, candidates=4, max_depth=None, pseudocosts=None):
+        super().__init__(pseudocosts)
+        self.candidates = candidates
+        self.max_depth = max_depth
+
+    def choose(self, node, allowed_terminals):
+        if self.max_depth is not None and node.depth > self.max_depth:
+            return super().choose(node, allowed_terminals)
+        unassigned_vertices = node.unassigned_vertices
+        order = np.argsort(-self._degrees[unassigned_vertices], kind="stable")
+        best_score, best_vertex, best_evaluations = -np.inf, None, None
+        for vertex in unassigned_vertices[order[: self.candidates]].tolist():
+            evaluations = [
+                evaluate_child(
+                    self.graph,
+                    node.assignment,
+                    vertex,
+                    terminal,
+                    node.flow_isolating(terminal),
+                )
+                for terminal in allowed_terminals(vertex)
+            ]
+            # the lower bound of a child grows by tt + tv / 2
+            gains = [
+                evaluation[1] + evaluation[2] / 2.0 for evaluation in evaluations
+            ]
+            self._record(vertex, gains)
+            score = float(np.prod(np.maximum(gains, _EPSILON)))
+            if score > best_score:
+                best_score, best_vertex, best_evaluations = score, vertex, evaluations
+        return best_vertex, best_evaluations
+
+    def observe(self, node, vertex, children):
+        # the chosen vertex was recorded while it was evaluated
+        if self.max_depth is not None and node.depth > self.max_depth:
+            super().observe(node, vertex, children)
+
+
+BRANCHING_STRATEGIES = {
+    "degree": BranchingStrategy,
+    "terminal_capacity": TerminalCapacityStrategy,
+    "pseudocost": PseudocostStrategy,
+    "strong": StrongBranchingStrategy,
+}
+
+
+def branching_strategy(strategy):
+    """The strategy given by name, or a copy of the given BranchingStrategy.
+
+    The copy is shallow, so that the trees of the parts of a decomposed
+        instance are each started on their own kernel while they share, and
+        update, the pseudocosts of the given strategy.
+    """
+    if isinstance(strategy, BranchingStrategy):
+        return copy.copy(strategy)
+    if strategy not in BRANCHING_STRATEGIES:
+        raise ValueError(
+            "strategy must be one of {}, not {!r}".format(
+                tuple(BRANCHING_STRATEGIES), strategy
+            )
+        )
+    return BRANCHING_STRATEGIES[strategy]()
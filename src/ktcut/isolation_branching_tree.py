@@ -1,52 +1,131 @@
 """Defines the overall Branch and Bound Tree for Isolation Branching."""
-import networkx as nx
+import collections
+
 import numpy as np
-from typing import List
+from ktcut.checkpoint import load_state
+from ktcut.checkpoint import save_state
+from ktcut import isolation_branching_heuristics as heuristics
+from ktcut.isolation_branching_frontier import IsolationBranchingFrontier
+from ktcut.lp_algorithm import lp_algorithm
+from ktcut.isolation_branching_metrics import IsolationBranchingMetrics
+from ktcut.isolation_branching_strategies import branching_strategy
 from ktcut.isolation_branching_node import IsolationBranchingNode
+from ktcut.isolation_branching_node import pack_nodes
+from ktcut.isolation_branching_node import unpack_nodes
+from ktcut.isolation_branching_pool import IsolationBranchingPool
 from ktcut.isolation_branching_root import IsolationBranchingRoot
 import time
 
+NODE_SELECTIONS = ("best", "depth", "hybrid")
+
+# in hybrid node selection, a dive continues into a child whose lower bound
+# is within this fraction of the gap above the best lower bound
+PLUNGE_QUOTIENT = 0.25
+
+# by default, isolating cuts are warm-started on kernels with at most this
+# many edges, since every unexplored child then holds a flow array of
+# 16 bytes per edge
+WARM_START_MAX_EDGES = 10000
+
+IsolationBranchingEvent = collections.namedtuple(
+    "IsolationBranchingEvent",
+    ["kind", "source_sets", "cut_value", "lower_bound", "gap", "time_elapsed"],
+)
+IsolationBranchingEvent.__doc__ = """Progress of an anytime solve.
+
+Attributes:
+    kind: "incumbent" when a better cut was found, "lower_bound" when the
+        lower bound rose, then "solved" or "stopped" (by the time limit)
+    source_sets: the nodes connected to each terminal in the best cut
+    cut_value: the weight of the best cut
+    lower_bound: a lower bound on the weight of any cut
+    gap: (cut_value - lower_bound) / cut_value, or 0 for a cut of weight 0
+    time_elapsed: the time spent on the instance, in seconds
+"""
+
 
 class IsolationBranchingTree:
     """Tree for isolation branching for k-terminal cut.
 
     Attributes:
-        terminals: the set of terminals
+        graph: the CSRGraph in which to find the multi-terminal cut
+        terminals: the vertex ids of the terminals
+        terminals_by_vertex: the terminal ids allowed for each vertex id,
+            or None if every vertex may be assigned to every terminal
+        _kernel_terminals_by_vertex: the kernel terminal ids allowed for
+            each kernel vertex id by the persistence LP, or None
         _root_node: the root node of the branch and bound tree
-        _unexplored_nodes: a list of the unexplored nodes in the tree
-        _all_nodes: a list of all nodes in the tree
+        _unexplored_nodes: the frontier of unexplored nodes in the tree
+        _incumbent: the last node whose completion improved the incumbent;
+            other explored or pruned nodes are not retained
+        _incumbent_assignment: the terminal of every input vertex in the
+            best multiway cut found so far, by a node or a heuristic
+        _incumbent_value: the weight of that multiway cut
+        _nodes_created_count: the number of nodes created in the tree
         _done: if the algorithm terminated
         _active_node: the node which is currently being considered
         _start_time: when the branch and bound tree was initialized
     """
 
-    def __init__(self, graph, terminals, terminals_by_vertex):
+    def __init__(self, graph, terminals, terminals_by_vertex=None):
+        self._graph = graph
         self._root_node = IsolationBranchingRoot(graph, terminals)
         self._terminals = terminals
         self._terminals_by_vertex = terminals_by_vertex
+        self._kernel_terminals = None
+        self._kernel_terminals_by_vertex = None
         self._done: bool = False
-        self._unexplored_nodes: List[IsolationBranchingNode] = None
-        self._all_nodes: List[IsolationBranchingNode] = None
+        self._unexplored_nodes: IsolationBranchingFrontier = None
+        self._incumbent: IsolationBranchingNode = None
+        self._incumbent_assignment = None
+        self._incumbent_value = np.inf
+        self._source_sets = None
+        self._source_sets_value = None
+        self._source_sets_cut_value = None
         self._active_node: IsolationBranchingNode = None
-        self._nodes_explored_count: int = 0
+        self._nodes_created_count: int = 0
+        self._nodes_expanded_count: int = 0
+        self._heuristic_period = None
         self._start_time = time.time()
         self._reporting = None
+        self._pool: IsolationBranchingPool = None
+        self._lazy = False
+        self._strategy = None
+        self._isolating_cut_bound = False
+        self._node_selection = "best"
+        self._max_frontier_nodes = None
+        self._max_frontier_bytes = None
+        self._metrics = IsolationBranchingMetrics()
 
     @property
     def best_unexplored_lower_bound(self):
         """The lowest lower bound among all unexplored nodes."""
         if self._unexplored_nodes:
-            return min(node.lower_bound for node in self._unexplored_nodes)
+            return self._unexplored_nodes.best_lower_bound
         else:
             return 0.0
 
+    @property
+    def lower_bound(self):
+        """The lowest weight any cut may still have."""
+        if self._unexplored_nodes:
+            return min(self.best_unexplored_lower_bound, self.best_upper_bound)
+        return self.best_upper_bound
+
     @property
     def best_upper_bound(self):
-        """The lowest upper bound among all nodes."""
-        if self._all_nodes:
-            return min(node.upper_bound for node in self._all_nodes)
-        else:
-            return np.inf
+        """The weight of the best multiway cut found so far."""
+        return self._incumbent_value
+
+    @property
+    def metrics(self):
+        """The IsolationBranchingMetrics of the solve."""
+        return self._metrics
+
+    @property
+    def started(self):
+        """If solve has been called, so that the tree can be resumed."""
+        return self._unexplored_nodes is not None
 
     @property
     def unexplored_nodes_count(self):
@@ -54,120 +133,782 @@ class IsolationBranchingTree:
 
     @property
     def total_nodes_count(self):
-        return len(self._all_nodes)
+        return self._nodes_created_count
 
     def _pop_node_with_best_lower_bound(self) -> IsolationBranchingNode:
-        self._unexplored_nodes.sort(key=lambda x: x.lower_bound, reverse=True)
-        # NB: pop() will return the last element of the list
-        return self._unexplored_nodes.pop()
+        return self._unexplored_nodes.pop_best_lower_bound()
 
     def _pop_node_with_maximum_depth(self) -> IsolationBranchingNode:
-        self._unexplored_nodes.sort(key=lambda x: (x.depth, -x.lower_bound))
-        # NB: pop() will return the last element of the list
-        return self._unexplored_nodes.pop()
+        return self._unexplored_nodes.pop_maximum_depth()
+
+    def _pop_node(self) -> IsolationBranchingNode:
+        """Pops the next node to expand, following the node selection.
+
+        Depth-first selection is also used while the frontier exceeds its
+            memory budget, since diving reaches nodes which are solved or
+            pruned instead of widening the frontier.
+        """
+        if self._node_selection == "depth" or self._over_memory_budget():
+            return self._pop_node_with_maximum_depth()
+        if self._node_selection == "hybrid":
+            deepest = self._unexplored_nodes.peek_maximum_depth()
+            best_lower_bound = self.best_unexplored_lower_bound
+            # with workers, the active node is the last one of the batch
+            if (
+                deepest.parent is self._active_node
+                and deepest.lower_bound
+                <= best_lower_bound
+                + PLUNGE_QUOTIENT * (self.best_upper_bound - best_lower_bound)
+            ):
+                return self._pop_node_with_maximum_depth()
+        return self._pop_node_with_best_lower_bound()
+
+    def _over_memory_budget(self):
+        return (
+            self._max_frontier_nodes is not None
+            and len(self._unexplored_nodes) >= self._max_frontier_nodes
+        ) or self._over_byte_budget()
+
+    def _over_byte_budget(self):
+        return (
+            self._max_frontier_bytes is not None
+            and self._unexplored_nodes.nbytes >= self._max_frontier_bytes
+        )
 
     def _node_with_best_upper_bound(self) -> IsolationBranchingNode:
-        self._all_nodes.sort(key=lambda x: x.upper_bound)
-        return self._all_nodes[0]
-
-    def _choose_unassigned_vertex_highest_degree(self):
-        degrees = dict(nx.degree(self._active_node.graph, weight="capacity"))
-        degrees_restricted = {
-            node: node_degree
-            for node, node_degree in degrees.items()
-            if node in self._active_node.unassigned_vertices
-        }
-        return max(degrees_restricted, key=degrees_restricted.get)
+        return self._incumbent
+
+    def _add_nodes(self, nodes):
+        """Counts new nodes, see _push_nodes."""
+        self._nodes_created_count += len(nodes)
+        self._push_nodes(nodes)
+
+    def _push_nodes(self, nodes):
+        """Updates the incumbent with nodes and adds them to the frontier.
+
+        Only the node with the lowest upper bound is completed to a cut, if
+            it improves the incumbent, since a completion materializes the
+            assignment of the whole kernel. Nodes whose lower bound is no
+            better than the best upper bound cannot lead to a better cut,
+            so they are pruned immediately.
+        """
+        if self._isolating_cut_bound:
+            with self._metrics.timer("evaluation"):
+                for node in nodes:
+                    if not node.is_stub:
+                        node.isolate_all_terminals()
+                        node.release_assignment()
+        best = min(nodes, key=lambda node: node.upper_bound, default=None)
+        if best is not None and best.upper_bound < self.best_upper_bound:
+            with self._metrics.timer("heuristics"):
+                self._offer_assignment(
+                    heuristics.most_connected_terminal(
+                        best.graph, best.assignment, self._kernel_terminals
+                    ),
+                    best,
+                )
+                best.release_assignment()
+        for node in nodes:
+            if node.lower_bound < self.best_upper_bound:
+                if self._over_byte_budget():
+                    # the subtree of the node does without warm starts
+                    node.flows = None
+                self._unexplored_nodes.push(node, node.nbytes)
+            else:
+                self._metrics.count("nodes pruned")
+        self._metrics.observe_frontier(self._unexplored_nodes)
+
+    def _offer_assignment(self, assignment, node=None):
+        """Makes a complete kernel assignment the incumbent, if it is better.
+
+        Args:
+            assignment: the kernel terminal of every kernel vertex
+            node: the node the assignment completes, if any
+        """
+        value = (
+            heuristics.cut_value(self._root_node.get_graph(), assignment)
+            + self._root_node.get_removed_capacity()
+        )
+        if value < self._incumbent_value:
+            self._metrics.count("incumbent updates")
+            self._incumbent_value = value
+            self._incumbent_assignment = self._root_node.get_representatives()[
+                assignment
+            ][self._root_node.get_vertex_map()]
+            if node is not None:
+                self._incumbent = node
+
+    def _run_heuristics(self, node):
+        """Offers the multiway cuts built by the primal heuristics from a node.
+
+        The isolation heuristic and the most connected terminal complete the
+            node with a single terminal, the greedy heuristic vertex by vertex,
+            and local search then improves the best of them.
+        """
+        graph = node.graph
+        terminals = self._kernel_terminals
+        with self._metrics.timer("heuristics"):
+            candidates = [
+                heuristics.isolation_heuristic(graph, node.assignment, terminals),
+                heuristics.most_connected_terminal(graph, node.assignment, terminals),
+                heuristics.greedy_assignment(graph, node.assignment, terminals),
+            ]
+            for candidate in candidates:
+                self._offer_assignment(candidate)
+            best = min(candidates, key=lambda a: heuristics.cut_value(graph, a))
+            self._offer_assignment(heuristics.local_search(graph, best, terminals))
+        self._metrics.count("heuristic runs")
+
+    def _offer_partition(self, partition):
+        """Offers a multiway cut given by the caller.
+
+        Args:
+            partition: dictionary of sets of vertex labels by terminal label,
+                as returned by solve. Vertices which are missing, or given
+                to a terminal which is not in this tree, are assigned by
+                the greedy heuristic.
+        """
+        assignment = heuristics.partition_assignment(
+            self._graph, self._terminals, partition
+        )
+        value = heuristics.cut_value(self._graph, assignment)
+        if value < self._incumbent_value:
+            self._incumbent_value = value
+            self._incumbent_assignment = assignment
+
+    def _choose_unassigned_vertex(self):
+        return self._strategy.choose(self._active_node, self._allowed_terminals)
+
+    def _allowed_terminals(self, vertex):
+        if self._terminals_by_vertex is None:
+            allowed = self._kernel_terminals
+        else:
+            representative = self._root_node.get_representatives()[vertex]
+            allowed = self._root_node.get_vertex_map()[
+                self._terminals_by_vertex[representative]
+            ]
+        if self._kernel_terminals_by_vertex is not None:
+            persistent = self._kernel_terminals_by_vertex[vertex]
+            # both restrictions need not keep the same optimal cut
+            if np.isin(persistent, allowed).any():
+                allowed = persistent[np.isin(persistent, allowed)]
+        return allowed
 
     def _step(self):
         """One step of the branch-and-bound algorithm.
 
-            (1) Select a Node
-            (2) Select a Vertex
-            (3) Branch
+            (1) Select a Node, or one Node per worker when using a pool
+            (2) Evaluate it if it is a stub, and return it to the frontier
+            (3) Otherwise, select a Vertex
+            (4) Branch
         """
-        if self.best_unexplored_lower_bound < self.best_upper_bound:
+        batch_size = 1 if self._pool is None else self._pool.workers
+        batch = []
+        stubs = []
+        while (
+            len(batch) + len(stubs) < batch_size
+            and self._unexplored_nodes
+            and self.best_unexplored_lower_bound < self.best_upper_bound
+        ):
 
             # Select a Node
-            self._active_node = self._pop_node_with_best_lower_bound()
+            with self._metrics.timer("node selection"):
+                node = self._pop_node()
+            if node.lower_bound >= self.best_upper_bound:
+                # only the best-first order stops at pruned nodes
+                self._metrics.count("nodes pruned")
+                continue
+            if node.is_stub:
+                stubs.append(node)
+                continue
+            self._active_node = node
+            self._nodes_expanded_count += 1
+            self._metrics.count("nodes expanded")
+            with self._metrics.timer("assignment"):
+                # materialized here, so that its cost is timed on its own
+                node.assignment
 
-            # Reporting
-            if self._reporting:
-                print(self.report)
+            # Primal heuristics
+            if (
+                self._heuristic_period
+                and self._nodes_expanded_count % self._heuristic_period == 0
+            ):
+                self._run_heuristics(node)
 
             # Select a Vertex
-            unassigned_vertex_chosen = self._choose_unassigned_vertex_highest_degree()
+            with self._metrics.timer("vertex selection"):
+                unassigned_vertex_chosen, evaluations = (
+                    self._choose_unassigned_vertex()
+                )
 
-            # Branch
-            self._active_node.construct_children_nodes(
-                unassigned_vertex_chosen,
-                self._terminals_by_vertex[unassigned_vertex_chosen],
+            batch.append(
+                (
+                    self._active_node,
+                    unassigned_vertex_chosen,
+                    self._allowed_terminals(unassigned_vertex_chosen),
+                    evaluations,
+                )
             )
 
+        if not batch and not stubs:
+            # every remaining node is pruned by the best upper bound
+            self._done = True
+            return
+
+        with self._metrics.timer("evaluation"):
+            evaluations, stub_evaluations = self._evaluate_children(batch, stubs)
+            for stub, evaluation in zip(stubs, stub_evaluations):
+                stub.evaluate(evaluation)
+                stub.parent.release_assignment()
+        self._metrics.count("stubs evaluated", len(stubs))
+        self._push_nodes(stubs)
+
+        for (node, unassigned_vertex, allowed_terminals, _), node_evaluations in zip(
+            batch, evaluations
+        ):
+            # Branch
+            with self._metrics.timer("evaluation"):
+                children = node.construct_children_nodes(
+                    unassigned_vertex, allowed_terminals, node_evaluations, self._lazy
+                )
+            self._strategy.observe(node, unassigned_vertex, children)
+
+            # the children only need the materialized assignment while
+            # they are being constructed
+            node.release_assignment()
+
             # NB: we do not need to worry about duplicate nodes
             # the nodes are constructed by forcing an assignment of
             # vertices to terminals. Thus, the resulting partitions
             # can never be identical
-            self._unexplored_nodes += self._active_node.children
-            self._all_nodes += self._active_node.children
+            self._add_nodes(children)
 
-        else:
-            # if there are no unassigned vertices, we are at a leaf node
-            self._done = True
+    def _evaluate_children(self, batch, stubs=()):
+        """Evaluates the children of a batch of nodes in the pool, if any.
+
+        Children of the batch are only evaluated if they are not created
+            lazily and the branching strategy did not evaluate them already,
+            while the stubs are always evaluated.
+
+        Returns:
+            evaluations: for every node in the batch, the evaluations of its
+                children, or None if they are to be evaluated by the node
+            stub_evaluations: the evaluation of every stub, or None
+        """
+        if self._pool is None:
+            return [evaluations for *_, evaluations in batch], [None] * len(stubs)
+        requests = [
+            (
+                stub.parent.assignment,
+                stub.new_vertex,
+                stub.new_vertex_terminal,
+                stub.parent.flow_isolating(stub.new_vertex_terminal),
+            )
+            for stub in stubs
+        ]
+        if not self._lazy:
+            requests += [
+                (
+                    node.assignment,
+                    unassigned_vertex,
+                    terminal,
+                    node.flow_isolating(terminal),
+                )
+                for node, unassigned_vertex, allowed_terminals, evaluations in batch
+                if evaluations is None
+                for terminal in allowed_terminals
+            ]
+        results = iter(self._pool.evaluate_children(requests))
+        stub_evaluations = [next(results) for _ in stubs]
+        if self._lazy:
+            return [evaluations for *_, evaluations in batch], stub_evaluations
+        evaluations = [
+            evaluations
+            if evaluations is not None
+            else [next(results) for _ in allowed_terminals]
+            for _, _, allowed_terminals, evaluations in batch
+        ]
+        return evaluations, stub_evaluations
 
-    def solve(self, reporting, time_limit=600):
+    def solve(
+        self,
+        reporting,
+        time_limit=600,
+        workers=None,
+        warm_start=None,
+        root_cuts="sequential",
+        kernelize=True,
+        persistence=None,
+        lazy=False,
+        isolating_cut_bound=False,
+        heuristic_period=100,
+        initial_partition=None,
+        branching="degree",
+        node_selection="best",
+        max_frontier_nodes=None,
+        max_frontier_bytes=None,
+        metrics=None,
+        cache=None,
+        checkpoint=None,
+        checkpoint_period=None,
+    ):
         """Solves k-terminal cut using Isolation Branching.
 
+        Takes the arguments of solve_iter, of which it returns the outcome.
+
+        Returns:
+            source_sets: the nodes that remain connected to each terminal
+            cut_value: the cost of the multi-terminal cut, which is optimal
+                unless the time limit was reached
+        """
+        for event in self.solve_iter(
+            reporting,
+            time_limit=time_limit,
+            workers=workers,
+            warm_start=warm_start,
+            root_cuts=root_cuts,
+            kernelize=kernelize,
+            persistence=persistence,
+            lazy=lazy,
+            isolating_cut_bound=isolating_cut_bound,
+            heuristic_period=heuristic_period,
+            initial_partition=initial_partition,
+            branching=branching,
+            node_selection=node_selection,
+            max_frontier_nodes=max_frontier_nodes,
+            max_frontier_bytes=max_frontier_bytes,
+            metrics=metrics,
+            cache=cache,
+            checkpoint=checkpoint,
+            checkpoint_period=checkpoint_period,
+        ):
+            pass
+        return event.source_sets, event.cut_value
+
+    def solve_iter(
+        self,
+        reporting,
+        time_limit=600,
+        workers=None,
+        warm_start=None,
+        root_cuts="sequential",
+        kernelize=True,
+        persistence=None,
+        lazy=False,
+        isolating_cut_bound=False,
+        heuristic_period=100,
+        initial_partition=None,
+        branching="degree",
+        node_selection="best",
+        max_frontier_nodes=None,
+        max_frontier_bytes=None,
+        metrics=None,
+        cache=None,
+        checkpoint=None,
+        checkpoint_period=None,
+    ):
+        """Solves k-terminal cut, yielding events as the bounds improve.
+
+        The first event comes right after the root, with the cut of the
+            primal heuristics. The caller may stop iterating at any time,
+            e.g. once the gap is small enough, and keep the latest cut.
+
         Args:
-            reporting: True if reports should be printed at every step of the
-                Isolation Branching algorithm.
+            reporting: True if the report should be printed as the solve
+                goes, at most once per interval of the metrics.
             time_limit: the time limit, in seconds, after which the algorithm
                 will terminate even if it does not reach an optimal solution.
+            workers: if greater than 1, the number of processes which expand
+                nodes and evaluate their children in parallel.
+            warm_start: if the max-flow of each child starts from the flow
+                its parent already found for the same terminal. This trades
+                one flow array of 16 bytes per kernel edge per unexplored
+                node for faster isolating cuts. If None, warm starts are
+                used on kernels with at most WARM_START_MAX_EDGES edges.
+            root_cuts: how the root computes the initial isolating cuts,
+                "sequential" (k max-flows) or "bipartition" (O(log k)
+                max-flows and one local max-flow per terminal), see
+                IsolationBranchingRoot.initial_isolating_cuts.
+            kernelize: if the kernel is shrunk by safe reductions before
+                branching. The reductions are skipped when the terminals
+                of the vertices are restricted by terminals_by_vertex.
+            persistence: "strong" or "weak" to restrict the terminals of
+                every kernel vertex to those the LP relaxation of the
+                kernel allows under that persistence assumption, see
+                lp_algorithm, or None. The LP is solved after the root
+                cuts and reductions, on the kernel rather than the graph.
+            lazy: if children are created as stubs, bounded from their
+                parent, whose isolating cuts are only computed when they
+                are taken from the frontier. Stubs which are pruned before
+                then never cost a max-flow.
+            isolating_cut_bound: if every node recomputes the minimum
+                isolating cuts of all terminals, merges them into the source
+                sets and is bounded by half the sum of their weights. While
+                the source sets are already minimum isolating cuts, as after
+                the sequential root cuts, this is the same bound at the cost
+                of k more max-flows per node.
+            heuristic_period: the primal heuristics run at the root and on
+                every heuristic_period-th expanded node, or only at the root
+                if None.
+            initial_partition: a multiway cut to start from, as a dictionary
+                of sets of vertices by terminal like the returned source_sets
+            branching: the strategy choosing the vertex to branch on, either
+                a name in BRANCHING_STRATEGIES or a BranchingStrategy, which
+                may be reused to carry pseudocosts over to later runs
+            node_selection: the order in which nodes are expanded, "best"
+                (lowest lower bound first), "depth" (deepest first, which
+                keeps the frontier small) or "hybrid" (best first, diving
+                into a child while its bound stays within PLUNGE_QUOTIENT of
+                the gap, which finds incumbents early)
+            max_frontier_nodes: if given, nodes are expanded depth-first
+                while the frontier holds at least this many nodes
+            max_frontier_bytes: if given, nodes are expanded depth-first
+                while the estimated memory of the frontier exceeds this many
+                bytes, and nodes pushed meanwhile drop their warm-start flows
+            metrics: the IsolationBranchingMetrics to update, with callbacks
+                called at its interval, or None for a private one, see the
+                metrics property
+            cache: a ResultCache holding the initial isolating cuts of the
+                root and the persistence LP, which are reused when the same
+                graph and terminals are solved again with the same options
+            checkpoint: a path, or a function called with no arguments, to
+                which the tree is saved when the time limit stops it before
+                it is solved, see save_checkpoint and resume
+            checkpoint_period: if given, the tree is also saved every
+                checkpoint_period seconds
+
+        Yields:
+            an IsolationBranchingEvent for the root, for every improvement
+                of either bound, and a final one once solved or stopped
+        """
+        self._reporting = reporting
+        self._lazy = lazy
+        self._isolating_cut_bound = isolating_cut_bound
+        self._heuristic_period = heuristic_period
+        self._strategy = branching_strategy(branching)
+        if node_selection not in NODE_SELECTIONS:
+            raise ValueError(
+                "node_selection must be one of {}, not {!r}".format(
+                    NODE_SELECTIONS, node_selection
+                )
+            )
+        self._node_selection = node_selection
+        if metrics is not None:
+            self._metrics = metrics
+        self._max_frontier_nodes = max_frontier_nodes
+        self._max_frontier_bytes = max_frontier_bytes
+        if initial_partition is not None:
+            self._offer_partition(initial_partition)
+        with self._metrics.timer("root"):
+            self._initial_isolating_cuts(root_cuts, cache)
+            if kernelize and self._terminals_by_vertex is None:
+                self._root_node.reduce_kernel()
+        self._kernel_terminals = self._root_node.get_terminals()
+        if persistence in {"strong", "weak"}:
+            with self._metrics.timer("root"):
+                self._kernel_persistence(persistence, cache)
+        self._strategy.start(
+            self._root_node.get_graph(),
+            [
+                self._graph.labels[vertex]
+                for vertex in self._root_node.get_representatives().tolist()
+            ],
+        )
+        if warm_start is None:
+            kernel = self._root_node.get_graph()
+            warm_start = len(kernel.neighbors) // 2 <= WARM_START_MAX_EDGES
+        first_node = IsolationBranchingNode(
+            self._root_node.get_graph(),
+            self._kernel_terminals,
+            flows=self._root_node.get_flows() if warm_start else None,
+            removed_capacity=self._root_node.get_removed_capacity(),
+        )
+        self._unexplored_nodes = IsolationBranchingFrontier()
+        self._active_node = first_node
+        self._run_heuristics(first_node)
+        self._add_nodes([first_node])
+
+        yield from self._iterate(
+            self._start_time + time_limit, workers, checkpoint, checkpoint_period
+        )
+
+    def _kernel_persistence(self, persistence, cache):
+        """Restricts the terminals of kernel vertices by the LP relaxation.
+
+        The kernel is usually much smaller than the graph, so the LP is
+            solved on the kernel, whose vertices are labelled by their
+            representatives, and mapped back to kernel vertex ids.
+        """
+        kernel = self._root_node.get_graph()
+        if not len(kernel.neighbors):
+            # the root cuts already separate every vertex
+            return
+        terminal_labels = [
+            kernel.labels[terminal] for terminal in self._kernel_terminals.tolist()
+        ]
+        terminals_by_label = lp_algorithm(
+            kernel.to_networkx(),
+            terminal_labels,
+            persistence=persistence,
+            cache=cache,
+        )
+        self._kernel_terminals_by_vertex = {
+            kernel.index_of(label): np.sort(kernel.indices_of(list(allowed)))
+            for label, allowed in terminals_by_label.items()
+        }
+
+    def _initial_isolating_cuts(self, method, cache):
+        """Computes the isolating cuts of the root, or takes them from cache."""
+        if cache is None:
+            self._root_node.initial_isolating_cuts(method=method)
+            return
+        key = cache.key("root", self._graph, self._terminals, method)
+        isolating_cuts = cache.get(key)
+        if isolating_cuts is None:
+            self._root_node.initial_isolating_cuts(method=method)
+            cache.put(key, self._root_node.get_isolating_cuts())
+        else:
+            self._root_node.set_isolating_cuts(*isolating_cuts)
+
+    def resume(
+        self,
+        reporting,
+        time_limit=600,
+        workers=None,
+        checkpoint=None,
+        checkpoint_period=None,
+        metrics=None,
+    ):
+        """Continues solving a tree loaded with load_checkpoint.
+
+        Takes the arguments of resume_iter, of which it returns the outcome.
 
         Returns:
             source_sets: the nodes that remain connected to each terminal
-            cut_value: the cost of the multi-terminal cut
+            cut_value: the cost of the multi-terminal cut, which is optimal
+                unless the time limit was reached again
+        """
+        for event in self.resume_iter(
+            reporting, time_limit, workers, checkpoint, checkpoint_period, metrics
+        ):
+            pass
+        return event.source_sets, event.cut_value
+
+    def resume_iter(
+        self,
+        reporting,
+        time_limit=600,
+        workers=None,
+        checkpoint=None,
+        checkpoint_period=None,
+        metrics=None,
+    ):
+        """Continues solving a loaded tree, yielding events like solve_iter.
+
+        Args:
+            reporting: True if the report should be printed as it goes
+            time_limit: the time, in seconds, this call may run for
+            workers: the number of processes, as in solve
+            checkpoint: where to save the tree again, as in solve
+            checkpoint_period: how often to save it, as in solve
+            metrics: the IsolationBranchingMetrics to continue with, as in
+                solve, or None to keep the loaded one without callbacks
+
+        Yields:
+            an IsolationBranchingEvent for the loaded state, for every
+                improvement of either bound, and a final one
         """
         self._reporting = reporting
-        self._root_node.initial_isolating_cuts()
-        graph = self._root_node.get_graph()
-        first_node = IsolationBranchingNode(graph, self._terminals, None, None)
-        self._all_nodes = [first_node]
-        self._unexplored_nodes = [first_node]
-
-        while not self._done and time.time() - self._start_time < time_limit:
-            self._step()
-
-        # done
-        self._active_node = self._node_with_best_upper_bound()
-        # print(self.report)
-        final_node_source_sets = {}
-        for terminal in self._terminals:
-            if "combined" in self._active_node.graph.nodes[terminal]:
-                final_node_source_sets[terminal] = self._active_node.graph.nodes[
-                    terminal
-                ]["combined"] | {terminal}
+        if metrics is not None:
+            self._metrics = metrics
+        yield from self._iterate(
+            time.time() + time_limit, workers, checkpoint, checkpoint_period
+        )
+
+    def _iterate(self, deadline, workers, checkpoint, checkpoint_period):
+        """Steps until the tree is solved or the deadline passes.
+
+        The tree is saved to checkpoint, if any, every checkpoint_period
+            seconds and once more when it stops unsolved, also when the
+            caller stops iterating early.
+
+        Yields:
+            IsolationBranchingEvent, see solve_iter
+        """
+        last_checkpoint = time.time()
+        lower_bound, upper_bound = self.lower_bound, self.best_upper_bound
+        yield self._event("incumbent")
+        if workers is not None and workers > 1 and not self._done:
+            self._pool = IsolationBranchingPool(self._root_node.get_graph(), workers)
+        try:
+            while not self._done and time.time() < deadline:
+                self._step()
+                if self._metrics.due():
+                    self._notify()
+                if (
+                    checkpoint is not None
+                    and checkpoint_period is not None
+                    and time.time() - last_checkpoint >= checkpoint_period
+                ):
+                    self._save(checkpoint)
+                    last_checkpoint = time.time()
+                if self.best_upper_bound < upper_bound:
+                    yield self._event("incumbent")
+                elif self.lower_bound > lower_bound:
+                    yield self._event("lower_bound")
+                lower_bound, upper_bound = self.lower_bound, self.best_upper_bound
+        finally:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+            if checkpoint is not None and not self._done:
+                self._save(checkpoint)
+        if self._node_with_best_upper_bound() is not None:
+            self._active_node = self._node_with_best_upper_bound()
+        self._notify()
+        yield self._event("solved" if self._done else "stopped")
+
+    def _notify(self):
+        """Prints the report, if reporting, and calls the metric callbacks."""
+        if self._reporting:
+            print(self.report)
+        self._metrics.notify(
+            {
+                "Time Elapsed": time.time() - self._start_time,
+                "Best Upper Bound": self.best_upper_bound,
+                "Lower Bound": self.lower_bound,
+                "Nodes Unexplored": self.unexplored_nodes_count,
+                "Nodes Total": self.total_nodes_count,
+            }
+        )
+
+    def _save(self, checkpoint):
+        with self._metrics.timer("checkpoint"):
+            if callable(checkpoint):
+                checkpoint()
             else:
-                final_node_source_sets[terminal] = {terminal}
+                self.save_checkpoint(checkpoint)
+
+    def save_checkpoint(self, path):
+        """Saves the state of the tree to a file, replacing it atomically.
 
-        return final_node_source_sets, round(self._active_node.lower_bound, 8)
+        The file holds the root, the frontier, the incumbent and the counters,
+            and can be loaded in another process with load_checkpoint.
+        """
+        save_state(self, path)
+
+    @classmethod
+    def load_checkpoint(cls, path):
+        """Loads a tree saved by save_checkpoint, to be continued with resume."""
+        tree = load_state(path)
+        if not isinstance(tree, cls):
+            raise ValueError(
+                "{} is not an isolation branching checkpoint".format(path)
+            )
+        return tree
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_pool"] = None
+        # the time already spent, which the loaded tree continues from
+        state["_start_time"] = time.time() - self._start_time
+        frontier = (
+            [] if self._unexplored_nodes is None else self._unexplored_nodes.nodes()
+        )
+        others = [
+            node for node in (self._active_node, self._incumbent) if node is not None
+        ]
+        packed, indices = pack_nodes(frontier + others)
+        positions = dict(zip(map(id, frontier + others), indices))
+        state["_active_node"] = positions.get(id(self._active_node))
+        state["_incumbent"] = positions.get(id(self._incumbent))
+        state["_unexplored_nodes"] = (
+            None if self._unexplored_nodes is None else indices[: len(frontier)]
+        )
+        state["_nodes"] = packed
+        return state
+
+    def __setstate__(self, state):
+        packed = state.pop("_nodes")
+        self.__dict__.update(state)
+        self._start_time = time.time() - state["_start_time"]
+        if self._kernel_terminals is None:
+            nodes = []
+        else:
+            nodes = unpack_nodes(
+                self._root_node.get_graph(), self._kernel_terminals, packed
+            )
+        if self._active_node is not None:
+            self._active_node = nodes[self._active_node]
+        if self._incumbent is not None:
+            self._incumbent = nodes[self._incumbent]
+        if self._unexplored_nodes is not None:
+            frontier = IsolationBranchingFrontier()
+            for index in self._unexplored_nodes:
+                frontier.push(nodes[index], nodes[index].nbytes)
+            self._unexplored_nodes = frontier
+
+    def _event(self, kind):
+        """The event of the current state, see IsolationBranchingEvent."""
+        if self._source_sets_value != self._incumbent_value:
+            assignment = self._incumbent_assignment
+            self._source_sets = {
+                self._graph.labels[terminal]: {
+                    self._graph.labels[vertex]
+                    for vertex in np.flatnonzero(assignment == terminal)
+                }
+                for terminal in self._terminals
+            }
+            self._source_sets_value = self._incumbent_value
+            self._source_sets_cut_value = round(self._cut_value(assignment), 8)
+        cut_value = self._source_sets_cut_value
+        lower_bound = cut_value if self._done else min(self.lower_bound, cut_value)
+        return IsolationBranchingEvent(
+            kind,
+            self._source_sets,
+            cut_value,
+            lower_bound,
+            (cut_value - lower_bound) / cut_value if cut_value > 0 else 0.0,
+            time.time() - self._start_time,
+        )
+
+    def _cut_value(self, assignment):
+        """The total capacity of the edges between different source sets."""
+        return heuristics.cut_value(self._graph, assignment)
+
+    def _original_assignment(self, node):
+        """The terminal of every input vertex in a node, or -1."""
+        kernel_assignment = node.assignment[self._root_node.get_vertex_map()]
+        return np.where(
+            kernel_assignment >= 0,
+            self._root_node.get_representatives()[kernel_assignment],
+            -1,
+        )
+
+    def _source_set_sizes(self, node):
+        sizes = np.bincount(
+            self._original_assignment(node) + 1,
+            minlength=self._graph.vertex_count + 1,
+        )
+        return {
+            self._graph.labels[terminal]: int(sizes[terminal + 1]) - 1
+            for terminal in self._terminals
+        }
 
     @property
     def report(self):
         return {
-            "Source Set Sizes": {
-                terminal: len(self._active_node.graph.nodes[terminal]["combined"])
-                for terminal in self._terminals
-            },
+            "Source Set Sizes": self._source_set_sizes(self._active_node),
             "Active Node Depth": self._active_node.depth,
             "Active Node Lower Bound": self._active_node.lower_bound,
             "Active Node Upper Bound": self._active_node.upper_bound,
-            "Active Node Total Unassigned Vertices": len(
-                set(self._active_node.graph.nodes()) - set(self._terminals)
-            ),
+            "Active Node Total Unassigned Vertices": self._active_node.unassigned_count,
             "Best Unexplored Lower Bound": self.best_unexplored_lower_bound,
             "Best Upper Bound": self.best_upper_bound,
             "Nodes Unexplored": self.unexplored_nodes_count,
             "Nodes Total": self.total_nodes_count,
-            "Time Elapsed": time.time() - self._start_time
+            "Time Elapsed": time.time() - self._start_time,
+            "Kernel Vertices": self._active_node.graph.vertex_count,
+            "Kernel Edges": self._active_node.graph.edge_count,
+            "Kernel Reductions": self._root_node.get_reductions(),
         }
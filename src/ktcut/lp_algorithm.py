@@ -1,9 +1,12 @@
 """Solves the LP Formulation of the k-Terminal Cut Problem."""
 
-from ktcut.ip_formulation import IPFormulation
+from ktcut.ip_formulation import make_formulation
+from ktcut.ip_formulation import solver_key
 
 
-def lp_algorithm(graph, terminals, persistence=None, solver=None):
+def lp_algorithm(
+    graph, terminals, persistence=None, solver=None, cache=None, compact=False
+):
     """Solves the LP formulation of the k-Terminal Cut Problem.
 
     minimize (1/2) sum_{i,j,k}{z_{ij}^k}
@@ -17,18 +20,35 @@ def lp_algorithm(graph, terminals, persistence=None, solver=None):
         terminals: The vertices which are terminals in the k-Terminal Cut problem.
         persistence: If `strong', assumes that 0s and 1s are persistent. If
             'weak', assumes only 0s are persistent.
-        solver: which solver to use to solve the LP.
+        solver: which solver to use to solve the LP, a pulp solver or
+            "highs" to solve a sparse formulation in-process with SciPy.
+        cache: a ResultCache from which the result is taken if the same LP
+            was solved before, with the same solver options, and to which
+            it is added otherwise if it is proven optimal.
+        compact: if the smaller pulp model of IPFormulation is used, with
+            one edge variable per undirected edge and terminal.
 
     Returns:
         dictionary of possible_terminals_by_node.
         value of the IP or LP cut.
     """
-    ip_formulation = IPFormulation(graph, terminals, solver)
+    if cache is not None:
+        key = cache.key(
+            "lp", graph, terminals, persistence, solver_key(solver), compact
+        )
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+    ip_formulation = make_formulation(graph, terminals, solver, compact)
     ip_formulation.solve_lp()
 
     if persistence == "strong":
-        return ip_formulation.get_possible_terminals_by_node_strong()
+        result = ip_formulation.get_possible_terminals_by_node_strong()
     elif persistence == "weak":
-        return ip_formulation.get_possible_terminals_by_node_weak()
+        result = ip_formulation.get_possible_terminals_by_node_weak()
     else:
-        return ip_formulation.get_cut_value()
+        result = ip_formulation.get_cut_value()
+    if cache is not None and ip_formulation.is_optimal():
+        cache.put(key, result)
+    return result
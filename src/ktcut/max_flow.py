@@ -0,0 +1,135 @@
+"""Maximum flows on CSR graphs, optionally warm-started from a previous flow."""
+import numpy as np
+
+# residual capacities below this value are treated as saturated
+_EPSILON = 1e-9
+
+
+def maximum_flow(graph, source_mask, sink_mask, flow=None):
+    """Computes a maximum flow from the source vertices to the sink vertices.
+
+    Flow is augmented along shortest paths of the residual graph, one
+        blocking flow per phase (Dinic's algorithm). Vertices in the source
+        (respectively, sink) mask behave as a single source (respectively,
+        sink) of unlimited capacity. The residual graph is kept in Python
+        lists, which the searches index faster than numpy arrays; see
+        experiments/max_flow_benchmark.py for a comparison with networkx.
+
+    A flow is stored with one value per arc and is antisymmetric:
+        flow[a] == -flow[graph.reverse_arcs[a]]. Any feasible flow may be
+        given as a starting point. In particular, a maximum flow remains
+        feasible after vertices are added to the source or sink mask, so
+        only the additional flow has to be found.
+
+    Args:
+        graph: the CSRGraph
+        source_mask: boolean array of the source vertices
+        sink_mask: boolean array of the sink vertices
+        flow: a feasible flow to start from, which is not modified
+
+    Returns:
+        flow: the maximum flow
+        flow_value: the value of the maximum flow
+        cut_source: boolean array of the vertices which cannot reach a sink
+            in the residual graph, the maximal source set of a minimum cut
+    """
+    if flow is None:
+        residual = graph.capacities.tolist()
+    else:
+        residual = (graph.capacities - flow).tolist()
+    offsets, heads, reverse = graph.arc_lists()
+    is_source = source_mask.tolist()
+    is_sink = sink_mask.tolist()
+    sources = np.flatnonzero(source_mask).tolist()
+
+    while True:
+        level = _shortest_path_levels(
+            offsets, heads, residual, is_source, is_sink, sources
+        )
+        if level is None:
+            break
+        _blocking_flow(offsets, heads, reverse, residual, is_sink, sources, level)
+
+    flow = graph.capacities - np.array(residual, dtype=np.float64)
+    cut_source = ~_reaches_sink(offsets, heads, reverse, residual, sink_mask)
+    leaving = source_mask[graph.arc_tails] & ~source_mask[graph.neighbors]
+    return flow, float(flow[leaving].sum()), cut_source
+
+
+def _shortest_path_levels(offsets, heads, residual, is_source, is_sink, sources):
+    """Breadth-first search from the sources over non-saturated arcs.
+
+    Returns:
+        the distance of each vertex from the sources, or -1 if it is further
+            than the nearest sink, or None if no sink can be reached
+    """
+    level = [-1] * (len(offsets) - 1)
+    for source in sources:
+        level[source] = 0
+    queue = list(sources)
+    sink_level = None
+    for u in queue:
+        if is_sink[u]:
+            continue
+        next_level = level[u] + 1
+        if sink_level is not None and next_level > sink_level:
+            break
+        for arc in range(offsets[u], offsets[u + 1]):
+            v = heads[arc]
+            if level[v] < 0 and residual[arc] > _EPSILON and not is_source[v]:
+                level[v] = next_level
+                queue.append(v)
+                if is_sink[v]:
+                    sink_level = next_level
+    if sink_level is None:
+        return None
+    return level
+
+
+def _blocking_flow(offsets, heads, reverse, residual, is_sink, sources, level):
+    """Saturates every shortest augmenting path, with an iterative search."""
+    current_arc = offsets[:-1]
+    for source in sources:
+        path_vertices = [source]
+        path_arcs = []
+        while path_vertices:
+            u = path_vertices[-1]
+            if is_sink[u] and path_arcs:
+                bottleneck = min(residual[arc] for arc in path_arcs)
+                for arc in path_arcs:
+                    residual[arc] -= bottleneck
+                    residual[reverse[arc]] += bottleneck
+                path_vertices = [source]
+                path_arcs = []
+                continue
+            end = offsets[u + 1]
+            arc = current_arc[u]
+            while arc < end:
+                v = heads[arc]
+                if residual[arc] > _EPSILON and level[v] == level[u] + 1:
+                    break
+                arc += 1
+            current_arc[u] = arc
+            if arc < end:
+                path_vertices.append(heads[arc])
+                path_arcs.append(arc)
+            else:
+                # dead end: no augmenting path continues through u
+                level[u] = -1
+                path_vertices.pop()
+                if path_arcs:
+                    path_arcs.pop()
+                    current_arc[path_vertices[-1]] += 1
+
+
+def _reaches_sink(offsets, heads, reverse, residual, sink_mask):
+    """The vertices from which a sink can be reached over non-saturated arcs."""
+    reached = sink_mask.tolist()
+    queue = np.flatnonzero(sink_mask).tolist()
+    for w in queue:
+        for arc in range(offsets[w], offsets[w + 1]):
+            u = heads[arc]
+            if not reached[u] and residual[reverse[arc]] > _EPSILON:
+                reached[u] = True
+                queue.append(u)
+    return np.array(reached, dtype=bool)
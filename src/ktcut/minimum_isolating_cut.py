@@ -1,14 +1,16 @@
 """Calculates the Minimum Isolating Cut."""
 
-import networkx as nx
+import numpy as np
 
-from networkx.algorithms.flow import preflow_push
+from ktcut.csr_graph import CSRGraph
+from ktcut.max_flow import maximum_flow
 
 
 def minimum_isolating_cut(graph, source_vertices, sink_vertices):
     """Compute a minimum isolating cut in G.
 
     The minimum isolating cut is a cut which separates all the source_nodes from all the sink_nodes.
+        G is converted to a CSRGraph and is not modified.
 
     Params:
         graph: the graph G in which to compute the minimum isolating cut
@@ -19,41 +21,41 @@ def minimum_isolating_cut(graph, source_vertices, sink_vertices):
         cut_source: the source set of the isolating cut
         cut_weight: the weight of the isolating cut
     """
-
-    # construct auxiliary graph with super-source and super-sink nodes
-    graph.add_nodes_from(["s_node", "t_node"])
-    graph.add_edges_from(
-        [("s_node", source_adj_node) for source_adj_node in source_vertices]
+    csr_graph = CSRGraph.from_networkx(graph)
+    source_mask = np.zeros(csr_graph.vertex_count, dtype=bool)
+    source_mask[csr_graph.indices_of(source_vertices)] = True
+    sink_mask = np.zeros(csr_graph.vertex_count, dtype=bool)
+    sink_mask[csr_graph.indices_of(sink_vertices)] = True
+
+    cut_source_mask, cut_weight, _ = minimum_isolating_cut_csr(
+        csr_graph, source_mask, sink_mask
     )
-    graph.add_edges_from([(sink_adj_node, "t_node") for sink_adj_node in sink_vertices])
-
-    # find the residual graph after running a maximum flow algorithm
-    residual = preflow_push(graph, "s_node", "t_node")
-
-    # remove the edges which are saturated in the residual graph
-    cutset = [
-        (u, v, d) for u, v, d in residual.edges(data=True) if d["flow"] >= d["capacity"]
-    ]
-    residual.remove_edges_from(cutset)
-
-    # the sink set is all nodes which are reachable from the super-sink
-    #   after the saturated arcs have been removed
-    cut_sink = set(nx.shortest_path_length(residual, target="t_node"))
-    # the source set is all the nodes which are not in the sink set
-    cut_source = set(graph) - cut_sink
-
-    if cutset is not None:
-        residual.add_edges_from(cutset)
+    cut_source = {
+        csr_graph.labels[vertex] for vertex in np.flatnonzero(cut_source_mask)
+    }
+    return cut_source, cut_weight
 
-    # determine the weight of the resulting minimum cut
-    cut_weight = residual.graph["flow_value"]
 
-    assert "s_node" in cut_source, " source node not included in source set "
-    assert "t_node" in cut_sink, " sink node not included in sink set "
+def minimum_isolating_cut_csr(graph, source_mask, sink_mask, flow=None):
+    """Compute a minimum isolating cut in a CSRGraph.
 
-    cut_source -= {"s_node"}
-    cut_sink -= {"t_node"}
+    The graph is not modified. Vertices inside the source mask (respectively,
+        sink mask) behave as if they were contracted into a single source
+        (respectively, sink).
 
-    graph.remove_nodes_from(["s_node", "t_node"])
+    Params:
+        graph: the CSRGraph G in which to compute the minimum isolating cut
+        source_mask: boolean array of vertices required to fall in the source set
+        sink_mask: boolean array of vertices required to fall in the sink set
+        flow: a feasible flow to warm-start from, e.g. the flow of a previous
+            cut whose source and sink masks were subsets of these ones
 
-    return cut_source, cut_weight
+    Returns:
+        cut_source: boolean array of the (maximal) source set of the isolating cut
+        cut_weight: the weight of the isolating cut
+        flow: the maximum flow certifying the cut
+    """
+    flow, cut_weight, cut_source = maximum_flow(
+        graph, source_mask, sink_mask, flow=flow
+    )
+    return cut_source, cut_weight, flow
@@ -0,0 +1,184 @@
+"""Caches results of repeated k-terminal cut computations.
+
+Results are keyed by a fingerprint of the graph, the terminals and the
+    options they depend on, so identical work is recognized whatever object
+    the graph is held in. Entries are kept pickled, in memory and optionally
+    in a directory, both with a size limit above which the least recently
+    used entries are evicted.
+"""
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+
+from ktcut.checkpoint import load_state
+from ktcut.checkpoint import save_state
+from ktcut.csr_graph import CSRGraph
+
+# the suffix of the entry files, so that other files in the directory, such
+# as checkpoints, are never taken for entries and evicted
+ENTRY_SUFFIX = ".ktcut-cache"
+
+
+def fingerprint(graph, terminals, *options):
+    """Hashes a graph, terminals and options into a hexadecimal string.
+
+    Args:
+        graph: a networkx graph or a CSRGraph; a networkx graph is converted
+            first, so it has the fingerprint of its CSRGraph
+        terminals: the terminals, whose order is significant
+        options: further values with a stable repr, e.g. a persistence mode
+
+    Returns:
+        the blake2b digest of the CSR arrays, labels, terminals and options
+    """
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_networkx(graph)
+    digest = hashlib.blake2b(digest_size=20)
+    for array, dtype in (
+        (graph.offsets, np.int64),
+        (graph.neighbors, np.int64),
+        (graph.capacities, np.float64),
+    ):
+        digest.update(np.ascontiguousarray(array, dtype=dtype).tobytes())
+    digest.update(repr(graph.labels).encode())
+    digest.update(repr(np.asarray(terminals).tolist()).encode())
+    digest.update(repr(options).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Least recently used cache of pickled results, in memory and on disk.
+
+    Values are pickled when they are stored and unpickled when they are
+        read, so callers may modify what they get back, and the size of
+        every entry is known exactly. A value larger than the limit is not
+        kept.
+
+    Attributes:
+        max_bytes: the size limit of the entries held in memory
+        directory: the directory in which entries are also saved, or None;
+            only files named with ENTRY_SUFFIX are considered entries
+        max_disk_bytes: the size limit of the entries in directory, or None
+            for no limit
+        hits: the number of lookups which found an entry, by kind
+        misses: the number of lookups which found none, by kind
+        evictions: the number of entries evicted from memory and disk
+    """
+
+    def __init__(self, max_bytes=256 * 2**20, directory=None, max_disk_bytes=None):
+        self.max_bytes = max_bytes
+        self.directory = None if directory is None else os.fspath(directory)
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = {}
+        self.misses = {}
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(kind, graph, terminals, *options):
+        """The key of a result of some kind, e.g. "lp", see fingerprint."""
+        return "{}-{}".format(kind, fingerprint(graph, terminals, *options))
+
+    @property
+    def nbytes(self):
+        """The size of the pickled entries held in memory."""
+        return self._nbytes
+
+    @property
+    def stats(self):
+        """The hits, misses, evictions and size of the cache."""
+        hits = sum(self.hits.values())
+        misses = sum(self.misses.values())
+        return {
+            "Hits": hits,
+            "Misses": misses,
+            "Hit Rate": hits / (hits + misses) if hits + misses else 0.0,
+            "Evictions": self.evictions,
+            "Entries": len(self._entries),
+            "Bytes": self._nbytes,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """The value stored under key, or default if there is none."""
+        kind = key.split("-", 1)[0]
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+        elif self.directory is not None and os.path.exists(self._path(key)):
+            try:
+                data = load_state(self._path(key))
+            except (OSError, EOFError, pickle.UnpicklingError):
+                data = None
+            else:
+                # marks the file as recently used
+                os.utime(self._path(key))
+                self._remember(key, data)
+        if data is None:
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+            return default
+        self.hits[kind] = self.hits.get(kind, 0) + 1
+        return pickle.loads(data)
+
+    def put(self, key, value):
+        """Stores a value under key, evicting old entries if needed."""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, data)
+        if self.directory is not None and (
+            self.max_disk_bytes is None or len(data) <= self.max_disk_bytes
+        ):
+            save_state(data, self._path(key))
+            self._evict_disk()
+
+    def clear(self):
+        """Removes every entry from memory and from the directory."""
+        self._entries.clear()
+        self._nbytes = 0
+        for path, _, _ in self._disk_entries():
+            os.unlink(path)
+
+    def _remember(self, key, data):
+        if key in self._entries:
+            self._nbytes -= len(self._entries.pop(key))
+        if len(data) > self.max_bytes:
+            return
+        self._entries[key] = data
+        self._nbytes += len(data)
+        while self._nbytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._nbytes -= len(evicted)
+            self.evictions += 1
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def _disk_entries(self):
+        """The (path, size, last use) of every entry in the directory."""
+        if self.directory is None:
+            return []
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(ENTRY_SUFFIX):
+                status = entry.stat()
+                entries.append((entry.path, status.st_size, status.st_mtime))
+        return entries
+
+    def _evict_disk(self):
+        if self.max_disk_bytes is None:
+            return
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        nbytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if nbytes <= self.max_disk_bytes:
+                break
+            os.unlink(path)
+            nbytes -= size
+            self.evictions += 1
@@ -0,0 +1,194 @@
+"""Sparse-matrix LP and IP Formulations solved in-process with HiGHS.
+
+Requires SciPy 1.9 or later, which is imported when this module is.
+"""
+import numpy as np
+from scipy import sparse
+from scipy.optimize import Bounds
+from scipy.optimize import LinearConstraint
+from scipy.optimize import linprog
+from scipy.optimize import milp
+
+from ktcut.csr_graph import CSRGraph
+from ktcut.ip_formulation import initial_assignment
+from ktcut.ip_formulation import objective_cutoff
+
+
+class SparseIPFormulation:
+    """Formulates the k-Terminal Cut Problem as sparse matrices for HiGHS.
+
+    The formulation is the one of IPFormulation, with the same getters, but
+        the constraint matrix is assembled from the edge arrays of the
+        CSRGraph of the graph instead of one pulp constraint at a time, and
+        it is solved by scipy.optimize instead of an external process.
+
+    Column i * k + c holds x_i^c for the c-th terminal, followed by the
+        column n * k + e * k + c holding z_e^c for the e-th edge. Terminals
+        are fixed by their bounds. Only the x columns are integral in the
+        IP, since the z columns then are at every optimum.
+
+    Attributes:
+        graph: the networkx graph
+        terminals: the terminals of the networkx graph
+    """
+
+    def __init__(self, graph, terminals):
+        self.graph = graph
+        self.terminals = terminals
+        self.x_values = None
+        self.possible_terminals_by_node_weak = None
+        self.possible_terminals_by_node_strong = None
+        self.source_sets = None
+        self.cut_value = None
+        self._csr_graph = CSRGraph.from_networkx(graph)
+
+    def _objective(self):
+        """The cost of every column."""
+        n, k = self._csr_graph.vertex_count, len(self.terminals)
+        _, _, capacities = self._csr_graph.edges()
+        return np.concatenate([np.zeros(n * k), np.repeat(0.5 * capacities, k)])
+
+    def _bounds(self):
+        """Bounds fixing x_t^t = 1 for every terminal t."""
+        n, k = self._csr_graph.vertex_count, len(self.terminals)
+        edge_count = len(self._csr_graph.edges()[0])
+        lower = np.zeros(n * k + edge_count * k)
+        terminal_ids = self._csr_graph.indices_of(self.terminals)
+        lower[terminal_ids * k + np.arange(k)] = 1.0
+        return lower, np.ones_like(lower)
+
+    def _node_constraints(self):
+        """The matrix of sum_k{x_{i}^k} = 1, one row per vertex."""
+        n, k = self._csr_graph.vertex_count, len(self.terminals)
+        edge_count = len(self._csr_graph.edges()[0])
+        return sparse.csr_matrix(
+            (
+                np.ones(n * k),
+                (np.repeat(np.arange(n), k), np.arange(n * k)),
+            ),
+            shape=(n, (n + edge_count) * k),
+        )
+
+    def _edge_constraints(self):
+        """The matrix of x_i^k - x_j^k - z_ij^k <= 0, in both directions."""
+        n, k = self._csr_graph.vertex_count, len(self.terminals)
+        tails, heads, _ = self._csr_graph.edges()
+        edge_count = len(tails)
+        row_count = 2 * edge_count * k
+        rows = np.arange(row_count)
+        # row (d * edge_count + e) * k + c for direction d, edge e, terminal c
+        columns = np.arange(k)
+        first = np.concatenate([tails, heads])[:, None] * k + columns
+        second = np.concatenate([heads, tails])[:, None] * k + columns
+        z = n * k + np.tile(np.arange(edge_count), 2)[:, None] * k + columns
+        return sparse.csr_matrix(
+            (
+                np.concatenate(
+                    [np.ones(row_count), -np.ones(row_count), -np.ones(row_count)]
+                ),
+                (
+                    np.tile(rows, 3),
+                    np.concatenate([first.ravel(), second.ravel(), z.ravel()]),
+                ),
+            ),
+            shape=(row_count, (n + edge_count) * k),
+        )
+
+    def _record(self, values, objective):
+        """Records the solution of either program."""
+        n, k = self._csr_graph.vertex_count, len(self.terminals)
+        self.x_values = values[: n * k].reshape(n, k)
+        self.cut_value = round(objective, 5)
+        labels = self._csr_graph.labels
+        ones = np.round(self.x_values, 5) == 1.0
+        self.source_sets = {terminal: set() for terminal in self.terminals}
+        for vertex, position in zip(*np.nonzero(ones)):
+            self.source_sets[self.terminals[position]].add(labels[vertex])
+
+    def _calculate_possible_terminals_by_node(self):
+        """Records the possible terminals by node under both persistences."""
+        ones = np.round(self.x_values, 5) == 1.0
+        positive = self.x_values > 0.0
+        self.possible_terminals_by_node_weak = {}
+        self.possible_terminals_by_node_strong = {}
+        for vertex, label in enumerate(self._csr_graph.labels):
+            weak = {self.terminals[c] for c in np.flatnonzero(ones[vertex])}
+            self.possible_terminals_by_node_weak[label] = weak or self.terminals
+            self.possible_terminals_by_node_strong[label] = {
+                self.terminals[c] for c in np.flatnonzero(positive[vertex])
+            }
+
+    def get_cut_value(self):
+        """get: self.cut_value"""
+        return self.cut_value
+
+    def is_optimal(self):
+        """If a solution was recorded, which HiGHS proved optimal."""
+        return self.cut_value is not None
+
+    def get_possible_terminals_by_node_weak(self):
+        """get: self.possible_terminals_by_node_weak"""
+        return self.possible_terminals_by_node_weak
+
+    def get_possible_terminals_by_node_strong(self):
+        """get: self.possible_terminals_by_node_strong"""
+        return self.possible_terminals_by_node_strong
+
+    def get_source_sets(self):
+        """get: self.source_sets"""
+        return self.source_sets
+
+    def solve_ip(self, initial_partition=None):
+        """Solves the Integer Program with scipy.optimize.milp.
+
+        Args:
+            initial_partition: a known multiway cut, as in
+                IPFormulation.solve_ip. milp takes no MIP start, so only its
+                value is used, as a constraint cutting off worse solutions.
+        """
+        objective = self._objective()
+        lower, upper = self._bounds()
+        node_constraints = self._node_constraints()
+        edge_constraints = self._edge_constraints()
+        integrality = np.zeros(len(objective), dtype=np.uint8)
+        integrality[: node_constraints.shape[0] * len(self.terminals)] = 1
+        constraints = [
+            LinearConstraint(node_constraints, 1.0, 1.0),
+            LinearConstraint(edge_constraints, -np.inf, 0.0),
+        ]
+        if initial_partition is not None:
+            _, cut_value = initial_assignment(
+                self._csr_graph, self.terminals, initial_partition
+            )
+            cutoff = objective_cutoff(cut_value)
+            constraints.append(LinearConstraint(objective[None, :], -np.inf, cutoff))
+        # the gap is closed, as by CBC, instead of the default 1e-4 of HiGHS
+        result = milp(
+            objective,
+            integrality=integrality,
+            bounds=Bounds(lower, upper),
+            constraints=constraints,
+            options={"mip_rel_gap": 0.0},
+        )
+        if result.status != 0:
+            raise RuntimeError("HiGHS did not solve the IP: " + result.message)
+        self._record(result.x, result.fun)
+
+    def solve_lp(self):
+        """Solves the Linear Program with scipy.optimize.linprog."""
+        objective = self._objective()
+        lower, upper = self._bounds()
+        edge_constraints = self._edge_constraints()
+        result = linprog(
+            objective,
+            A_ub=edge_constraints,
+            b_ub=np.zeros(edge_constraints.shape[0]),
+            A_eq=self._node_constraints(),
+            b_eq=np.ones(self._csr_graph.vertex_count),
+            bounds=np.column_stack([lower, upper]),
+            method="highs",
+        )
+        if result.status != 0:
+            raise RuntimeError("HiGHS did not solve the LP: " + result.message)
+        self._record(result.x, result.fun)
+        self._calculate_possible_terminals_by_node()
@@ -0,0 +1,34 @@
+"""Test saving and resuming Isolation Branching runs."""
+
+
+def test_resume_tree(tmp_path):
+    from networkx.generators.small import tutte_graph
+    from ktcut.csr_graph import CSRGraph
+    from ktcut.isolation_branching_tree import IsolationBranchingTree
+    csr_graph = CSRGraph.from_networkx(tutte_graph())
+    path = tmp_path / "tree.pkl"
+    tree = IsolationBranchingTree(csr_graph, csr_graph.indices_of([1, 17, 34, 40]))
+    tree.solve(reporting=False, time_limit=0, checkpoint=path)
+    assert path.exists()
+    tree = IsolationBranchingTree.load_checkpoint(path)
+    assert tree.started
+    assert tree.unexplored_nodes_count > 0
+    # warm-start flows are not saved
+    assert not tree._root_node.get_flows()
+    _, cut_value = tree.resume(reporting=False)
+    assert cut_value == 8
+    assert tree.unexplored_nodes_count == 0
+
+
+def test_resume_isolation_branching(tmp_path):
+    from networkx.generators.small import tutte_graph
+    from ktcut.isolation_branching import isolation_branching
+    from ktcut.isolation_branching import resume_isolation_branching
+    path = tmp_path / "run.pkl"
+    isolation_branching(
+        tutte_graph(), [1, 17, 34, 40], reporting=False, time_limit=0, checkpoint=path
+    )
+    source_sets, cut_value, report = resume_isolation_branching(path, reporting=False)
+    assert cut_value == 8
+    assert sum(len(source_set) for source_set in source_sets.values()) == 46
+    assert report["Parts"] == 1
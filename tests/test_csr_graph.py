@@ -0,0 +1,36 @@
+"""Test the array-backed graph used by isolation branching."""
+import networkx as nx
+
+
+def test_from_networkx_default_capacity():
+    from ktcut.csr_graph import CSRGraph
+    graph = nx.Graph()
+    graph.add_edge('a', 'b', capacity=3.0)
+    graph.add_edge('b', 'c')
+    csr_graph = CSRGraph.from_networkx(graph)
+    assert csr_graph.vertex_count == 3
+    assert csr_graph.edge_count == 2
+    assert list(csr_graph.weighted_degrees()) == [3.0, 4.0, 1.0]
+    assert 'capacity' not in graph['b']['c']
+
+
+def test_contract_merges_parallel_edges():
+    from ktcut.csr_graph import CSRGraph
+    graph = CSRGraph.from_edges(4, [0, 1, 2, 0], [1, 2, 3, 3], [1., 2., 3., 4.])
+    contracted = graph.contract(0, {2})
+    assert contracted.vertex_count == 4
+    assert contracted.weighted_degrees()[2] == 0
+    networkx_graph = contracted.to_networkx()
+    assert networkx_graph[0][1]['capacity'] == 3.0
+    assert networkx_graph[0][3]['capacity'] == 7.0
+
+
+def test_isolation_branching_does_not_modify_graph():
+    from networkx.generators.small import tutte_graph
+    from ktcut.isolation_branching import isolation_branching
+    graph = tutte_graph()
+    partition, cut_value, _ = isolation_branching(graph, [1, 17, 34],
+                                                  reporting=False)
+    assert cut_value == 5
+    assert sum(len(source_set) for source_set in partition.values()) == 46
+    assert all('capacity' not in data for _, _, data in graph.edges(data=True))
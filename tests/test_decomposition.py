@@ -0,0 +1,28 @@
+"""Test the decomposition of instances at their terminals."""
+import networkx as nx
+
+
+def test_decomposition_at_terminals():
+    from networkx.generators.small import tutte_graph
+    from ktcut.isolation_branching import isolation_branching
+    graph = nx.disjoint_union(tutte_graph(), tutte_graph())
+    graph.add_edge(1, 47)
+    graph.add_node('isolated')
+    terminals = [1, 17, 34, 47, 63, 80]
+    partition, cut_value, report = isolation_branching(graph, terminals,
+                                                       reporting=False)
+    assert cut_value == 11
+    assert report['Parts'] == 2
+    assert sum(len(source_set) for source_set in partition.values()) == 93
+
+
+def test_decomposition_all_terminals():
+    from ktcut.isolation_branching import isolation_branching
+    graph = nx.Graph()
+    graph.add_edge(0, 1, capacity=1)
+    graph.add_edge(2, 3, capacity=0.5)
+    partition, cut_value, report = isolation_branching(graph, [3, 2, 1, 0],
+                                                       reporting=False)
+    assert cut_value == 1.5
+    assert report['Parts'] == 0
+    assert partition == {0: {0}, 1: {1}, 2: {2}, 3: {3}}
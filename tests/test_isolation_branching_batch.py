@@ -0,0 +1,33 @@
+"""Test solving many terminal sets on the same graph."""
+
+
+def test_batch():
+    from networkx.generators.small import tutte_graph
+    from ktcut.isolation_branching import isolation_branching
+    from ktcut.isolation_branching_batch import isolation_branching_batch
+    graph = tutte_graph()
+    terminal_sets = [[1, 17, 34, 40], [0, 20, 45], [40, 34, 17, 1]]
+    for workers in (None, 2):
+        results = isolation_branching_batch(graph, terminal_sets, workers=workers)
+        assert len(results) == 3
+        for terminals, (source_sets, cut_value, _) in zip(terminal_sets, results):
+            expected = isolation_branching(graph, terminals, reporting=False)
+            assert cut_value == expected[1]
+            assert set(source_sets) == set(terminals)
+        # a repeated terminal set gets its own copy of the result
+        assert results[0] == results[2] and results[0] is not results[2]
+        results[0][0][1].add("mutated")
+        assert "mutated" not in results[2][0][1]
+
+
+def test_batch_keeps_terminal_order():
+    from networkx.generators.small import tutte_graph
+    from ktcut.isolation_branching import isolation_branching
+    from ktcut.isolation_branching_batch import isolation_branching_batch
+    graph = tutte_graph()
+    # assigned to the first terminal by the decomposition
+    graph.add_node('isolated')
+    terminals = [1, 17, 34, 40]
+    [(source_sets, _, _)] = isolation_branching_batch(graph, [terminals])
+    assert source_sets == isolation_branching(graph, terminals, reporting=False)[0]
+    assert 'isolated' in source_sets[1]
@@ -0,0 +1,36 @@
+"""Test the frontier of unexplored nodes."""
+
+
+class FakeNode:
+
+    def __init__(self, lower_bound, depth):
+        self.lower_bound = lower_bound
+        self.depth = depth
+
+
+def test_frontier_orders():
+    from ktcut.isolation_branching_frontier import IsolationBranchingFrontier
+    frontier = IsolationBranchingFrontier()
+    nodes = [FakeNode(3.0, 1), FakeNode(1.0, 1), FakeNode(2.0, 3),
+             FakeNode(1.0, 2)]
+    for node in nodes:
+        frontier.push(node)
+    assert frontier.best_lower_bound == 1.0
+    assert frontier.pop_maximum_depth() is nodes[2]
+    # ties in lower bound favour the most recently pushed node
+    assert frontier.pop_best_lower_bound() is nodes[3]
+    assert frontier.pop_best_lower_bound() is nodes[1]
+    assert frontier.best_lower_bound == 3.0
+    assert len(frontier) == 1
+
+
+def test_frontier_memory():
+    from ktcut.isolation_branching_frontier import IsolationBranchingFrontier
+    frontier = IsolationBranchingFrontier()
+    nodes = [FakeNode(1.0, 1), FakeNode(2.0, 2)]
+    frontier.push(nodes[0], 100)
+    frontier.push(nodes[1], 50)
+    assert frontier.nbytes == 150
+    assert frontier.peek_maximum_depth() is nodes[1]
+    assert frontier.pop_best_lower_bound() is nodes[0]
+    assert frontier.nbytes == 50
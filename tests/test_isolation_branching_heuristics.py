@@ -0,0 +1,47 @@
+"""Test the primal heuristics of Isolation Branching."""
+import numpy as np
+
+
+def test_heuristics_build_multiway_cuts():
+    from networkx.generators.small import tutte_graph
+    from ktcut.csr_graph import CSRGraph
+    from ktcut import isolation_branching_heuristics as heuristics
+    graph = CSRGraph.from_networkx(tutte_graph())
+    terminals = graph.indices_of([1, 17, 34])
+    assignment = np.full(graph.vertex_count, -1, dtype=np.int64)
+    assignment[terminals] = terminals
+    for heuristic in [
+        heuristics.isolation_heuristic,
+        heuristics.most_connected_terminal,
+        heuristics.greedy_assignment,
+    ]:
+        complete = heuristic(graph, assignment, terminals)
+        assert np.isin(complete, terminals).all()
+        assert np.array_equal(complete[terminals], terminals)
+        improved = heuristics.local_search(graph, complete, terminals)
+        assert np.array_equal(improved[terminals], terminals)
+        assert heuristics.cut_value(graph, improved) <= heuristics.cut_value(
+            graph, complete
+        )
+        assert heuristics.cut_value(graph, improved) >= 5
+
+
+def test_initial_partition():
+    from networkx.generators.small import tutte_graph
+    from ktcut.isolation_branching import isolation_branching
+    graph = tutte_graph()
+    source_sets, cut_value, _ = isolation_branching(
+        graph, [1, 17, 34], reporting=False
+    )
+    assert cut_value == 5
+    # a partial partition is completed greedily
+    partial = {terminal: set(list(nodes)[:3]) for terminal, nodes in source_sets.items()}
+    for initial_partition in [source_sets, partial]:
+        _, cut_value, _ = isolation_branching(
+            graph,
+            [1, 17, 34],
+            reporting=False,
+            heuristic_period=1,
+            initial_partition=initial_partition,
+        )
+        assert cut_value == 5
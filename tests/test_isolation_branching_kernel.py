@@ -0,0 +1,33 @@
+"""Test the safe reductions applied to the kernel before branching."""
+import numpy as np
+
+
+def test_heavy_edges_and_twins():
+    from ktcut.csr_graph import CSRGraph
+    from ktcut.isolation_branching_kernel import heavy_edge_map, twin_map
+    # terminals 0 and 1, vertex 2 hangs off vertex 3, vertices 4 and 5 are
+    # twins adjacent to both terminals and to vertex 3
+    graph = CSRGraph.from_edges(
+        6,
+        [0, 3, 3, 2, 4, 4, 4, 5, 5, 5],
+        [1, 0, 1, 3, 0, 1, 3, 0, 1, 3],
+        [1., 2., 2., 1., 1., 1., 1., 1., 1., 1.],
+    )
+    terminals = np.array([0, 1])
+    vertex_map, vertex_count = heavy_edge_map(graph, terminals)
+    assert vertex_map[2] == vertex_map[3]
+    assert len(set(vertex_map[[0, 1, 4]])) == 3
+    vertex_map, vertex_count = twin_map(graph, terminals)
+    assert vertex_count == 5
+    assert vertex_map[4] == vertex_map[5]
+
+
+def test_reduced_kernel_keeps_cut_value():
+    from networkx.generators.small import tutte_graph
+    from ktcut.csr_graph import CSRGraph
+    from ktcut.isolation_branching_tree import IsolationBranchingTree
+    csr_graph = CSRGraph.from_networkx(tutte_graph())
+    for kernelize in [False, True]:
+        tree = IsolationBranchingTree(csr_graph, csr_graph.indices_of([1, 17, 34]))
+        _, cut_value = tree.solve(reporting=False, kernelize=kernelize)
+        assert cut_value == 5
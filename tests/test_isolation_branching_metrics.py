@@ -0,0 +1,42 @@
+"""Test the metrics and callbacks of Isolation Branching."""
+import json
+
+
+def test_metrics_sink(tmp_path):
+    from networkx.generators.small import tutte_graph
+    from ktcut.isolation_branching import isolation_branching
+    from ktcut.isolation_branching_metrics import IsolationBranchingMetrics
+    from ktcut.isolation_branching_metrics import JsonLinesSink
+    path = tmp_path / "metrics.jsonl"
+    metrics = IsolationBranchingMetrics(callbacks=[JsonLinesSink(path)], interval=0)
+    _, cut_value, _ = isolation_branching(
+        tutte_graph(), [1, 17, 34, 40], reporting=False, metrics=metrics
+    )
+    assert cut_value == 8
+    assert metrics.counters["nodes expanded"] > 0
+    assert metrics.timers["root"] > 0
+    assert metrics.peak_frontier_nodes > 0
+    snapshots = [json.loads(line) for line in path.read_text().splitlines()]
+    assert snapshots
+    assert snapshots[-1]["Best Upper Bound"] == 8
+    assert snapshots[-1]["Counters"] == metrics.counters
+
+
+def test_metrics_of_decomposed_run(tmp_path):
+    import networkx as nx
+    from ktcut.isolation_branching import isolation_branching
+    from ktcut.isolation_branching_metrics import IsolationBranchingMetrics
+    from ktcut.isolation_branching_metrics import JsonLinesSink
+    # two triangles joined at terminal 0, solved as two parts
+    graph = nx.Graph([(0, 1), (1, 3), (3, 0), (0, 5), (5, 6), (6, 0)])
+    path = tmp_path / "metrics.jsonl"
+    metrics = IsolationBranchingMetrics(callbacks=[JsonLinesSink(path)], interval=0)
+    _, cut_value, report = isolation_branching(
+        graph, [0, 3, 6], reporting=False, metrics=metrics
+    )
+    assert report["Parts"] == 2
+    snapshots = [json.loads(line) for line in path.read_text().splitlines()]
+    assert snapshots
+    assert snapshots[-1]["Best Upper Bound"] == cut_value
+    assert all(snapshot["Lower Bound"] <= cut_value for snapshot in snapshots)
+    assert metrics.state_function is None
@@ -0,0 +1,64 @@
+"""Test the strategies choosing the branching vertex."""
+import pytest
+
+
+def test_strategies_keep_cut_value():
+    from networkx.generators.small import tutte_graph
+    from ktcut.isolation_branching import isolation_branching
+    from ktcut.isolation_branching_strategies import BRANCHING_STRATEGIES
+    graph = tutte_graph()
+    for branching in BRANCHING_STRATEGIES:
+        _, cut_value, _ = isolation_branching(
+            graph, [1, 17, 34, 40], reporting=False, branching=branching
+        )
+        assert cut_value == 8
+
+
+def test_pseudocosts_carry_over():
+    from networkx.generators.small import tutte_graph
+    from ktcut.isolation_branching import isolation_branching
+    from ktcut.isolation_branching_strategies import PseudocostStrategy
+    graph = tutte_graph()
+    strategy = PseudocostStrategy()
+    isolation_branching(
+        graph, [1, 17, 34, 40], reporting=False, decompose=False, branching=strategy
+    )
+    assert strategy.pseudocosts
+    reused = PseudocostStrategy(strategy.pseudocosts)
+    _, cut_value, _ = isolation_branching(
+        graph, [1, 17, 34, 40], reporting=False, decompose=False, branching=reused
+    )
+    assert cut_value == 8
+    # the second run starts from the observations of the first one
+    counts = {label: count for label, (_, count) in strategy.pseudocosts.items()}
+    reused_counts = {
+        label: count for label, (_, count) in reused.pseudocosts.items()
+    }
+    assert all(reused_counts[label] >= count for label, count in counts.items())
+    assert any(reused_counts[label] > count for label, count in counts.items())
+
+
+def test_strategy_of_decomposed_instance():
+    import networkx as nx
+    from networkx.generators.small import dodecahedral_graph
+    from networkx.generators.small import tutte_graph
+    from ktcut.isolation_branching import isolation_branching
+    from ktcut.isolation_branching_strategies import PseudocostStrategy
+    from ktcut.isolation_branching_strategies import StrongBranchingStrategy
+    # two parts with kernels of different sizes, both branched on
+    graph = nx.disjoint_union(tutte_graph(), dodecahedral_graph())
+    terminals = [1, 17, 34, 40, 46, 53, 60]
+    for strategy in (PseudocostStrategy(), StrongBranchingStrategy()):
+        _, cut_value, report = isolation_branching(
+            graph, terminals, reporting=False, branching=strategy
+        )
+        assert report["Parts"] == 2
+        assert cut_value == 12
+        assert strategy.pseudocosts
+
+
+def test_unknown_strategy():
+    from networkx.generators.small import tutte_graph
+    from ktcut.isolation_branching import isolation_branching
+    with pytest.raises(ValueError):
+        isolation_branching(tutte_graph(), [1, 17, 34], branching="random")
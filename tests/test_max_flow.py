@@ -0,0 +1,45 @@
+"""Test maximum flows on CSR graphs."""
+import numpy as np
+
+
+def test_warm_started_flow_matches_cold_flow():
+    from networkx.generators.small import tutte_graph
+    from ktcut.csr_graph import CSRGraph
+    from ktcut.max_flow import maximum_flow
+    graph = CSRGraph.from_networkx(tutte_graph())
+    source_mask = np.zeros(graph.vertex_count, dtype=bool)
+    sink_mask = np.zeros(graph.vertex_count, dtype=bool)
+    source_mask[1] = True
+    sink_mask[[17, 34]] = True
+    flow, value, _ = maximum_flow(graph, source_mask, sink_mask)
+    assert value == 3.0
+    assert np.allclose(flow, -flow[graph.reverse_arcs])
+
+    # the previous flow stays feasible after adding a source
+    source_mask[graph.neighbors[graph.offsets[1]]] = True
+    _, warm_value, warm_cut = maximum_flow(graph, source_mask, sink_mask,
+                                           flow=flow)
+    _, cold_value, cold_cut = maximum_flow(graph, source_mask, sink_mask)
+    assert warm_value == cold_value
+    assert np.array_equal(warm_cut, cold_cut)
+
+
+def test_warm_start_default(monkeypatch):
+    from networkx.generators.small import tutte_graph
+    from ktcut import isolation_branching_tree
+    from ktcut.csr_graph import CSRGraph
+    from ktcut.isolation_branching_tree import IsolationBranchingTree
+    graph = CSRGraph.from_networkx(tutte_graph())
+    terminals = graph.indices_of([1, 17, 34])
+    tree = IsolationBranchingTree(graph, terminals)
+    _, cut_value = tree.solve(reporting=False)
+    assert tree._active_node.flows is not None
+
+    # large kernels are not warm-started unless asked to
+    monkeypatch.setattr(isolation_branching_tree, 'WARM_START_MAX_EDGES', 0)
+    tree = IsolationBranchingTree(graph, terminals)
+    assert tree.solve(reporting=False)[1] == cut_value
+    assert tree._active_node.flows is None
+    tree = IsolationBranchingTree(graph, terminals)
+    assert tree.solve(reporting=False, warm_start=True)[1] == cut_value
+    assert tree._active_node.flows is not None
@@ -0,0 +1,64 @@
+"""Test the cache of repeated results."""
+
+
+def test_cache_eviction(tmp_path):
+    from ktcut.result_cache import ResultCache
+    cache = ResultCache(max_bytes=2500, directory=tmp_path)
+    for index in range(3):
+        cache.put("value-{}".format(index), bytes(1000))
+    assert len(cache) == 2
+    assert cache.evictions == 1
+    assert cache.get("value-1") == bytes(1000)
+    # evicted from memory, but still on disk
+    assert cache.get("value-0") == bytes(1000)
+    assert cache.get("value-3") is None
+    assert cache.stats["Hits"] == 2
+    assert cache.stats["Misses"] == 1
+    # other files in the directory are left alone
+    other = tmp_path / "checkpoint.pkl"
+    other.write_bytes(bytes(1000))
+    cache = ResultCache(directory=tmp_path, max_disk_bytes=2500)
+    cache.put("value-3", bytes(1000))
+    assert len(list(tmp_path.iterdir())) == 3
+    cache.clear()
+    assert list(tmp_path.iterdir()) == [other]
+
+
+def test_cache_isolation_branching():
+    from networkx.generators.small import tutte_graph
+    from ktcut.isolation_branching import isolation_branching
+    from ktcut.result_cache import ResultCache
+    graph = tutte_graph()
+    cache = ResultCache()
+    isolation_branching(
+        graph, [1, 17, 34, 40], reporting=False, time_limit=0, cache=cache
+    )
+    assert cache.misses == {"partition": 1, "root": 1}
+    source_sets, cut_value, _ = isolation_branching(
+        graph, [1, 17, 34, 40], reporting=False, cache=cache
+    )
+    assert cut_value == 8
+    assert cache.hits == {"root": 1}
+    cached = isolation_branching(graph, [1, 17, 34, 40], reporting=False, cache=cache)
+    assert cached[0] == source_sets
+    assert cached[1] == 8
+    assert cache.hits == {"root": 1, "partition": 1}
+
+
+def test_cache_solver_options():
+    import pulp
+    from networkx.generators.small import tutte_graph
+    from ktcut.ip_algorithm import ip_algorithm
+    from ktcut.result_cache import ResultCache
+    graph = tutte_graph()
+    for u, v in graph.edges:
+        graph[u][v]["capacity"] = 1
+    cache = ResultCache()
+    solver = pulp.PULP_CBC_CMD(msg=False)
+    assert ip_algorithm(graph, [1, 17, 34, 40], solver, cache=cache)[1] == 8
+    assert len(cache) == 1
+    # other solver options are other keys
+    limited = pulp.PULP_CBC_CMD(msg=False, timeLimit=60)
+    assert ip_algorithm(graph, [1, 17, 34, 40], limited, cache=cache)[1] == 8
+    assert cache.misses == {"ip": 2}
+    assert len(cache) == 2
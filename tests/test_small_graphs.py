@@ -7,9 +7,11 @@ def test_isolating_cut():
     test_graph = SmallGraphs()
     test_graph.set_test_graph(7)
     graph, terminals = test_graph.get_graph(), test_graph.get_terminals()
+    nodes, edges = set(graph.nodes()), set(graph.edges())
     cut_source, cut_weight = minimum_isolating_cut(graph, [1], [5, 6])
     assert cut_source == {1, 2, 3}
     assert cut_weight == 2.0
+    assert set(graph.nodes()) == nodes and set(graph.edges()) == edges
 
 
 def test_combined_vertices():
@@ -125,6 +127,179 @@ def test_graph_6():
     assert check_persistence(graph, terminals, 'strong')
 
 
+def test_graph_3_parallel():
+    from ktcut.isolation_branching import isolation_branching
+    test_graphs = SmallGraphs()
+    test_graphs.set_test_graph(3)
+    graph, terminals = test_graphs.get_graph(), test_graphs.get_terminals()
+    _, cut_value, _ = isolation_branching(graph, terminals, workers=2)
+    assert cut_value == 26
+
+
+def test_graph_3_lazy():
+    from ktcut.isolation_branching import isolation_branching
+    test_graphs = SmallGraphs()
+    test_graphs.set_test_graph(3)
+    graph, terminals = test_graphs.get_graph(), test_graphs.get_terminals()
+    _, cut_value, _ = isolation_branching(graph, terminals, lazy=True)
+    assert cut_value == 26
+    _, cut_value, _ = isolation_branching(graph, terminals, lazy=True, workers=2)
+    assert cut_value == 26
+
+
+def test_isolating_cut_bound():
+    from ktcut.csr_graph import CSRGraph
+    from ktcut.isolation_branching import isolation_branching
+    from ktcut.isolation_branching_node import IsolationBranchingNode
+    from ktcut.isolation_branching_root import IsolationBranchingRoot
+    test_graphs = SmallGraphs()
+    test_graphs.set_test_graph(3)
+    graph, terminals = test_graphs.get_graph(), test_graphs.get_terminals()
+    _, cut_value, _ = isolation_branching(graph, terminals,
+                                          isolating_cut_bound=True)
+    assert cut_value == 26
+    csr_graph = CSRGraph.from_networkx(graph)
+    root = IsolationBranchingRoot(csr_graph, csr_graph.indices_of(terminals))
+    root.initial_isolating_cuts()
+    node = IsolationBranchingNode(root.get_graph(), root.get_terminals())
+    children = node.construct_children_nodes(node.unassigned_vertices[0],
+                                             node.terminals)
+    for child in children:
+        weights = child.isolate_all_terminals()
+        assert abs(child.lower_bound - weights.sum() / 2.0) < 1e-9
+
+
+def test_bipartition_root_cuts():
+    from ktcut.isolation_branching import isolation_branching
+    test_graphs = SmallGraphs()
+    for test_graph, expected_cut_value in [(1, 8), (3, 26), (6, 27)]:
+        test_graphs.set_test_graph(test_graph)
+        graph, terminals = test_graphs.get_graph(), test_graphs.get_terminals()
+        _, cut_value, _ = isolation_branching(
+            graph, terminals, reporting=False, root_cuts="bipartition"
+        )
+        assert cut_value == expected_cut_value
+
+
+def test_graph_3_iter():
+    from ktcut.isolation_branching import isolation_branching_iter
+    test_graphs = SmallGraphs()
+    test_graphs.set_test_graph(3)
+    graph, terminals = test_graphs.get_graph(), test_graphs.get_terminals()
+    events = list(isolation_branching_iter(graph, terminals, reporting=False))
+    assert events[0].kind == "incumbent"
+    assert events[-1].kind == "solved"
+    assert events[-1].cut_value == 26 and events[-1].gap == 0
+    for previous, event in zip(events, events[1:]):
+        assert event.cut_value <= previous.cut_value
+        assert event.lower_bound >= previous.lower_bound
+    assert all(event.lower_bound <= 26 for event in events)
+
+
+def test_node_selection():
+    from ktcut.isolation_branching import isolation_branching
+    test_graphs = SmallGraphs()
+    test_graphs.set_test_graph(3)
+    graph, terminals = test_graphs.get_graph(), test_graphs.get_terminals()
+    for options in [
+        {"node_selection": "depth"},
+        {"node_selection": "hybrid"},
+        {"max_frontier_nodes": 1},
+        {"max_frontier_bytes": 1},
+    ]:
+        _, cut_value, _ = isolation_branching(
+            graph, terminals, reporting=False, **options
+        )
+        assert cut_value == 26
+
+
+def test_highs():
+    import pytest
+    pytest.importorskip("scipy.optimize", reason="the highs solver needs SciPy")
+    from ktcut.ip_algorithm import ip_algorithm
+    from ktcut.lp_algorithm import lp_algorithm
+    test_graphs = SmallGraphs()
+    for index in range(1, 5):
+        test_graphs.set_test_graph(index)
+        graph, terminals = test_graphs.get_graph(), test_graphs.get_terminals()
+        _, cut_value = ip_algorithm(graph, terminals)
+        source_sets, highs_cut_value = ip_algorithm(graph, terminals, solver="highs")
+        assert highs_cut_value == cut_value
+        assert set().union(*source_sets.values()) == set(graph.nodes())
+        assert lp_algorithm(graph, terminals, solver="highs") == lp_algorithm(
+            graph, terminals
+        )
+        strong = lp_algorithm(graph, terminals, persistence="strong", solver="highs")
+        for terminal in terminals:
+            assert strong[terminal] == {terminal}
+
+
+def test_compact():
+    from ktcut.ip_algorithm import ip_algorithm
+    from ktcut.ip_formulation import IPFormulation
+    from ktcut.lp_algorithm import lp_algorithm
+    test_graphs = SmallGraphs()
+    for index in range(1, 5):
+        test_graphs.set_test_graph(index)
+        graph, terminals = test_graphs.get_graph(), test_graphs.get_terminals()
+        _, cut_value = ip_algorithm(graph, terminals)
+        assert ip_algorithm(graph, terminals, compact=True)[1] == cut_value
+        assert lp_algorithm(graph, terminals, compact=True) == lp_algorithm(
+            graph, terminals
+        )
+        ip_formulation = IPFormulation(graph, terminals, compact=True, aggregate=True)
+        ip_formulation.solve_ip()
+        assert ip_formulation.get_cut_value() == cut_value
+        source_sets = ip_formulation.get_source_sets()
+        assert set().union(*source_sets.values()) == set(graph.nodes())
+
+
+def test_ip_initial_partition():
+    import pulp
+    from ktcut.ip_algorithm import ip_algorithm
+    from ktcut.isolation_branching import isolation_branching
+    options = list(pulp.LpSolverDefault.options)
+    options_dict = dict(pulp.LpSolverDefault.optionsDict)
+    test_graphs = SmallGraphs()
+    for index in range(1, 5):
+        test_graphs.set_test_graph(index)
+        graph, terminals = test_graphs.get_graph(), test_graphs.get_terminals()
+        source_sets, cut_value, _ = isolation_branching(
+            graph, terminals, reporting=False
+        )
+        for compact in (False, True):
+            _, ip_cut_value = ip_algorithm(
+                graph, terminals, compact=compact, initial_partition=source_sets
+            )
+            assert ip_cut_value == cut_value
+        # a partial partition is completed greedily
+        _, ip_cut_value = ip_algorithm(graph, terminals, initial_partition={})
+        assert ip_cut_value == cut_value
+    # the options are set on a copy of the default solver
+    assert pulp.LpSolverDefault.options == options
+    assert pulp.LpSolverDefault.optionsDict == options_dict
+
+
+def test_kernel_persistence():
+    from ktcut.isolation_branching import isolation_branching
+    from ktcut.result_cache import ResultCache
+    test_graphs = SmallGraphs()
+    for index in range(1, 5):
+        test_graphs.set_test_graph(index)
+        graph, terminals = test_graphs.get_graph(), test_graphs.get_terminals()
+        _, cut_value, _ = isolation_branching(graph, terminals, reporting=False)
+        cache = ResultCache()
+        for persistence in ("strong", "weak"):
+            _, persistent_cut_value, _ = isolation_branching(
+                graph,
+                terminals,
+                persistence=persistence,
+                reporting=False,
+                cache=cache,
+            )
+            assert persistent_cut_value == cut_value
+
+
 class SmallGraphs:
 
     def __init__(self):